@@ -0,0 +1,100 @@
+import json
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import setup_databases, teardown_databases
+
+from bench import runner, scenarios
+
+
+class Command(BaseCommand):
+    """Django command to benchmark the public API in process.
+
+    Scenarios run through the test client against a freshly created
+    test database, so the configured database is never written to."""
+    help = 'Measure throughput, latency and queries of API endpoints'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scenario', action='append', dest='scenarios',
+            choices=list(scenarios.SCENARIOS),
+            help='Scenario to run (repeatable, default all)',
+        )
+        parser.add_argument(
+            '--requests', type=int, default=200,
+            help='Number of measured requests per scenario',
+        )
+        parser.add_argument(
+            '--concurrency', type=int, default=4,
+            help='Number of threads sending requests',
+        )
+        parser.add_argument(
+            '--warmup', type=int, default=10,
+            help='Number of unmeasured requests per scenario',
+        )
+        parser.add_argument(
+            '--save', metavar='PATH',
+            help='Write results as JSON baseline to PATH',
+        )
+        parser.add_argument(
+            '--baseline', metavar='PATH',
+            help='Fail if results regress against the baseline at PATH',
+        )
+        parser.add_argument(
+            '--threshold', type=float, default=0.2,
+            help='Tolerated regression as a fraction (default 0.2)',
+        )
+
+    def handle(self, *args, **options):
+        names = options['scenarios'] or list(scenarios.SCENARIOS)
+        baseline = None
+        if options['baseline']:
+            with open(options['baseline']) as f:
+                baseline = json.load(f)
+
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            cache.clear()
+            context = scenarios.seed()
+            results = {}
+            for name in names:
+                results[name] = runner.run_scenario(
+                    scenarios.SCENARIOS[name], context,
+                    requests=options['requests'],
+                    concurrency=options['concurrency'],
+                    warmup=options['warmup'],
+                )
+                self.report(name, results[name])
+        finally:
+            teardown_databases(old_config, verbosity=0)
+
+        if options['save']:
+            with open(options['save'], 'w') as f:
+                json.dump(results, f, indent=2, sort_keys=True)
+
+        if baseline is not None:
+            regressions = runner.compare(
+                results, baseline, options['threshold']
+            )
+            if regressions:
+                raise CommandError(
+                    'Regressions against baseline:\n' + '\n'.join(regressions)
+                )
+
+        self.stdout.write(self.style.SUCCESS('Benchmark finished'))
+
+    def report(self, name, result):
+        """Write one line of results"""
+        line = (
+            f'{name:<16} {result["throughput"]:>9.2f} req/s  '
+            f'p50 {result["p50_ms"]:>8.3f}ms  '
+            f'p95 {result["p95_ms"]:>8.3f}ms  '
+            f'p99 {result["p99_ms"]:>8.3f}ms  '
+            f'{result["queries"]:>6.2f} queries'
+        )
+        if result['failures']:
+            self.stdout.write(self.style.WARNING(
+                f'{line}  {result["failures"]} failed'
+            ))
+        else:
+            self.stdout.write(line)
@@ -0,0 +1,108 @@
+"""Running scenarios and comparing their results with baselines"""
+import math
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from rest_framework.test import APIClient
+
+
+def percentile(values, pct):
+    """Return the nearest-rank percentile of values"""
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+
+    return ordered[rank - 1]
+
+
+def _run_requests(scenario, context, indices):
+    """Send the requests of indices with one client, return
+    (latencies, query counts, failures)"""
+    client = APIClient()
+    latencies = []
+    queries = []
+    failures = 0
+    for n in indices:
+        with CaptureQueriesContext(connection) as captured:
+            start = time.perf_counter()
+            response = scenario(client, context, n)
+            latencies.append(time.perf_counter() - start)
+        queries.append(len(captured))
+        if response.status_code >= 400:
+            failures += 1
+
+    return latencies, queries, failures
+
+
+def _run_worker(scenario, context, indices):
+    """Run requests in a worker thread, closing its connection after"""
+    try:
+        return _run_requests(scenario, context, indices)
+    finally:
+        connection.close()
+
+
+def run_scenario(scenario, context, requests=200, concurrency=4, warmup=10):
+    """Run scenario requests times spread over concurrency threads
+    (in the calling thread for 1) and return its statistics"""
+    _run_requests(scenario, context, range(warmup))
+
+    indices = range(warmup, warmup + requests)
+    start = time.perf_counter()
+    if concurrency == 1:
+        parts = [_run_requests(scenario, context, indices)]
+    else:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            parts = list(executor.map(
+                lambda i: _run_worker(
+                    scenario, context, indices[i::concurrency]
+                ),
+                range(concurrency)
+            ))
+    elapsed = time.perf_counter() - start
+
+    latencies = [value for part in parts for value in part[0]]
+    queries = [value for part in parts for value in part[1]]
+
+    return {
+        'requests': requests,
+        'concurrency': concurrency,
+        'failures': sum(part[2] for part in parts),
+        'throughput': round(requests / elapsed, 2),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 3),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 3),
+        'queries': round(sum(queries) / len(queries), 2),
+    }
+
+
+def compare(results, baseline, threshold):
+    """Return descriptions of results regressing beyond threshold
+    (a fraction, e.g. 0.2) against the baseline"""
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        if base['concurrency'] != result['concurrency']:
+            regressions.append(
+                f'{name}: concurrency {result["concurrency"]} differs '
+                f'from baseline {base["concurrency"]}'
+            )
+            continue
+
+        for metric in ('p95_ms', 'p99_ms', 'queries'):
+            if result[metric] > base[metric] * (1 + threshold):
+                regressions.append(
+                    f'{name}: {metric} {result[metric]} > {base[metric]}'
+                )
+        if result['throughput'] < base['throughput'] * (1 - threshold):
+            regressions.append(
+                f'{name}: throughput {result["throughput"]} '
+                f'< {base["throughput"]}'
+            )
+
+    return regressions
@@ -0,0 +1,96 @@
+"""Benchmark scenarios.
+
+A scenario sends one request through the API client it is given and
+returns the response. Its arguments are the client, the context built
+by ``seed`` and the index of the request."""
+import itertools
+
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+
+from rest_framework.authtoken.models import Token
+
+from core.models import Board, Thread
+
+
+PASSWORD = 'benchpass'
+BOARD_CODE = 'bench'
+
+
+def seed(users=20, threads=200):
+    """Create fixture data and return the context of the scenarios"""
+    accounts = [
+        get_user_model().objects.create_user(
+            username=f'bench{i}', email=f'bench{i}@example.com',
+            password=PASSWORD
+        )
+        for i in range(users)
+    ]
+    board = Board.objects.create(
+        title='bench board', code=BOARD_CODE, user=accounts[0]
+    )
+    Thread.objects.bulk_create([
+        Thread(
+            user=accounts[i % users], board=board,
+            title=f'bench thread {i}', content='bench content ' * 20
+        )
+        for i in range(threads)
+    ])
+
+    return {
+        'usernames': [account.username for account in accounts],
+        'tokens': [Token.objects.create(user=a).key for a in accounts],
+        'sequence': itertools.count(),
+    }
+
+
+def signup(client, context, n):
+    """Register a new user"""
+    seq = next(context['sequence'])
+
+    return client.post(reverse('user:signup'), {
+        'username': f'signup{seq}',
+        'email': f'signup{seq}@example.com',
+        'password': PASSWORD,
+    })
+
+
+def signin(client, context, n):
+    """Obtain the token of an existing user"""
+    usernames = context['usernames']
+
+    return client.post(reverse('user:signin'), {
+        'username': usernames[n % len(usernames)],
+        'password': PASSWORD,
+    })
+
+
+def board_list(client, context, n):
+    """List boards anonymously"""
+    return client.get(reverse('shitchan:board-list'))
+
+
+def board_threads(client, context, n):
+    """List the first page of threads of a board"""
+    return client.get(reverse('shitchan:board-threads', args=[BOARD_CODE]))
+
+
+def profile_update(client, context, n):
+    """Update the profile of an authenticated user (to the same
+    username, so every request stays valid)"""
+    index = n % len(context['usernames'])
+
+    return client.patch(
+        reverse('user:profile'),
+        {'username': context['usernames'][index]},
+        HTTP_AUTHORIZATION=f'Token {context["tokens"][index]}',
+    )
+
+
+SCENARIOS = {
+    'signup': signup,
+    'signin': signin,
+    'board_list': board_list,
+    'board_threads': board_threads,
+    'profile_update': profile_update,
+}
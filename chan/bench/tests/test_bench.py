@@ -0,0 +1,114 @@
+import json
+import os
+import tempfile
+
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.core.management import call_command, CommandError
+from django.test import TestCase
+
+from bench import runner, scenarios
+
+
+RESULT = {
+    'requests': 10, 'concurrency': 1, 'failures': 0, 'throughput': 100.0,
+    'p50_ms': 5.0, 'p95_ms': 8.0, 'p99_ms': 9.0, 'queries': 2.0,
+}
+
+
+class RunnerTests(TestCase):
+    """Test running scenarios and comparing results"""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_percentile(self):
+        """Test nearest-rank percentiles"""
+        values = list(range(1, 101))
+
+        self.assertEqual(runner.percentile(values, 50), 50)
+        self.assertEqual(runner.percentile(values, 99), 99)
+        self.assertEqual(runner.percentile([3], 95), 3)
+
+    def test_run_scenario(self):
+        """Test statistics of a scenario run"""
+        context = scenarios.seed(users=2, threads=3)
+
+        result = runner.run_scenario(
+            scenarios.signin, context, requests=4, concurrency=1, warmup=1
+        )
+
+        self.assertEqual(result['requests'], 4)
+        self.assertEqual(result['failures'], 0)
+        self.assertGreater(result['queries'], 0)
+        self.assertLessEqual(result['p50_ms'], result['p99_ms'])
+
+    def test_compare_within_threshold(self):
+        """Test that results within the threshold pass"""
+        result = dict(RESULT, p95_ms=9.0, throughput=90.0)
+
+        regressions = runner.compare(
+            {'signin': result}, {'signin': RESULT}, 0.2
+        )
+
+        self.assertEqual(regressions, [])
+
+    def test_compare_regressions(self):
+        """Test that slower results and extra queries are reported"""
+        result = dict(RESULT, p99_ms=20.0, queries=3.0, throughput=50.0)
+
+        regressions = runner.compare(
+            {'signin': result}, {'signin': RESULT}, 0.2
+        )
+
+        self.assertEqual(len(regressions), 3)
+
+    def test_compare_different_concurrency(self):
+        """Test that results of another concurrency are not compared"""
+        result = dict(RESULT, concurrency=4)
+
+        regressions = runner.compare(
+            {'signin': result}, {'signin': RESULT}, 0.2
+        )
+
+        self.assertEqual(len(regressions), 1)
+
+
+@patch('bench.management.commands.bench.teardown_databases')
+@patch('bench.management.commands.bench.setup_databases')
+class BenchCommandTests(TestCase):
+    """Test the bench command (inside the test database)"""
+
+    def setUp(self):
+        cache.clear()
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, 'baseline.json')
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def bench(self, **options):
+        call_command(
+            'bench', scenario=['board_list'], requests=3, concurrency=1,
+            warmup=1, stdout=StringIO(), **options
+        )
+
+    def test_save_baseline(self, setup, teardown):
+        """Test that results are saved as JSON baseline"""
+        self.bench(save=self.path)
+
+        with open(self.path) as f:
+            baseline = json.load(f)
+        self.assertEqual(list(baseline), ['board_list'])
+        self.assertEqual(baseline['board_list']['requests'], 3)
+        teardown.assert_called_once()
+
+    def test_regression_fails(self, setup, teardown):
+        """Test that the command fails on a regression"""
+        with open(self.path, 'w') as f:
+            json.dump({'board_list': dict(RESULT, p95_ms=0, p99_ms=0)}, f)
+
+        with self.assertRaises(CommandError):
+            self.bench(baseline=self.path)
@@ -2,6 +2,8 @@
 ASGI config for chan project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Board event streams are served by ``shitchan.sse``, everything else by
+Django.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/3.1/howto/deployment/asgi/
@@ -13,4 +15,18 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'chan.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from shitchan import sse  # noqa: E402 (needs the apps loaded)
+
+
+async def application(scope, receive, send):
+    """Route event stream requests to shitchan.sse"""
+    if scope['type'] == 'http':
+        match = sse.EVENTS_PATH.match(scope['path'])
+        if match:
+            return await sse.board_events(
+                scope, receive, send, match['code']
+            )
+
+    await django_application(scope, receive, send)
@@ -0,0 +1,52 @@
+"""
+Gunicorn config for chan project.
+
+Usage: gunicorn -c python:chan.gunicorn chan.wsgi
+
+Every value can be overridden with the GUNICORN_* environment variables
+below, e.g. GUNICORN_WORKERS=4.
+"""
+
+import multiprocessing
+import os
+
+
+def env_int(name, default):
+    """Return integer environment variable or default"""
+    value = os.environ.get(name)
+
+    return int(value) if value else default
+
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+
+# Requests mostly wait on the database, so each CPU gets two workers
+# plus one, and every worker a few threads for overlapping queries.
+workers = env_int('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1)
+threads = env_int('GUNICORN_THREADS', 4)
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+
+# Import the project once in the master, workers share its memory
+# pages copy-on-write instead of each importing Django on its own.
+preload_app = True
+
+# Recycle workers after a (jittered) number of requests to bound leaks,
+# jitter keeps them from all restarting at the same time.
+max_requests = env_int('GUNICORN_MAX_REQUESTS', 1000)
+max_requests_jitter = env_int('GUNICORN_MAX_REQUESTS_JITTER', 100)
+
+timeout = env_int('GUNICORN_TIMEOUT', 30)
+graceful_timeout = env_int('GUNICORN_GRACEFUL_TIMEOUT', 30)
+# Longer than the usual 2s default so clients behind a proxy or load
+# balancer reuse their connections.
+keepalive = env_int('GUNICORN_KEEPALIVE', 5)
+
+accesslog = os.environ.get('GUNICORN_ACCESSLOG', '-')
+errorlog = '-'
+
+
+def post_fork(server, worker):
+    """Drop database connections inherited from the preloaded master"""
+    from django.db import connections
+
+    connections.close_all()
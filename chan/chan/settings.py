@@ -10,6 +10,8 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/3.1/ref/settings/
 """
 
+import os
+
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -23,7 +25,7 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 SECRET_KEY = 'da(dv2#p0s5@kk3-)bs-4z^)g&%$o4ciph#psp*06(t51a0!6^'
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+DEBUG = os.environ.get('DEBUG', '0') == '1'
 
 ALLOWED_HOSTS = ['*']
 
@@ -41,9 +43,12 @@ INSTALLED_APPS = [
     'rest_framework.authtoken',
     'core',
     'user',
+    'shitchan',
+    'bench',
 ]
 
 MIDDLEWARE = [
+    'core.middleware.QueryInstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -77,17 +82,88 @@ WSGI_APPLICATION = 'chan.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/3.1/ref/settings/#databases
 
+# Connections are kept open for DB_CONN_MAX_AGE seconds (0 closes them
+# after every request) and checked before each request reuses them.
+# Set DB_POOL_MODE=transaction behind pgbouncer in transaction pooling
+# mode, where server side cursors can't outlive a transaction.
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.postgresql',
-        'HOST': 'db',
-        'NAME': 'chan_db',
-        'USER': 'postgres',
-        'PASSWORD': 'pass123',
+        'HOST': os.environ.get('DB_HOST', 'db'),
+        'PORT': os.environ.get('DB_PORT', ''),
+        'NAME': os.environ.get('DB_NAME', 'chan_db'),
+        'USER': os.environ.get('DB_USER', 'postgres'),
+        'PASSWORD': os.environ.get('DB_PASSWORD', 'pass123'),
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 60)),
+        'DISABLE_SERVER_SIDE_CURSORS': (
+            os.environ.get('DB_POOL_MODE') == 'transaction'
+        ),
+    }
+}
+
+DB_HEALTH_CHECKS = os.environ.get('DB_HEALTH_CHECKS', '1') == '1'
+
+
+# Cache
+# https://docs.djangoproject.com/en/3.1/topics/cache/
+# Local memory in development, point CACHE_BACKEND/CACHE_LOCATION
+# to a shared backend (e.g. memcached) in production.
+
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get(
+            'CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.environ.get('CACHE_LOCATION', 'chan'),
     }
 }
 
 
+# In-process cache of resolved auth tokens (user.authentication)
+
+TOKEN_CACHE_MAXSIZE = 10000
+TOKEN_CACHE_TTL = 60
+
+# Username/email availability Bloom filter (per process): scan for new
+# users at most every AVAILABILITY_REFRESH_INTERVAL seconds, rebuild
+# every AVAILABILITY_REBUILD_INTERVAL seconds.
+AVAILABILITY_REFRESH_INTERVAL = 5
+AVAILABILITY_REBUILD_INTERVAL = 600
+
+# Board event streams (ASGI only): EVENTS_BACKEND carries events between
+# processes (shitchan.events.MemoryBackend keeps them in the process,
+# shitchan.events.PostgresBackend uses LISTEN/NOTIFY). A client more
+# than EVENTS_QUEUE_SIZE events behind is disconnected, idle streams get
+# a comment every EVENTS_HEARTBEAT seconds.
+EVENTS_BACKEND = os.environ.get(
+    'EVENTS_BACKEND', 'shitchan.events.MemoryBackend'
+)
+EVENTS_QUEUE_SIZE = int(os.environ.get('EVENTS_QUEUE_SIZE', 100))
+EVENTS_HEARTBEAT = float(os.environ.get('EVENTS_HEARTBEAT', 15))
+
+
+# Password hashing
+# https://docs.djangoproject.com/en/3.1/topics/auth/passwords/
+# Hashing runs in a pool of PASSWORD_HASH_WORKERS processes
+# per server process (0 hashes inline) with at most PASSWORD_HASH_QUEUE
+# hashes in flight, more are refused with 503. Changing
+# PASSWORD_HASH_ITERATIONS rehashes passwords on the next sign-in.
+
+PASSWORD_HASHERS = [
+    'user.hashers.PooledPBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+]
+
+PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', 1))
+PASSWORD_HASH_QUEUE = int(os.environ.get('PASSWORD_HASH_QUEUE', 4))
+PASSWORD_HASH_ITERATIONS = int(
+    os.environ.get('PASSWORD_HASH_ITERATIONS', 216000)
+)
+
+
 # Password validation
 # https://docs.djangoproject.com/en/3.1/ref/settings/#auth-password-validators
 
@@ -107,6 +183,29 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+# Logging
+# https://docs.djangoproject.com/en/3.1/topics/logging/
+# Per-request query statistics of core.middleware are logged at INFO,
+# requests running duplicate statements at WARNING.
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'core.middleware': {
+            'handlers': ['console'],
+            'level': os.environ.get('QUERY_LOG_LEVEL', 'WARNING'),
+            'propagate': False,
+        },
+    },
+}
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/3.1/topics/i18n/
 
@@ -130,4 +229,18 @@ MEDIA_URL = '/media/'
 STATIC_ROOT = 'vol/web/static'
 MEDIA_ROOT = 'vol/web/media'
 
+# Uploads are deduplicated by content (see core.storage)
+DEFAULT_FILE_STORAGE = 'core.storage.ContentAddressedStorage'
+
 AUTH_USER_MODEL = 'core.User'
+
+# Size of the process pool resizing thread images, per server process
+# (0 = resize inline on the request thread), with at most
+# THUMBNAIL_QUEUE images in flight, more are left without variants
+THUMBNAIL_WORKERS = int(os.environ.get('THUMBNAIL_WORKERS', 1))
+THUMBNAIL_QUEUE = int(os.environ.get('THUMBNAIL_QUEUE', 16))
+
+# Boards are pruned into the archive after a new thread at most once
+# per ARCHIVE_PRUNE_INTERVAL seconds, the prune_threads command catches
+# up on the rest
+ARCHIVE_PRUNE_INTERVAL = int(os.environ.get('ARCHIVE_PRUNE_INTERVAL', 10))
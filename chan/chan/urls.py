@@ -18,8 +18,12 @@ from django.urls import path, include
 from django.conf.urls.static import static
 from django.conf import settings
 
+from core import views as core_views
+
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('healthz', core_views.HealthView.as_view(), name='healthz'),
+    path('readyz', core_views.ReadinessView.as_view(), name='readyz'),
     path('api/user/', include('user.urls')),
     path('api/shitchan/', include('shitchan.urls')),
 ] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
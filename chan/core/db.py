@@ -0,0 +1,37 @@
+"""Database connection helpers"""
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+def check_connections():
+    """Close persistent connections the server has dropped meanwhile,
+    so the request opens a new one instead of failing on first query"""
+    if not settings.DB_HEALTH_CHECKS:
+        return
+
+    for connection in connections.all():
+        if connection.connection is None or connection.in_atomic_block:
+            continue
+        if not connection.is_usable():
+            connection.close()
+
+
+def ping(alias=DEFAULT_DB_ALIAS):
+    """Run SELECT 1 on a short-lived connection to alias (not the
+    persistent one of this thread) and return (connect, round trip)
+    durations in seconds"""
+    wrapper = connections[alias]
+    connection = type(wrapper)(wrapper.settings_dict, alias)
+    try:
+        start = time.perf_counter()
+        connection.ensure_connection()
+        connected = time.perf_counter()
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+            cursor.fetchone()
+
+        return connected - start, time.perf_counter() - connected
+    finally:
+        connection.close()
@@ -0,0 +1,45 @@
+import os
+
+from django.core.management.base import BaseCommand
+
+from core import transfer
+
+
+class Command(BaseCommand):
+    """Django command to export users, boards, threads, replies and
+    votes to a directory, one file per table.
+
+    Media files are not part of the export, copy the storage apart.
+    On PostgreSQL the whole export is one read only snapshot."""
+    help = 'Stream the chan tables to JSON lines or CSV files'
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory', help='Directory of the files')
+        parser.add_argument(
+            '--format', choices=transfer.FORMATS, default='jsonl',
+            help='Format of the files',
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=2000,
+            help='Number of rows to fetch per query',
+        )
+        parser.add_argument(
+            '--resume', action='store_true',
+            help='Continue an interrupted export from its checkpoint',
+        )
+
+    def handle(self, *args, **options):
+        directory = options['directory']
+        os.makedirs(directory, exist_ok=True)
+
+        total = 0
+        for table, count in transfer.export_tables(
+            directory, options['format'], options['chunk_size'],
+            resume=options['resume'],
+        ):
+            self.stdout.write(f'Exported {count} {table}')
+            total += count
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Exported {total} rows to {directory}'
+        ))
@@ -0,0 +1,62 @@
+import os
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from core import transfer
+
+from shitchan import search
+
+
+class Command(BaseCommand):
+    """Django command to import files written by export_chan.
+
+    Meant for an empty database: rows whose primary or unique keys
+    already exist are skipped."""
+    help = 'Load the chan tables from JSON lines or CSV files'
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory', help='Directory of the files')
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Number of rows to insert per transaction',
+        )
+        parser.add_argument(
+            '--resume', action='store_true',
+            help='Continue an interrupted import from its checkpoint',
+        )
+        parser.add_argument(
+            '--no-copy', action='store_false', dest='copy',
+            help='Insert with INSERT statements even on PostgreSQL',
+        )
+
+    def handle(self, *args, **options):
+        directory = options['directory']
+        if not os.path.isdir(directory):
+            raise CommandError(f'{directory} is not a directory')
+
+        total = 0
+        try:
+            for table, count in transfer.import_tables(
+                directory, options['batch_size'], resume=options['resume'],
+                use_copy=options['copy'] and connection.vendor == 'postgresql',
+            ):
+                if count is None:
+                    self.stdout.write(f'No file for {table}, skipped')
+                    continue
+                self.stdout.write(f'Imported {count} {table}')
+                total += count
+        except transfer.TransferError as e:
+            raise CommandError(e)
+
+        transfer.log_changes(options['batch_size'])
+        if not search.uses_search_vector():
+            call_command('rebuild_search_index', stdout=self.stdout)
+        # Cached listings and their versions predate the new rows
+        cache.clear()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {total} rows from {directory}'
+        ))
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+
+from core.models import Board
+
+from shitchan import archive
+
+
+class Command(BaseCommand):
+    """Django command to archive threads of boards over their limit"""
+    help = 'Move threads beyond the thread limit of boards to the archive'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--board', action='append', dest='boards', metavar='CODE',
+            help='Code of a board to prune (repeatable, default all)',
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=archive.CHUNK_SIZE,
+            help='Number of threads to archive per transaction',
+        )
+
+    def handle(self, *args, **options):
+        boards = Board.objects.order_by('pk')
+        if options['boards']:
+            boards = boards.filter(code__in=options['boards'])
+
+        total = 0
+        for board in boards:
+            pruned = archive.prune_board(board.pk, options['chunk_size'])
+            if pruned:
+                self.stdout.write(
+                    f'Archived {pruned} threads of /{board.code}/'
+                )
+            total += pruned
+
+        self.stdout.write(self.style.SUCCESS(f'Archived {total} threads'))
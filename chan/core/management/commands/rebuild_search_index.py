@@ -0,0 +1,59 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F
+
+from core.models import Thread, SearchTerm
+
+from shitchan import search
+
+
+class Command(BaseCommand):
+    """Django command to rebuild the full-text search index of threads"""
+    help = 'Recompute search vectors (or search terms) of every thread'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int, default=1000,
+            help='Number of threads to reindex per transaction',
+        )
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        last_pk = 0
+        indexed = 0
+
+        while True:
+            threads = list(
+                Thread.objects
+                .filter(pk__gt=last_pk)
+                .order_by('pk')
+                .only('pk', 'title', 'content')[:chunk_size]
+            )
+            if not threads:
+                break
+
+            with transaction.atomic():
+                self.reindex(threads)
+            indexed += len(threads)
+            last_pk = threads[-1].pk
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Reindexed {indexed} threads'
+        ))
+
+    def reindex(self, threads):
+        """Reindex one chunk of threads"""
+        pks = [thread.pk for thread in threads]
+        if search.uses_search_vector():
+            # Touching the title fires the search_vector trigger
+            Thread.objects.filter(pk__in=pks).update(title=F('title'))
+            return
+
+        SearchTerm.objects.filter(thread__in=pks).delete()
+        SearchTerm.objects.bulk_create([
+            SearchTerm(term=term, thread=thread, weight=weight)
+            for thread in threads
+            for term, weight in search.thread_terms(
+                thread.title, thread.content
+            ).items()
+        ])
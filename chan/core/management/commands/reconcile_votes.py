@@ -0,0 +1,106 @@
+from django.db import transaction
+from django.db.models import Count, Q
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.models import Thread, Vote, Change, hot_score
+
+from shitchan import catalog
+from shitchan.cache import board_threads_scope, bump_version
+
+
+class Command(BaseCommand):
+    """Django command to fix drifted denormalized vote counters"""
+    help = 'Recount votes of every thread and fix drifted ones'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int, default=1000,
+            help='Number of threads to recount per query',
+        )
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        last_pk = 0
+        checked = fixed = 0
+
+        while True:
+            with transaction.atomic():
+                checked_chunk, drifted = self.reconcile_chunk(
+                    last_pk, chunk_size
+                )
+            if not checked_chunk:
+                break
+
+            checked += len(checked_chunk)
+            fixed += drifted
+            last_pk = checked_chunk[-1]
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Checked {checked} threads, fixed {fixed} drifted counters'
+        ))
+
+    def reconcile_chunk(self, last_pk, chunk_size):
+        """Lock the next chunk of threads (votes are cast with their
+        thread locked, so the counts can't change meanwhile), fix their
+        drifted counters and hot scores, and return (checked thread
+        ids, number fixed). Fixed threads are logged as changed, and
+        their listings and catalog entries updated on commit, like
+        votes do."""
+        pks = list(
+            Thread.objects.select_for_update()
+            .filter(pk__gt=last_pk)
+            .order_by('pk')
+            .values_list('pk', flat=True)[:chunk_size]
+        )
+        if not pks:
+            return pks, 0
+
+        threads = Thread.objects.filter(pk__in=pks).annotate(
+            real_up=Count('vote', filter=Q(vote__value=Vote.UP)),
+            real_down=Count('vote', filter=Q(vote__value=Vote.DOWN)),
+        ).only(
+            'pk', 'upvote_count', 'downvote_count', 'score',
+            'date_created', 'board_id'
+        )
+
+        now = timezone.now()
+        drifted = []
+        for thread in threads:
+            real = (
+                thread.real_up,
+                thread.real_down,
+                thread.real_up - thread.real_down,
+            )
+            if real != (
+                thread.upvote_count, thread.downvote_count, thread.score
+            ):
+                self.patch_catalog(thread, real[2] - thread.score)
+                (
+                    thread.upvote_count,
+                    thread.downvote_count,
+                    thread.score,
+                ) = real
+                thread.hot_score = hot_score(
+                    thread.score, thread.date_created, now
+                )
+                drifted.append(thread)
+
+        Thread.objects.bulk_update(
+            drifted, ['upvote_count', 'downvote_count', 'score', 'hot_score']
+        )
+        Change.objects.record(Change.THREAD, {
+            thread.pk: thread.board_id for thread in drifted
+        })
+        for board_id in {thread.board_id for thread in drifted}:
+            bump_version(board_threads_scope(board_id))
+
+        return pks, len(drifted)
+
+    def patch_catalog(self, thread, delta):
+        """Add the score correction of thread to the board catalog once
+        the fix is committed"""
+        board_id, thread_id = thread.board_id, thread.pk
+        transaction.on_commit(
+            lambda: catalog.add_score(board_id, thread_id, delta)
+        )
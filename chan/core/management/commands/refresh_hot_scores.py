@@ -0,0 +1,58 @@
+from django.db import transaction
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.models import Thread, hot_score
+
+from shitchan.cache import board_threads_scope, bump_version
+
+
+class Command(BaseCommand):
+    """Django command to apply time decay to hot scores of threads"""
+    help = 'Recompute the materialized hot score of every thread'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int, default=1000,
+            help='Number of threads to recompute per query',
+        )
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        last_pk = 0
+        refreshed = 0
+
+        while True:
+            with transaction.atomic():
+                threads = self.refresh_chunk(last_pk, chunk_size)
+            if not threads:
+                break
+
+            refreshed += len(threads)
+            last_pk = threads[-1].pk
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Refreshed hot score of {refreshed} threads'
+        ))
+
+    def refresh_chunk(self, last_pk, chunk_size):
+        """Recompute hot scores of the next chunk of threads, locked so
+        a vote can't change their score between read and write, and
+        invalidate the thread listings of their boards on commit (the
+        catalog has no hot score)"""
+        now = timezone.now()
+        threads = list(
+            Thread.objects.select_for_update()
+            .filter(pk__gt=last_pk)
+            .order_by('pk')
+            .only('pk', 'score', 'date_created', 'board_id')[:chunk_size]
+        )
+        for thread in threads:
+            thread.hot_score = hot_score(
+                thread.score, thread.date_created, now
+            )
+        Thread.objects.bulk_update(threads, ['hot_score'])
+        for board_id in {thread.board_id for thread in threads}:
+            bump_version(board_threads_scope(board_id))
+
+        return threads
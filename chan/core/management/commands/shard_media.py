@@ -0,0 +1,142 @@
+import os
+
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.models import (
+    User, Board, Thread, MediaFile, sharded_path, unsharded_path
+)
+
+from shitchan.catalog import catalog_key
+
+
+AVATAR_DIR = 'uploads/avatar'
+THREAD_DIR = 'uploads/thread'
+
+
+class Command(BaseCommand):
+    """Django command to move flat uploads into the sharded layout.
+
+    Rows are walked in primary-key chunks and only unsharded names are
+    moved, so an interrupted run can simply be started again."""
+    help = 'Move avatars and thread images into sharded directories'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Number of rows to migrate per transaction',
+        )
+
+    def handle(self, *args, **options):
+        self.batch_size = options['batch_size']
+        self.moved = 0
+
+        avatars = self.migrate(User, ['avatar'], self.migrate_user)
+        threads = self.migrate(
+            Thread, ['image', 'image_variants'], self.migrate_thread
+        )
+        if threads:
+            cache.delete_many([
+                catalog_key(pk)
+                for pk in Board.objects.values_list('pk', flat=True)
+            ])
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Updated {avatars} users and {threads} threads, '
+            f'moved {self.moved} files'
+        ))
+
+    def migrate(self, model, fields, migrate_row):
+        """Walk model rows in chunks applying migrate_row to each,
+        return number of updated rows"""
+        last_pk = 0
+        updated = 0
+        while True:
+            rows = list(
+                model.objects.filter(pk__gt=last_pk)
+                .order_by('pk')
+                .values_list('pk', *fields)[:self.batch_size]
+            )
+            if not rows:
+                return updated
+
+            with transaction.atomic():
+                for row in rows:
+                    changes = migrate_row(*row[1:])
+                    if changes:
+                        model.objects.filter(pk=row[0]).update(**changes)
+                        updated += 1
+
+            last_pk = rows[-1][0]
+
+    def migrate_user(self, avatar):
+        """Return changed fields of a user row"""
+        name = self.shard(avatar, AVATAR_DIR)
+        if name != avatar:
+            return {'avatar': name}
+
+    def migrate_thread(self, image, variants):
+        """Return changed fields of a thread row"""
+        changes = {}
+        name = self.shard(image, THREAD_DIR)
+        if name != image:
+            changes['image'] = name
+
+        new_variants = {}
+        for key, value in variants.items():
+            if key == 'source':
+                new_variants[key] = self.shard(value, THREAD_DIR)
+            else:
+                new_variants[key] = {
+                    ext: self.shard(variant, THREAD_DIR)
+                    for ext, variant in value.items()
+                }
+        if new_variants != variants:
+            changes['image_variants'] = new_variants
+
+        return changes
+
+    def shard(self, name, root):
+        """Move file name under root into its sharded location
+        and return the new name"""
+        if not name or not name.startswith(f'{root}/'):
+            return name
+
+        directory, filename = unsharded_path(name)
+        new_name = sharded_path(directory, filename)
+        if new_name == name:
+            return name
+
+        source = default_storage.path(name)
+        target = default_storage.path(new_name)
+        if os.path.exists(source):
+            if os.path.exists(target):
+                os.remove(source)
+            else:
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                os.replace(source, target)
+            self.moved += 1
+        elif not os.path.exists(target):
+            self.stderr.write(f'Missing file {name}, left unchanged')
+            return name
+
+        self.rename_media(name, new_name)
+
+        return new_name
+
+    def rename_media(self, name, new_name):
+        """Move the reference count of name over to new_name"""
+        media = MediaFile.objects.filter(name=name).first()
+        if media is None:
+            return
+
+        existing = MediaFile.objects.filter(name=new_name).first()
+        if existing is None:
+            media.name = new_name
+            media.save(update_fields=['name'])
+        else:
+            existing.ref_count += media.ref_count
+            existing.save(update_fields=['ref_count'])
+            media.delete()
@@ -2,22 +2,42 @@ import time
 
 from django.db import connections
 from django.db.utils import OperationalError
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 
 
 class Command(BaseCommand):
     """Django command to pause execution until database is available"""
 
-    def handle(self, *args, **kwargs):
-        self.stdout.write('Waiting for databse...')
-        db_conn = None
-        while not db_conn:
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--timeout', type=float, default=60,
+            help='Seconds to wait before giving up',
+        )
+        parser.add_argument(
+            '--max-delay', type=float, default=5,
+            help='Longest pause between two attempts in seconds',
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write('Waiting for database...')
+        deadline = time.monotonic() + options['timeout']
+        delay = 0.1
+        while True:
             try:
-                db_conn = connections['default']
-            except OperationalError:
+                with connections['default'].cursor() as cursor:
+                    cursor.execute('SELECT 1')
+                    cursor.fetchone()
+                break
+            except OperationalError as error:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise CommandError(f'Database unavailable: {error}')
+
+                delay = min(delay, remaining)
                 self.stdout.write(
-                    'Database unavailable, waiting for 1 second...'
+                    f'Database unavailable, waiting for {delay:.1f} seconds...'
                 )
-                time.sleep(1)
+                time.sleep(delay)
+                delay = min(delay * 2, options['max_delay'])
 
         self.stdout.write(self.style.SUCCESS('Database available!'))
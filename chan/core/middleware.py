@@ -0,0 +1,92 @@
+import hashlib
+import logging
+import re
+import time
+
+from collections import Counter
+from contextlib import ExitStack
+
+from django.db import connections
+
+
+logger = logging.getLogger(__name__)
+
+_in_list_re = re.compile(r'IN \((?:%s, )*%s\)')
+_literal_re = re.compile(r"'(?:[^']|'')*'|\b\d+\b")
+
+
+def fingerprint(sql):
+    """Return a short fingerprint of sql shared by every execution of
+    the same statement, whatever its parameters and IN list lengths"""
+    normalized = _in_list_re.sub('IN (...)', sql)
+    normalized = _literal_re.sub('?', normalized)
+
+    return hashlib.md5(normalized.encode()).hexdigest()[:8]
+
+
+class QueryStats:
+    """Database execute wrapper counting and timing queries"""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.fingerprints = Counter()
+        self.samples = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+            key = fingerprint(sql)
+            self.fingerprints[key] += 1
+            self.samples.setdefault(key, sql)
+
+    def duplicates(self):
+        """Return {fingerprint: count} of statements run more than once"""
+        return {
+            key: count
+            for key, count in self.fingerprints.most_common() if count > 1
+        }
+
+
+class QueryInstrumentationMiddleware:
+    """Record query count, database time and duplicated statements of
+    every request (through execute wrappers, so DEBUG can stay off).
+    They are sent in the Server-Timing header and logged by
+    ``core.middleware``: one INFO line per request, WARNING when a
+    statement ran more than once (a likely N+1)."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        stats = QueryStats()
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(stats))
+            response = self.get_response(request)
+        total = time.perf_counter() - start
+
+        response['Server-Timing'] = (
+            f'db;dur={stats.duration * 1000:.3f};desc="{stats.count} queries"'
+            f', total;dur={total * 1000:.3f}'
+        )
+
+        duplicates = stats.duplicates()
+        logger.log(
+            logging.WARNING if duplicates else logging.INFO,
+            'method=%s path=%s status=%s queries=%d db_ms=%.3f '
+            'total_ms=%.3f duplicates=%s',
+            request.method, request.path, response.status_code,
+            stats.count, stats.duration * 1000, total * 1000,
+            ','.join(f'{key}:{count}' for key, count in duplicates.items())
+            or '-',
+        )
+        for key in duplicates:
+            logger.debug('duplicate %s: %s', key, stats.samples[key])
+
+        return response
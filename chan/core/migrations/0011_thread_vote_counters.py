@@ -0,0 +1,28 @@
+# Generated by Django 3.1.14 on 2026-10-16 20:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_thread'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='thread',
+            name='downvote_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='thread',
+            name='score',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='thread',
+            name='upvote_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,94 @@
+# Generated by Django 3.1.14 on 2026-10-16 20:30
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+BATCH_SIZE = 1000
+
+
+def copy_votes_forward(apps, schema_editor):
+    """Move rows of the upvote/downvote M2M tables into Vote.
+    Users sitting in both tables keep their upvote."""
+    Thread = apps.get_model('core', 'Thread')
+    Vote = apps.get_model('core', 'Vote')
+    db = schema_editor.connection.alias
+
+    for relation, value in (('upvote', 1), ('downvote', -1)):
+        through = getattr(Thread, relation).through
+        rows = through.objects.using(db).values_list(
+            'thread_id', 'user_id'
+        ).iterator(chunk_size=BATCH_SIZE)
+        batch = []
+        for thread_id, user_id in rows:
+            batch.append(
+                Vote(thread_id=thread_id, user_id=user_id, value=value)
+            )
+            if len(batch) >= BATCH_SIZE:
+                Vote.objects.using(db).bulk_create(
+                    batch, ignore_conflicts=True
+                )
+                batch = []
+        Vote.objects.using(db).bulk_create(batch, ignore_conflicts=True)
+
+
+def copy_votes_backward(apps, schema_editor):
+    """Move Vote rows back into the upvote/downvote M2M tables"""
+    Thread = apps.get_model('core', 'Thread')
+    Vote = apps.get_model('core', 'Vote')
+    db = schema_editor.connection.alias
+
+    for relation, value in (('upvote', 1), ('downvote', -1)):
+        through = getattr(Thread, relation).through
+        rows = Vote.objects.using(db).filter(value=value).values_list(
+            'thread_id', 'user_id'
+        ).iterator(chunk_size=BATCH_SIZE)
+        batch = []
+        for thread_id, user_id in rows:
+            batch.append(through(thread_id=thread_id, user_id=user_id))
+            if len(batch) >= BATCH_SIZE:
+                through.objects.using(db).bulk_create(batch)
+                batch = []
+        through.objects.using(db).bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_thread_vote_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Vote',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('value', models.SmallIntegerField(choices=[(1, 'up'), (-1, 'down'), (0, 'retracted')])),
+                ('thread', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.thread')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='vote',
+            constraint=models.UniqueConstraint(fields=('thread', 'user'), name='unique_thread_user_vote'),
+        ),
+        migrations.AddConstraint(
+            model_name='vote',
+            constraint=models.CheckConstraint(check=models.Q(value__in=[1, -1, 0]), name='valid_vote_value'),
+        ),
+        migrations.RunPython(copy_votes_forward, copy_votes_backward),
+        migrations.RemoveField(
+            model_name='thread',
+            name='downvote',
+        ),
+        migrations.RemoveField(
+            model_name='thread',
+            name='upvote',
+        ),
+        migrations.AddField(
+            model_name='thread',
+            name='voters',
+            field=models.ManyToManyField(related_name='voted_threads', through='core.Vote', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 3.1.14 on 2026-10-16 20:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_vote'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='thread',
+            index=models.Index(fields=['board', '-date_created', '-id'], name='thread_board_created_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.1.14 on 2026-10-16 20:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_thread_board_created_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='thread',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
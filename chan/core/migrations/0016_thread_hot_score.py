@@ -0,0 +1,22 @@
+# Generated by Django 3.1.14 on 2026-10-16 20:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_mediafile'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='thread',
+            name='hot_score',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='thread',
+            index=models.Index(fields=['board', '-hot_score', '-id'], name='thread_board_hot_idx'),
+        ),
+    ]
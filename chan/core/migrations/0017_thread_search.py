@@ -0,0 +1,76 @@
+# Generated by Django 3.1.14 on 2026-10-16 20:46
+
+import django.contrib.postgres.search
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# Keep the weights and configuration in sync with shitchan.search
+CREATE_SEARCH_TRIGGER = """
+CREATE FUNCTION core_thread_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('english', coalesce(NEW.title, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(NEW.content, '')), 'B');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER core_thread_search_vector_trigger
+    BEFORE INSERT OR UPDATE OF title, content ON core_thread
+    FOR EACH ROW EXECUTE PROCEDURE core_thread_search_vector_update();
+
+UPDATE core_thread SET title = title;
+
+CREATE INDEX thread_search_vector_idx
+    ON core_thread USING gin (search_vector);
+"""
+
+DROP_SEARCH_TRIGGER = """
+DROP INDEX IF EXISTS thread_search_vector_idx;
+DROP TRIGGER IF EXISTS core_thread_search_vector_trigger ON core_thread;
+DROP FUNCTION IF EXISTS core_thread_search_vector_update();
+"""
+
+
+def create_search_trigger(apps, schema_editor):
+    """Maintain search_vector by trigger and index it with GIN.
+    Other databases use the SearchTerm table (manage.py
+    rebuild_search_index fills it for existing threads)."""
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(CREATE_SEARCH_TRIGGER)
+
+
+def drop_search_trigger(apps, schema_editor):
+    """Drop the search_vector trigger and index"""
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(DROP_SEARCH_TRIGGER)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_thread_hot_score'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='thread',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.CreateModel(
+            name='SearchTerm',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64)),
+                ('weight', models.FloatField()),
+                ('thread', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_terms', to='core.thread')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='searchterm',
+            constraint=models.UniqueConstraint(fields=('term', 'thread'), name='unique_search_term_thread'),
+        ),
+        migrations.RunPython(create_search_trigger, drop_search_trigger),
+    ]
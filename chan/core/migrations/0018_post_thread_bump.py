@@ -0,0 +1,60 @@
+# Generated by Django 3.1.14 on 2026-10-16 20:58
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+def bump_at_creation(apps, schema_editor):
+    """Existing threads have no replies, they were last bumped
+    when created"""
+    Thread = apps.get_model('core', 'Thread')
+    Thread.objects.update(last_bumped_at=models.F('date_created'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0017_thread_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Post',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content', models.TextField()),
+                ('date_created', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='thread',
+            name='last_bumped_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddField(
+            model_name='thread',
+            name='reply_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(bump_at_creation, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='thread',
+            index=models.Index(fields=['board', '-last_bumped_at', '-id'], name='thread_board_bumped_idx'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='thread',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='replies', to='core.thread'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['thread', 'date_created', 'id'], name='post_thread_created_idx'),
+        ),
+    ]
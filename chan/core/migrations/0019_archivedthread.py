@@ -0,0 +1,36 @@
+# Generated by Django 3.1.14 on 2026-10-16 21:01
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0018_post_thread_bump'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='board',
+            name='max_threads',
+            field=models.PositiveIntegerField(default=150),
+        ),
+        migrations.CreateModel(
+            name='ArchivedThread',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('thread_id', models.PositiveIntegerField(unique=True)),
+                ('title', models.CharField(max_length=255)),
+                ('data', models.JSONField()),
+                ('date_created', models.DateTimeField()),
+                ('last_bumped_at', models.DateTimeField()),
+                ('date_archived', models.DateTimeField(auto_now_add=True)),
+                ('board', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.board')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='archivedthread',
+            index=models.Index(fields=['board', '-last_bumped_at', '-id'], name='archive_board_bumped_idx'),
+        ),
+    ]
@@ -0,0 +1,93 @@
+# Generated by Django 3.1.14 on 2026-10-16 21:15
+
+import itertools
+
+from django.db import migrations, models
+
+
+# Keep the sequence name in sync with core.models.Change
+CREATE_POSITION_SEQUENCE = """
+CREATE SEQUENCE core_change_position_seq;
+
+INSERT INTO core_change
+    (kind, object_id, board_id, deleted, position, transaction_id)
+SELECT 'board', id, NULL, false, nextval('core_change_position_seq'), 0
+FROM core_board;
+
+INSERT INTO core_change
+    (kind, object_id, board_id, deleted, position, transaction_id)
+SELECT 'thread', id, board_id, false, nextval('core_change_position_seq'), 0
+FROM core_thread;
+"""
+
+DROP_POSITION_SEQUENCE = """
+DROP SEQUENCE IF EXISTS core_change_position_seq;
+"""
+
+
+def record_existing(apps, schema_editor):
+    """Log the existing boards and threads (as changed at the start
+    of the log) so that a delta from no cursor is a full sync"""
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(CREATE_POSITION_SEQUENCE)
+        return
+
+    Change = apps.get_model('core', 'Change')
+    Board = apps.get_model('core', 'Board')
+    Thread = apps.get_model('core', 'Thread')
+    rows = itertools.chain(
+        (
+            ('board', pk, None) for pk in
+            Board.objects.order_by('pk').values_list('pk', flat=True)
+        ),
+        Thread.objects.order_by('pk').annotate(
+            kind=models.Value('thread', output_field=models.CharField())
+        ).values_list('kind', 'pk', 'board_id').iterator(chunk_size=2000),
+    )
+    batch = []
+    for position, (kind, object_id, board_id) in enumerate(rows, 1):
+        batch.append(Change(
+            kind=kind, object_id=object_id, board_id=board_id,
+            position=position,
+        ))
+        if len(batch) == 2000:
+            Change.objects.bulk_create(batch)
+            batch = []
+    Change.objects.bulk_create(batch)
+
+
+def drop_position_sequence(apps, schema_editor):
+    """Drop the position sequence"""
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(DROP_POSITION_SEQUENCE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0019_archivedthread'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Change',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('board', 'board'), ('thread', 'thread')], max_length=8)),
+                ('object_id', models.PositiveIntegerField()),
+                ('board_id', models.PositiveIntegerField(null=True)),
+                ('deleted', models.BooleanField(default=False)),
+                ('position', models.BigIntegerField()),
+                ('transaction_id', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='change',
+            index=models.Index(fields=['kind', 'board_id', 'transaction_id', 'position'], name='change_scope_position_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='change',
+            constraint=models.UniqueConstraint(fields=('kind', 'object_id'), name='unique_change_object'),
+        ),
+        migrations.RunPython(record_existing, drop_position_sequence),
+    ]
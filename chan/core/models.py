@@ -1,7 +1,15 @@
+import itertools
 import uuid
 import os
 
-from django.db import models
+from django.db import models, transaction, connections
+from django.db.models import (
+    F, Q, Max, FloatField, ExpressionWrapper, Case, When, Value, Window
+)
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Greatest, RowNumber
+from django.utils import timezone
+from django.contrib.postgres.search import SearchVectorField
 from django.contrib.auth.models import (
     AbstractBaseUser,
     PermissionsMixin,
@@ -9,21 +17,78 @@ from django.contrib.auth.models import (
 )
 from django.conf import settings
 
+from core.signals import vote_changed
+
+
+SHARD_DEPTH = 2
+SHARD_WIDTH = 2
+
+
+def sharded_path(directory, filename):
+    """Spread files of directory into a fan-out of sub-directories
+    named by the leading characters of filename (e.g. ab/cd/abcd...)"""
+    shards = [
+        filename[i * SHARD_WIDTH:(i + 1) * SHARD_WIDTH]
+        for i in range(SHARD_DEPTH)
+    ]
+
+    return os.path.join(directory, *shards, filename)
+
+
+def unsharded_path(name):
+    """Return (directory, filename) of name without its shard
+    sub-directories (if it has them)"""
+    filename = os.path.basename(name)
+    directory = os.path.dirname(name)
+    for _ in range(SHARD_DEPTH):
+        directory = os.path.dirname(directory)
+
+    if sharded_path(directory, filename) == name:
+        return directory, filename
+
+    return os.path.dirname(name), filename
+
 
 def avatar_file_path(instance, filename):
     """Generating a file path for avatar image"""
     ext = filename.split('.')[-1]
     filename = f'{uuid.uuid4()}.{ext}'
 
-    return os.path.join('uploads/avatar/', filename)
+    return sharded_path('uploads/avatar/', filename)
 
 
 def thread_image_file_path(instance, filename):
-    """Generating a file path for avatar image"""
+    """Generating a file path for thread image"""
     ext = filename.split('.')[-1]
     filename = f'{uuid.uuid4()}.{ext}'
 
-    return os.path.join('uploads/thread/', filename)
+    return sharded_path('uploads/thread/', filename)
+
+
+HOT_GRAVITY = 1.8
+
+
+def hot_decay(date_created, now=None):
+    """Return the time decay divisor of a thread created at date_created"""
+    now = now or timezone.now()
+    age_hours = max((now - date_created).total_seconds(), 0) / 3600
+
+    return (age_hours + 2) ** HOT_GRAVITY
+
+
+def hot_score(score, date_created, now=None):
+    """Return the "hot" rank of a thread: its score (plus one, so fresh
+    threads without votes still rank) decaying with age"""
+    return (score + 1) / hot_decay(date_created, now)
+
+
+class MediaFile(models.Model):
+    """Reference count of a file in the content addressed storage"""
+    name = models.CharField(max_length=255, unique=True)
+    ref_count = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return self.name
 
 
 class UserManager(BaseUserManager):
@@ -85,6 +150,7 @@ class Board(models.Model):
     )
     title = models.CharField(max_length=255, unique=True)
     code = models.CharField(max_length=4, unique=True)
+    max_threads = models.PositiveIntegerField(default=150)
     date_created = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
@@ -99,14 +165,511 @@ class Thread(models.Model):
     title = models.CharField(max_length=255)
     content = models.TextField()
     image = models.ImageField(upload_to=thread_image_file_path, null=True)
-    upvote = models.ManyToManyField(
-        settings.AUTH_USER_MODEL, related_name='user_upvote'
+    image_variants = models.JSONField(default=dict, blank=True)
+    voters = models.ManyToManyField(
+        settings.AUTH_USER_MODEL,
+        through='Vote',
+        related_name='voted_threads'
+    )
+    upvote_count = models.PositiveIntegerField(default=0)
+    downvote_count = models.PositiveIntegerField(default=0)
+    score = models.IntegerField(default=0)
+    hot_score = models.FloatField(default=0)
+    search_vector = SearchVectorField(null=True, editable=False)
+    reply_count = models.PositiveIntegerField(default=0)
+    last_bumped_at = models.DateTimeField(default=timezone.now)
+    date_created = models.DateTimeField(auto_now_add=True)
+    board = models.ForeignKey('Board', on_delete=models.CASCADE)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['board', '-date_created', '-id'],
+                name='thread_board_created_idx'
+            ),
+            models.Index(
+                fields=['board', '-hot_score', '-id'],
+                name='thread_board_hot_idx'
+            ),
+            models.Index(
+                fields=['board', '-last_bumped_at', '-id'],
+                name='thread_board_bumped_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return self.title
+
+    def save(self, *args, **kwargs):
+        """Rank new threads as hot as their age allows"""
+        if self._state.adding:
+            self.hot_score = hot_score(
+                self.score, self.date_created or timezone.now()
+            )
+
+        super().save(*args, **kwargs)
+
+    def vote(self, user, value):
+        """Cast (1 or -1) or retract (0) a vote of user on this thread,
+        keeping the denormalized counters in sync"""
+        return Vote.objects.cast(self, user, value)
+
+    def reply(self, user, content):
+        """Create a reply of user bumping this thread"""
+        return Post.objects.reply(self, user, content)
+
+
+class VoteManager(models.Manager):
+    """Manager for upserting votes and their thread counters"""
+
+    def cast(self, thread, user, value):
+        """Cast, switch or retract a vote with a single upsert
+        and return the previous vote value"""
+        if value not in Vote.VALUES:
+            raise ValueError('Vote value must be 1, -1 or 0!')
+
+        connection = connections[self.db]
+        with transaction.atomic(using=self.db):
+            self._lock_threads([thread])
+            if connection.vendor == 'postgresql':
+                previous = self._upsert(connection, thread, user, value)
+            else:
+                previous = self._upsert_fallback(thread, user, value)
+
+            if previous != value:
+                self._update_counters([(thread, value, previous)])
+                vote_changed.send(
+                    sender=Vote, thread=thread, user=user,
+                    value=value, previous=previous
+                )
+
+        return previous
+
+    def cast_many(self, user, votes):
+        """Apply votes of user given as {thread: value} in one
+        transaction with a constant number of queries and return
+        {thread: previous vote value}"""
+        if any(value not in Vote.VALUES for value in votes.values()):
+            raise ValueError('Vote value must be 1, -1 or 0!')
+
+        with transaction.atomic(using=self.db):
+            self._lock_threads(votes)
+            existing = dict(
+                self.select_for_update()
+                .filter(user=user, thread__in=list(votes))
+                .values_list('thread_id', 'value')
+            )
+            previous = {
+                thread: existing.get(thread.pk, Vote.RETRACTED)
+                for thread in votes
+            }
+            self.bulk_create(
+                [
+                    Vote(thread=thread, user=user, value=value)
+                    for thread, value in votes.items()
+                    if thread.pk not in existing
+                ],
+                ignore_conflicts=True
+            )
+
+            changes = [
+                (thread, value, previous[thread])
+                for thread, value in votes.items()
+                if value != previous[thread]
+            ]
+            switched = [
+                (thread, value) for thread, value, _ in changes
+                if thread.pk in existing
+            ]
+            if switched:
+                self.filter(
+                    user=user, thread__in=[thread for thread, _ in switched]
+                ).update(value=Case(
+                    *[
+                        When(thread_id=thread.pk, then=Value(value))
+                        for thread, value in switched
+                    ],
+                    output_field=models.SmallIntegerField()
+                ))
+
+            if changes:
+                self._update_counters(changes)
+                for thread, value, old in changes:
+                    vote_changed.send(
+                        sender=Vote, thread=thread, user=user,
+                        value=value, previous=old
+                    )
+
+        return previous
+
+    def _lock_threads(self, threads):
+        """Lock rows of threads (in id order, so batches can't deadlock)
+        until the end of the transaction. A missing vote has no row to
+        lock, so this is what keeps concurrent first votes of a user
+        from both reading "no previous vote"."""
+        list(
+            Thread.objects.using(self.db).select_for_update()
+            .filter(pk__in=[thread.pk for thread in threads])
+            .order_by('pk').values_list('pk', flat=True)
+        )
+
+    def _update_counters(self, changes):
+        """Apply vote changes given as [(thread, value, previous)]
+        to the denormalized counters of their threads in one UPDATE,
+        and log the threads as changed"""
+        def per_thread(delta, output_field=models.IntegerField(), default=0):
+            return Case(
+                *[
+                    When(pk=thread.pk, then=Value(delta(thread, v, p)))
+                    for thread, v, p in changes
+                ],
+                default=Value(default),
+                output_field=output_field
+            )
+
+        def with_delta(field, delta):
+            return ExpressionWrapper(
+                F(field) + per_thread(delta),
+                output_field=models.IntegerField()
+            )
+
+        Thread.objects.using(self.db).filter(
+            pk__in=[thread.pk for thread, _, _ in changes]
+        ).update(
+            upvote_count=with_delta(
+                'upvote_count',
+                lambda t, v, p: (v == Vote.UP) - (p == Vote.UP)
+            ),
+            downvote_count=with_delta(
+                'downvote_count',
+                lambda t, v, p: (v == Vote.DOWN) - (p == Vote.DOWN)
+            ),
+            score=with_delta('score', lambda t, v, p: v - p),
+            hot_score=ExpressionWrapper(
+                (with_delta('score', lambda t, v, p: v - p) + 1)
+                / per_thread(
+                    lambda t, v, p: hot_decay(t.date_created),
+                    output_field=FloatField(),
+                    default=1.0
+                ),
+                output_field=FloatField()
+            ),
+        )
+        Change.objects.db_manager(self.db).record(Change.THREAD, {
+            thread.pk: thread.board_id for thread, _, _ in changes
+        })
+
+    def _upsert(self, connection, thread, user, value):
+        """INSERT ... ON CONFLICT DO UPDATE returning the previous value
+        in the same round-trip (the thread must be locked)"""
+        table = connection.ops.quote_name(self.model._meta.db_table)
+        sql = f"""
+            WITH previous AS (
+                SELECT value FROM {table}
+                WHERE thread_id = %s AND user_id = %s
+                FOR UPDATE
+            ), upsert AS (
+                INSERT INTO {table} (thread_id, user_id, value)
+                VALUES (%s, %s, %s)
+                ON CONFLICT (thread_id, user_id)
+                DO UPDATE SET value = EXCLUDED.value
+            )
+            SELECT value FROM previous
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(
+                sql, [thread.pk, user.pk, thread.pk, user.pk, value]
+            )
+            row = cursor.fetchone()
+
+        return row[0] if row else Vote.RETRACTED
+
+    def _upsert_fallback(self, thread, user, value):
+        """Portable upsert for backends without ON CONFLICT support"""
+        vote = self.select_for_update().filter(
+            thread=thread, user=user
+        ).first()
+        if vote is None:
+            self.create(thread=thread, user=user, value=value)
+            return Vote.RETRACTED
+
+        if vote.value != value:
+            self.filter(pk=vote.pk).update(value=value)
+
+        return vote.value
+
+
+class Vote(models.Model):
+    """Vote of a user on a thread (retracted votes are kept as 0)"""
+    UP = 1
+    DOWN = -1
+    RETRACTED = 0
+    VALUES = (UP, DOWN, RETRACTED)
+
+    thread = models.ForeignKey('Thread', on_delete=models.CASCADE)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE
+    )
+    value = models.SmallIntegerField(
+        choices=[(UP, 'up'), (DOWN, 'down'), (RETRACTED, 'retracted')]
     )
-    downvote = models.ManyToManyField(
-        settings.AUTH_USER_MODEL, related_name='user_downvote'
+
+    objects = VoteManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['thread', 'user'], name='unique_thread_user_vote'
+            ),
+            models.CheckConstraint(
+                check=models.Q(value__in=[1, -1, 0]), name='valid_vote_value'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.user} {self.value:+d} {self.thread}'
+
+
+class SearchTerm(models.Model):
+    """Inverted index entry of a thread, used for full-text search
+    on databases without tsvector support (see shitchan.search)"""
+    term = models.CharField(max_length=64)
+    thread = models.ForeignKey(
+        'Thread', on_delete=models.CASCADE, related_name='search_terms'
+    )
+    weight = models.FloatField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['term', 'thread'], name='unique_search_term_thread'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.term} {self.thread_id}'
+
+
+class PostManager(models.Manager):
+    """Manager for replies and their thread counters"""
+
+    def reply(self, thread, user, content):
+        """Create a reply, bumping thread and counting the reply
+        in the same transaction. Concurrent replies may commit out of
+        order, so the bump never moves last_bumped_at backwards.
+        The thread is locked first, raise Thread.DoesNotExist if it
+        has been deleted or archived meanwhile."""
+        with transaction.atomic(using=self.db):
+            locked = Thread.objects.using(self.db).select_for_update() \
+                .filter(pk=thread.pk).values_list('pk', flat=True)
+            if not locked:
+                raise Thread.DoesNotExist('Thread no longer exists.')
+
+            post = self.create(thread=thread, user=user, content=content)
+            Thread.objects.using(self.db).filter(pk=thread.pk).update(
+                reply_count=F('reply_count') + 1,
+                last_bumped_at=Greatest(
+                    F('last_bumped_at'), Value(post.date_created)
+                ),
+            )
+            Change.objects.db_manager(self.db).record(
+                Change.THREAD, {thread.pk: thread.board_id}
+            )
+
+        thread.reply_count += 1
+        thread.last_bumped_at = max(thread.last_bumped_at, post.date_created)
+
+        return post
+
+    def last_replies(self, thread_ids, count):
+        """Return {thread id: [last count replies, oldest first]} of
+        threads in one query"""
+        ranked = self.filter(thread_id__in=thread_ids).annotate(
+            reply_rank=Window(
+                RowNumber(),
+                partition_by=[F('thread_id')],
+                order_by=[F('date_created').desc(), F('id').desc()],
+            )
+        ).values('id', 'reply_rank')
+        sql, params = ranked.query.sql_with_params()
+        latest = RawSQL(
+            f'SELECT ranked.id FROM ({sql}) ranked '
+            f'WHERE ranked.reply_rank <= %s',
+            (*params, count)
+        )
+
+        replies = {thread_id: [] for thread_id in thread_ids}
+        posts = self.filter(id__in=latest).select_related('user').order_by(
+            'date_created', 'id'
+        )
+        for post in posts:
+            replies[post.thread_id].append(post)
+
+        return replies
+
+
+class Post(models.Model):
+    """Reply to a thread"""
+    thread = models.ForeignKey(
+        'Thread', on_delete=models.CASCADE, related_name='replies'
+    )
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE
     )
+    content = models.TextField()
     date_created = models.DateTimeField(auto_now_add=True)
+
+    objects = PostManager()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['thread', 'date_created', 'id'],
+                name='post_thread_created_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.thread_id}: {self.content[:50]}'
+
+
+class ArchivedThread(models.Model):
+    """Thread pruned from its board, kept read-only with its replies.
+    Columns needed for listing are kept, the rest is packed in data."""
+    thread_id = models.PositiveIntegerField(unique=True)
     board = models.ForeignKey('Board', on_delete=models.CASCADE)
+    title = models.CharField(max_length=255)
+    data = models.JSONField()
+    date_created = models.DateTimeField()
+    last_bumped_at = models.DateTimeField()
+    date_archived = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['board', '-last_bumped_at', '-id'],
+                name='archive_board_bumped_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.title
+
+
+class ChangeManager(models.Manager):
+    """Manager of the change log of boards and threads"""
+
+    def record(self, kind, changed, deleted=False):
+        """Move objects given as {object id: board id} to the head of
+        the change log (as tombstones if deleted)"""
+        if not changed:
+            return
+
+        connection = connections[self.db]
+        if connection.vendor == 'postgresql':
+            self._record(connection, kind, changed, deleted)
+        else:
+            self._record_fallback(kind, changed, deleted)
+
+    def _record(self, connection, kind, changed, deleted):
+        """Upsert with a new position and the id of the transaction,
+        in object order so concurrent batches can't deadlock"""
+        table = connection.ops.quote_name(self.model._meta.db_table)
+        values = ', '.join(['(%s, %s)'] * len(changed))
+        sql = f"""
+            INSERT INTO {table}
+                (kind, object_id, board_id, deleted, position,
+                 transaction_id)
+            SELECT %s, changed.object_id, CAST(changed.board_id AS integer),
+                   %s, nextval('{Change.POSITION_SEQUENCE}'), txid_current()
+            FROM (VALUES {values}) AS changed (object_id, board_id)
+            ORDER BY changed.object_id
+            ON CONFLICT (kind, object_id) DO UPDATE SET
+                board_id = EXCLUDED.board_id,
+                deleted = EXCLUDED.deleted,
+                position = EXCLUDED.position,
+                transaction_id = EXCLUDED.transaction_id
+        """
+        params = [
+            kind, deleted,
+            *itertools.chain.from_iterable(sorted(changed.items())),
+        ]
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+
+    def _record_fallback(self, kind, changed, deleted):
+        """Portable version replacing the rows, with positions after the
+        last one (writers are serialized on these backends)"""
+        with transaction.atomic(using=self.db, savepoint=False):
+            last = self.aggregate(last=Max('position'))['last'] or 0
+            self.filter(kind=kind, object_id__in=list(changed)).delete()
+            self.bulk_create([
+                Change(
+                    kind=kind, object_id=object_id, board_id=board_id,
+                    deleted=deleted, position=last + index,
+                )
+                for index, (object_id, board_id)
+                in enumerate(sorted(changed.items()), 1)
+            ])
+
+    def horizon(self):
+        """Return the transaction id below which every transaction has
+        finished, None on backends with serialized writers"""
+        connection = connections[self.db]
+        if connection.vendor != 'postgresql':
+            return None
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT txid_snapshot_xmin(txid_current_snapshot())'
+            )
+            return cursor.fetchone()[0]
+
+    def after(self, cursor, horizon=None):
+        """Return changes after cursor (transaction id, position) made
+        by transactions below horizon, in log order"""
+        transaction_id, position = cursor
+        queryset = self.filter(
+            Q(transaction_id__gt=transaction_id) |
+            Q(transaction_id=transaction_id, position__gt=position)
+        )
+        if horizon is not None:
+            queryset = queryset.filter(transaction_id__lt=horizon)
+
+        return queryset.order_by('transaction_id', 'position')
+
+
+class Change(models.Model):
+    """Last change of a board or thread, read by delta clients.
+    Each object has one row, moved to the head of the log (a new
+    position) on every change and kept as a tombstone on delete."""
+    BOARD = 'board'
+    THREAD = 'thread'
+    POSITION_SEQUENCE = 'core_change_position_seq'
+
+    kind = models.CharField(
+        max_length=8, choices=[(BOARD, 'board'), (THREAD, 'thread')]
+    )
+    object_id = models.PositiveIntegerField()
+    board_id = models.PositiveIntegerField(null=True)
+    deleted = models.BooleanField(default=False)
+    position = models.BigIntegerField()
+    transaction_id = models.BigIntegerField(default=0)
+
+    objects = ChangeManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['kind', 'object_id'], name='unique_change_object'
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['kind', 'board_id', 'transaction_id', 'position'],
+                name='change_scope_position_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.kind} {self.object_id} @{self.position}'
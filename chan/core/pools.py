@@ -0,0 +1,105 @@
+"""Process pools for CPU bound work off the request threads.
+
+Server processes run several threads (gunicorn gthread workers), and
+forking a multithreaded process copies locks other threads happen to
+hold into the child, where nothing ever releases them. Pool processes
+are therefore started from a forkserver, which forks from a clean
+single-threaded process, and set up Django themselves so tasks can be
+functions of modules importing models.
+
+A pool can cap the calls in flight, submit returns None above the cap
+so callers shed load instead of queueing without bound. A pool broken
+by a dying process is dropped and a new one created on next use."""
+import multiprocessing
+import threading
+
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import django
+
+from django.conf import settings
+
+
+def _setup_worker():
+    """Load the apps in a new pool process"""
+    django.setup()
+
+
+class ProcessPool:
+    """Process pool of this process created on first use, with the
+    number of processes given by the setting named setting and, if
+    queue_setting is given, at most that many calls in flight"""
+    start_method = 'forkserver'
+
+    def __init__(self, setting, default=1, queue_setting=None):
+        self.setting = setting
+        self.default = default
+        self.queue_setting = queue_setting
+        self._executor = None
+        self._slots = None
+        self._lock = threading.Lock()
+
+    @property
+    def workers(self):
+        """Return the number of processes (0 runs tasks inline)"""
+        return getattr(settings, self.setting, self.default)
+
+    def get_executor(self):
+        """Return the executor, creating it (and the in-flight cap)
+        on first use"""
+        with self._lock:
+            if self._slots is None and self.queue_setting:
+                self._slots = threading.BoundedSemaphore(
+                    getattr(settings, self.queue_setting)
+                )
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context(
+                        self.start_method
+                    ),
+                    initializer=_setup_worker,
+                )
+
+            return self._executor
+
+    def submit(self, fn, *args):
+        """Schedule fn(*args) in the pool and return its future, or
+        None if the calls in flight are at the cap"""
+        executor = self.get_executor()
+        if self._slots is not None and not self._slots.acquire(False):
+            return None
+
+        try:
+            future = executor.submit(fn, *args)
+        except BrokenProcessPool:
+            self._finished(executor, None)
+            raise
+        future.add_done_callback(
+            lambda future: self._finished(executor, future)
+        )
+
+        return future
+
+    def _finished(self, executor, future):
+        """Free the slot of a call, drop executor if it is broken"""
+        if self._slots is not None:
+            self._slots.release()
+
+        broken = future is None or (
+            not future.cancelled() and
+            isinstance(future.exception(), BrokenProcessPool)
+        )
+        if broken:
+            with self._lock:
+                if self._executor is executor:
+                    self._executor = None
+            executor.shutdown(wait=False)
+
+    def shutdown(self):
+        """Stop the processes, a new pool is created on next use"""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
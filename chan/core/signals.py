@@ -0,0 +1,126 @@
+from django.core.files.storage import default_storage
+from django.core.signals import request_started
+from django.db.models.signals import (
+    post_init, pre_save, post_save, post_delete
+)
+from django.dispatch import Signal, receiver
+
+from core import db
+
+
+# Sent after a vote has been cast, switched or retracted
+# with arguments: thread, user, value, previous
+vote_changed = Signal()
+
+DEFAULT_AVATAR = 'uploads/defaults/default.png'
+
+
+def _file_name(instance, field):
+    """Return file name of field without loading deferred fields"""
+    value = instance.__dict__.get(field)
+
+    return getattr(value, 'name', value)
+
+
+def _uploading(instance, field):
+    """Return True if saving instance stores a new file in field
+    (which takes a storage reference even if the name is unchanged)"""
+    if field not in instance.__dict__:
+        return False
+
+    value = getattr(instance, field)
+
+    return bool(value) and not value._committed
+
+
+def variant_names(variants):
+    """Return storage names of the image variants of a thread"""
+    return [
+        name
+        for key, formats in (variants or {}).items() if key != 'source'
+        for name in formats.values()
+    ]
+
+
+def release_files(*names):
+    """Release storage references of files nothing points at anymore"""
+    for name in names:
+        if name and name != DEFAULT_AVATAR:
+            default_storage.delete(name)
+
+
+@receiver(post_init, sender='core.User')
+def user_loaded(sender, instance, **kwargs):
+    """Remember the stored avatar to release it once replaced"""
+    instance._stored_avatar = (
+        _file_name(instance, 'avatar') if instance.pk else None
+    )
+
+
+@receiver(pre_save, sender='core.User')
+def user_saving(sender, instance, **kwargs):
+    """Remember whether the save uploads an avatar"""
+    instance._uploading_avatar = _uploading(instance, 'avatar')
+
+
+@receiver(post_save, sender='core.User')
+def user_saved(sender, instance, **kwargs):
+    """Release the replaced avatar (also when the upload had the same
+    content, its reference replaces the stored one)"""
+    current = _file_name(instance, 'avatar')
+    if instance._stored_avatar != current or instance._uploading_avatar:
+        release_files(instance._stored_avatar)
+        instance._stored_avatar = current
+
+
+@receiver(post_delete, sender='core.User')
+def user_deleted(sender, instance, **kwargs):
+    """Release the avatar of deleted user"""
+    release_files(_file_name(instance, 'avatar'))
+
+
+@receiver(post_init, sender='core.Thread')
+def thread_loaded(sender, instance, **kwargs):
+    """Remember the stored image to release it once replaced"""
+    if instance.pk:
+        instance._stored_image = _file_name(instance, 'image')
+        instance._stored_variants = variant_names(
+            instance.__dict__.get('image_variants')
+        )
+    else:
+        instance._stored_image = None
+        instance._stored_variants = []
+
+
+@receiver(pre_save, sender='core.Thread')
+def thread_saving(sender, instance, **kwargs):
+    """Remember whether the save uploads an image"""
+    instance._uploading_image = _uploading(instance, 'image')
+
+
+@receiver(post_save, sender='core.Thread')
+def thread_saved(sender, instance, **kwargs):
+    """Release the replaced image and its variants (only the image
+    when the upload had the same content, the variants still match)"""
+    current = _file_name(instance, 'image')
+    if instance._stored_image != current:
+        release_files(instance._stored_image, *instance._stored_variants)
+        instance._stored_image = current
+        instance._stored_variants = []
+    elif instance._uploading_image:
+        release_files(instance._stored_image)
+
+
+@receiver(post_delete, sender='core.Thread')
+def thread_deleted(sender, instance, **kwargs):
+    """Release the image (and variants) of deleted thread"""
+    release_files(
+        _file_name(instance, 'image'),
+        *variant_names(instance.__dict__.get('image_variants')),
+    )
+
+
+@receiver(request_started)
+def check_db_connections(sender, **kwargs):
+    """Drop broken persistent database connections"""
+    db.check_connections()
@@ -0,0 +1,133 @@
+import hashlib
+import os
+import tempfile
+
+from django.core.files.storage import FileSystemStorage
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from core.models import MediaFile, sharded_path, unsharded_path
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """File system storage keeping every distinct content once.
+
+    Uploads are hashed (BLAKE2) while being streamed to disk and stored
+    under ``<directory>/<ab>/<cd>/<digest><ext>``, where directory is
+    the upload_to directory without its shards. Each save takes a
+    reference in MediaFile and each delete releases one; the file is
+    removed only when the last reference is gone. Files saved before
+    this storage existed have no MediaFile row and are never deleted
+    by it."""
+    digest_size = 16
+
+    def get_available_name(self, name, max_length=None):
+        """Names are derived from content, same content may reuse them"""
+        return name
+
+    def content_name(self, name, digest):
+        """Return final name for content with digest uploaded as name"""
+        directory, filename = unsharded_path(name)
+        ext = os.path.splitext(filename)[1].lower()
+
+        return sharded_path(directory, f'{digest}{ext}')
+
+    def _save(self, name, content):
+        directory = os.path.dirname(self.path(name))
+        self._makedirs(directory)
+
+        hasher = hashlib.blake2b(digest_size=self.digest_size)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.upload')
+        try:
+            with os.fdopen(fd, 'wb') as tmp:
+                for chunk in content.chunks():
+                    if isinstance(chunk, str):
+                        chunk = chunk.encode()
+                    hasher.update(chunk)
+                    tmp.write(chunk)
+
+            name = self.content_name(name, hasher.hexdigest())
+            name = str(name).replace('\\', '/')
+            full_path = self.path(name)
+            self._makedirs(os.path.dirname(full_path))
+            # Reference first: once held, removing the last previous
+            # reference can't unlink the file we may be reusing
+            self._acquire(name)
+            try:
+                if os.path.exists(full_path):
+                    os.remove(tmp_path)
+                else:
+                    os.replace(tmp_path, full_path)
+                    if self.file_permissions_mode is not None:
+                        os.chmod(full_path, self.file_permissions_mode)
+            except BaseException:
+                self.delete(name)
+                raise
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        return name
+
+    def delete(self, name):
+        """Release one reference to name, removing the file
+        once nothing points at it anymore"""
+        with transaction.atomic():
+            media = MediaFile.objects.select_for_update().filter(
+                name=name
+            ).first()
+            if media is None:
+                return
+
+            if media.ref_count > 1:
+                MediaFile.objects.filter(pk=media.pk).update(
+                    ref_count=F('ref_count') - 1
+                )
+                return
+
+            media.delete()
+            transaction.on_commit(lambda: self._remove_orphan(name))
+
+    def _acquire(self, name):
+        """Take one reference to name"""
+        updated = MediaFile.objects.filter(name=name).update(
+            ref_count=F('ref_count') + 1
+        )
+        if updated:
+            return
+
+        try:
+            with transaction.atomic():
+                MediaFile.objects.create(name=name, ref_count=1)
+        except IntegrityError:
+            MediaFile.objects.filter(name=name).update(
+                ref_count=F('ref_count') + 1
+            )
+
+    def _remove_orphan(self, name):
+        """Remove file unless it has been referenced again meanwhile.
+        The row of name (a placeholder without references if there is
+        none) is held while unlinking, so _acquire waits for it."""
+        with transaction.atomic():
+            media, _ = MediaFile.objects.select_for_update().get_or_create(
+                name=name, defaults={'ref_count': 0}
+            )
+            if media.ref_count:
+                return
+
+            super().delete(name)
+            media.delete()
+
+    def _makedirs(self, directory):
+        if self.directory_permissions_mode is None:
+            os.makedirs(directory, exist_ok=True)
+            return
+
+        old_umask = os.umask(0o777 & ~self.directory_permissions_mode)
+        try:
+            os.makedirs(
+                directory, self.directory_permissions_mode, exist_ok=True
+            )
+        finally:
+            os.umask(old_umask)
@@ -0,0 +1,39 @@
+"""Helpers for tests of the API apps"""
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from core.middleware import fingerprint
+
+
+class QueryCountMixin:
+    """TestCase mixin asserting that endpoints don't issue more
+    queries as their result sets grow (N+1 patterns)"""
+
+    def assertConstantQueries(self, request, grow, steps=3):
+        """Call grow() then request() steps times and fail if the
+        number of queries of request() changes between the steps.
+        request() is called once before to warm up in-process caches,
+        the Django cache is cleared before every measured call."""
+        request()
+        counts = []
+        for _ in range(steps):
+            grow()
+            cache.clear()
+            with CaptureQueriesContext(connection) as captured:
+                response = request()
+            self.assertLess(response.status_code, 400, response.content)
+            counts.append(len(captured))
+
+        if len(set(counts)) > 1:
+            statements = {}
+            for query in captured.captured_queries:
+                key = fingerprint(query['sql'])
+                statements.setdefault(key, [0, query['sql']])[0] += 1
+            repeated = '\n'.join(
+                f'{count}x {sql}'
+                for count, sql in statements.values() if count > 1
+            )
+            self.fail(
+                f'Query count grows with result size: {counts}\n{repeated}'
+            )
@@ -1,23 +1,211 @@
+import datetime
+import os
+import shutil
+import tempfile
+
+from io import StringIO
 from unittest.mock import patch
 
-from django.test import TestCase
-from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+from django.core.cache import cache
+from django.core.management import call_command, CommandError
 from django.db.utils import OperationalError
 
+from core import models
+
+from shitchan import catalog
+from shitchan.cache import board_threads_scope, get_version
+
+
+ENSURE_CONNECTION = (
+    'django.db.backends.base.base.BaseDatabaseWrapper.ensure_connection'
+)
+
 
 class CommandTests(TestCase):
 
     def test_wait_for_db_ready(self):
         """Test waiting for db when db is available"""
-        with patch('django.db.utils.ConnectionHandler.__getitem__') as gi:
-            gi.return_value = True
-            call_command('wait_for_db')
-            self.assertEqual(gi.call_count, 1)
+        with patch(ENSURE_CONNECTION) as ec:
+            call_command('wait_for_db', stdout=StringIO())
+            self.assertEqual(ec.call_count, 1)
 
     @patch('time.sleep', return_value=True)
     def test_wait_for_db(self, ts):
-        """Test waiting for db"""
-        with patch('django.db.utils.ConnectionHandler.__getitem__') as gi:
-            gi.side_effect = [OperationalError] * 5 + [True]
-            call_command('wait_for_db')
-            self.assertEqual(gi.call_count, 6)
+        """Test waiting for db with exponential backoff"""
+        with patch(ENSURE_CONNECTION) as ec:
+            ec.side_effect = [OperationalError] * 5 + [None]
+            call_command('wait_for_db', stdout=StringIO())
+            self.assertEqual(ec.call_count, 6)
+
+        self.assertEqual(
+            [c.args[0] for c in ts.call_args_list], [0.1, 0.2, 0.4, 0.8, 1.6]
+        )
+
+    @patch('time.sleep', return_value=True)
+    def test_wait_for_db_backoff_capped(self, ts):
+        """Test that pauses between attempts stop growing at max delay"""
+        with patch(ENSURE_CONNECTION) as ec:
+            ec.side_effect = [OperationalError] * 4 + [None]
+            call_command('wait_for_db', max_delay=0.3, stdout=StringIO())
+
+        self.assertEqual(
+            [c.args[0] for c in ts.call_args_list], [0.1, 0.2, 0.3, 0.3]
+        )
+
+    def test_wait_for_db_timeout(self):
+        """Test giving up once the timeout has passed"""
+        with patch(ENSURE_CONNECTION, side_effect=OperationalError):
+            with self.assertRaises(CommandError):
+                call_command('wait_for_db', timeout=0, stdout=StringIO())
+
+    @patch('django.db.transaction.on_commit', side_effect=lambda f: f())
+    def test_reconcile_votes(self, on_commit):
+        """Test that reconcile_votes fixes drifted vote counters and
+        publishes the fixed threads"""
+        user = get_user_model().objects.create_user(
+            email='test@gmail.com', username='testuser', password='testpass'
+        )
+        board = models.Board.objects.create(
+            title='test board', code='tb', user=user
+        )
+        threads = [
+            models.Thread.objects.create(
+                title=f'thread {i}', content='content',
+                user=user, board=board
+            )
+            for i in range(3)
+        ]
+        models.Vote.objects.create(thread=threads[0], user=user, value=1)
+        models.Vote.objects.create(thread=threads[1], user=user, value=-1)
+        models.Thread.objects.filter(pk=threads[2].pk).update(
+            upvote_count=5, score=5
+        )
+
+        version = get_version(board_threads_scope(board.id))
+        catalog.get_catalog(board.id)
+
+        out = StringIO()
+        call_command('reconcile_votes', chunk_size=2, stdout=out)
+
+        counters = list(
+            models.Thread.objects.order_by('pk').values_list(
+                'upvote_count', 'downvote_count', 'score'
+            )
+        )
+        self.assertEqual(counters, [(1, 0, 1), (0, 1, -1), (0, 0, 0)])
+        self.assertIn('fixed 3', out.getvalue())
+        self.assertGreater(get_version(board_threads_scope(board.id)), version)
+        self.assertEqual(
+            {entry['id']: entry['score'] for entry in cache.get(
+                catalog.catalog_key(board.id)
+            )},
+            {threads[0].id: 1, threads[1].id: -1, threads[2].id: 0}
+        )
+        self.assertEqual(
+            set(models.Change.objects.filter(
+                kind=models.Change.THREAD
+            ).values_list('object_id', flat=True)),
+            {thread.id for thread in threads}
+        )
+        for thread, score in zip(threads, (1, -1, 0)):
+            thread.refresh_from_db()
+            self.assertAlmostEqual(
+                thread.hot_score,
+                models.hot_score(score, thread.date_created),
+                places=4
+            )
+
+    def test_shard_media(self):
+        """Test that shard_media moves flat uploads into sharded
+        directories and can be run again safely"""
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        user = get_user_model().objects.create_user(
+            email='test@gmail.com', username='testuser', password='testpass'
+        )
+        other = get_user_model().objects.create_user(
+            email='other@gmail.com', username='other', password='testpass'
+        )
+        board = models.Board.objects.create(
+            title='test board', code='tb', user=user
+        )
+        thread = models.Thread.objects.create(
+            title='thread', content='content', user=user, board=board
+        )
+        flat = {
+            'uploads/avatar/abcdef.jpg': b'avatar',
+            'uploads/thread/123456.png': b'image',
+            'uploads/thread/variants/987654.jpg': b'thumbnail',
+        }
+        for name, data in flat.items():
+            path = os.path.join(media_root, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as f:
+                f.write(data)
+        get_user_model().objects.filter(pk__in=[user.pk, other.pk]).update(
+            avatar='uploads/avatar/abcdef.jpg'
+        )
+        models.MediaFile.objects.create(
+            name='uploads/avatar/abcdef.jpg', ref_count=2
+        )
+        models.Thread.objects.filter(pk=thread.pk).update(
+            image='uploads/thread/123456.png',
+            image_variants={
+                'source': 'uploads/thread/123456.png',
+                'thumbnail': {'jpeg': 'uploads/thread/variants/987654.jpg'},
+            }
+        )
+
+        with override_settings(MEDIA_ROOT=media_root):
+            call_command('shard_media', batch_size=1, stdout=StringIO())
+            call_command('shard_media', stdout=StringIO())
+
+        user.refresh_from_db()
+        other.refresh_from_db()
+        thread.refresh_from_db()
+        self.assertEqual(user.avatar.name, 'uploads/avatar/ab/cd/abcdef.jpg')
+        self.assertEqual(other.avatar.name, user.avatar.name)
+        self.assertEqual(thread.image.name, 'uploads/thread/12/34/123456.png')
+        self.assertEqual(thread.image_variants, {
+            'source': 'uploads/thread/12/34/123456.png',
+            'thumbnail': {'jpeg': 'uploads/thread/variants/98/76/987654.jpg'},
+        })
+        self.assertEqual(
+            models.MediaFile.objects.get(name=user.avatar.name).ref_count, 2
+        )
+        for name in flat:
+            self.assertFalse(os.path.exists(os.path.join(media_root, name)))
+        self.assertTrue(os.path.exists(
+            os.path.join(media_root, thread.image.name)
+        ))
+
+    @patch('django.db.transaction.on_commit', side_effect=lambda f: f())
+    def test_refresh_hot_scores(self, on_commit):
+        """Test that refresh_hot_scores applies time decay and
+        invalidates the thread listings of the board"""
+        user = get_user_model().objects.create_user(
+            email='test@gmail.com', username='testuser', password='testpass'
+        )
+        board = models.Board.objects.create(
+            title='test board', code='tb', user=user
+        )
+        thread = models.Thread.objects.create(
+            title='thread', content='content', user=user, board=board
+        )
+        day_ago = timezone.now() - datetime.timedelta(days=1)
+        models.Thread.objects.filter(pk=thread.pk).update(
+            date_created=day_ago, score=3
+        )
+
+        version = get_version(board_threads_scope(board.id))
+
+        call_command('refresh_hot_scores', stdout=StringIO())
+
+        self.assertGreater(get_version(board_threads_scope(board.id)), version)
+        thread.refresh_from_db()
+        self.assertAlmostEqual(
+            thread.hot_score, models.hot_score(3, day_ago), places=4
+        )
@@ -0,0 +1,79 @@
+from unittest.mock import patch
+
+from django.db import OperationalError, connection
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import db
+
+
+HEALTHZ_URL = reverse('healthz')
+READYZ_URL = reverse('readyz')
+
+
+class HealthApiTests(TestCase):
+    """Test liveness and readiness probes"""
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_healthz(self):
+        """Test liveness probe does not query the database"""
+        with self.assertNumQueries(0):
+            res = self.client.get(HEALTHZ_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, {'status': 'ok'})
+
+    def test_readyz(self):
+        """Test readiness probe reports database latencies"""
+        with self.assertNumQueries(0):
+            res = self.client.get(READYZ_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertGreaterEqual(res.data['database']['query_ms'], 0)
+        self.assertGreaterEqual(res.data['database']['connect_ms'], 0)
+
+    @patch('core.db.ping', side_effect=OperationalError('down'))
+    def test_readyz_database_down(self, ping):
+        """Test readiness probe fails while the database is down,
+        naming the check without exposing the error"""
+        with self.assertLogs('core.views', 'ERROR') as logs:
+            res = self.client.get(READYZ_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(
+            res.data, {'status': 'unavailable', 'failed': 'database'}
+        )
+        self.assertIn('down', logs.output[0])
+
+
+class ConnectionCheckTests(TestCase):
+    """Test health checks of persistent connections"""
+
+    @patch('django.db.backends.sqlite3.base.DatabaseWrapper.close')
+    @patch(
+        'django.db.backends.sqlite3.base.DatabaseWrapper.is_usable',
+        return_value=False
+    )
+    def test_broken_connection_closed(self, is_usable, close):
+        """Test that unusable connections outside a transaction
+        are closed"""
+        with patch.object(connection, 'in_atomic_block', False):
+            db.check_connections()
+
+        close.assert_called_once_with()
+
+    @override_settings(DB_HEALTH_CHECKS=False)
+    @patch(
+        'django.db.backends.sqlite3.base.DatabaseWrapper.is_usable',
+        return_value=False
+    )
+    def test_health_checks_disabled(self, is_usable):
+        """Test that no check runs when disabled"""
+        db.check_connections()
+
+        is_usable.assert_not_called()
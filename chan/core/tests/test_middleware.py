@@ -0,0 +1,69 @@
+from django.contrib.auth import get_user_model
+from django.http import HttpResponse
+from django.test import TestCase, RequestFactory
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core.middleware import fingerprint, QueryInstrumentationMiddleware
+from core.models import Board
+
+
+BOARDS_URL = reverse('shitchan:board-list')
+
+
+class QueryInstrumentationTests(TestCase):
+    """Test per-request query instrumentation"""
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_fingerprint_ignores_parameters(self):
+        """Test that executions of one statement share a fingerprint"""
+        self.assertEqual(
+            fingerprint('SELECT * FROM t WHERE id IN (%s, %s)'),
+            fingerprint('SELECT * FROM t WHERE id IN (%s)'),
+        )
+        self.assertEqual(
+            fingerprint("SELECT * FROM t WHERE id = 1 AND a = 'x'"),
+            fingerprint("SELECT * FROM t WHERE id = 22 AND a = 'y'"),
+        )
+        self.assertNotEqual(
+            fingerprint('SELECT * FROM t'), fingerprint('SELECT * FROM u')
+        )
+
+    def test_server_timing_header(self):
+        """Test that responses report query count and db time"""
+        res = self.client.get(reverse('readyz'))
+        empty = self.client.get(reverse('healthz'))
+
+        self.assertIn('db;dur=', res['Server-Timing'])
+        self.assertIn('desc="0 queries"', empty['Server-Timing'])
+
+    def test_request_logged(self):
+        """Test that every request is logged with its statistics"""
+        user = get_user_model().objects.create_user(
+            username='testuser', email='test@gmail.com', password='testpass'
+        )
+        Board.objects.create(title='test board', code='tb', user=user)
+
+        with self.assertLogs('core.middleware', 'INFO') as logs:
+            self.client.get(BOARDS_URL)
+
+        self.assertIn(f'path={BOARDS_URL} status=200', logs.output[0])
+        self.assertIn('duplicates=-', logs.output[0])
+
+    def test_duplicate_queries_warned(self):
+        """Test that repeated statements are logged as warning"""
+        def n_plus_one(request):
+            for pk in (1, 2, 3):
+                list(Board.objects.filter(pk=pk))
+            return HttpResponse()
+        middleware = QueryInstrumentationMiddleware(n_plus_one)
+
+        with self.assertLogs('core.middleware', 'WARNING') as logs:
+            res = middleware(RequestFactory().get('/'))
+
+        self.assertIn('desc="3 queries"', res['Server-Timing'])
+        self.assertEqual(len(logs.records), 1)
+        self.assertRegex(logs.output[0], r'duplicates=[0-9a-f]{8}:3$')
@@ -1,9 +1,13 @@
 import datetime
+import threading
 
+from unittest import skipUnless
 from unittest.mock import patch
 
-from django.test import TestCase
+from django.db import connection, connections
+from django.test import TestCase, TransactionTestCase
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 
 from core import models
 
@@ -60,9 +64,30 @@ class ModelTests(TestCase):
         mock_uuid.return_value = uuid
         file_path = models.avatar_file_path(None, 'myimage.jpg')
 
-        exp_path = f'uploads/avatar/{uuid}.jpg'
+        exp_path = f'uploads/avatar/te/st/{uuid}.jpg'
         self.assertEqual(file_path, exp_path)
 
+    @patch('uuid.uuid4')
+    def test_thread_image_file_name(self, mock_uuid):
+        """Test that thread image is saved in a sharded location"""
+        uuid = 'ab12cd-uuid'
+        mock_uuid.return_value = uuid
+        file_path = models.thread_image_file_path(None, 'myimage.png')
+
+        exp_path = f'uploads/thread/ab/12/{uuid}.png'
+        self.assertEqual(file_path, exp_path)
+
+    def test_unsharded_path(self):
+        """Test stripping shard directories from a file name"""
+        self.assertEqual(
+            models.unsharded_path('uploads/thread/ab/cd/abcdef.png'),
+            ('uploads/thread', 'abcdef.png')
+        )
+        self.assertEqual(
+            models.unsharded_path('uploads/thread/abcdef.png'),
+            ('uploads/thread', 'abcdef.png')
+        )
+
     def test_create_user_invalid_email(self):
         """Test create a new user without email is raises error"""
         with self.assertRaises(ValueError):
@@ -158,3 +183,177 @@ class ShitchanModelTests(TestCase):
 
         self.assertTrue(is_exists)
         self.assertEqual(str(thread), title)
+
+    def test_vote_thread_updates_counters(self):
+        """Test casting, switching and retracting a vote keep the
+        denormalized counters in sync"""
+        thread = models.Thread.objects.create(
+            title='test thread',
+            content='content',
+            user=self.user,
+            board=self.board
+        )
+
+        thread.vote(self.user, 1)
+        thread.vote(self.admin, 1)
+        thread.refresh_from_db()
+        self.assertEqual(thread.upvote_count, 2)
+        self.assertEqual(thread.downvote_count, 0)
+        self.assertEqual(thread.score, 2)
+
+        thread.vote(self.admin, -1)
+        thread.refresh_from_db()
+        self.assertEqual(thread.upvote_count, 1)
+        self.assertEqual(thread.downvote_count, 1)
+        self.assertEqual(thread.score, 0)
+
+        thread.vote(self.user, 0)
+        thread.refresh_from_db()
+        self.assertEqual(thread.upvote_count, 0)
+        self.assertEqual(thread.downvote_count, 1)
+        self.assertEqual(thread.score, -1)
+        vote = models.Vote.objects.get(thread=thread, user=self.user)
+        self.assertEqual(vote.value, models.Vote.RETRACTED)
+        self.assertEqual(models.Vote.objects.filter(thread=thread).count(), 2)
+
+    def test_vote_thread_twice_is_counted_once(self):
+        """Test that repeating the same vote does not change counters"""
+        thread = models.Thread.objects.create(
+            title='test thread',
+            content='content',
+            user=self.user,
+            board=self.board
+        )
+
+        thread.vote(self.user, 1)
+        thread.vote(self.user, 1)
+        thread.refresh_from_db()
+
+        self.assertEqual(thread.upvote_count, 1)
+        self.assertEqual(thread.score, 1)
+
+    def test_vote_thread_invalid_value(self):
+        """Test that voting with invalid value raises error"""
+        thread = models.Thread.objects.create(
+            title='test thread',
+            content='content',
+            user=self.user,
+            board=self.board
+        )
+
+        with self.assertRaises(ValueError):
+            thread.vote(self.user, 2)
+
+    def test_vote_returns_previous_value(self):
+        """Test that casting a vote returns the previous vote value"""
+        thread = models.Thread.objects.create(
+            title='test thread',
+            content='content',
+            user=self.user,
+            board=self.board
+        )
+
+        self.assertEqual(thread.vote(self.user, 1), models.Vote.RETRACTED)
+        self.assertEqual(thread.vote(self.user, -1), models.Vote.UP)
+        self.assertEqual(thread.vote(self.user, 0), models.Vote.DOWN)
+        self.assertEqual(list(thread.voters.all()), [self.user])
+
+    def test_hot_score_decays_with_age(self):
+        """Test that hot score grows with score and decays with age"""
+        now = timezone.now()
+        fresh = models.hot_score(10, now, now)
+        old = models.hot_score(10, now - datetime.timedelta(days=1), now)
+
+        self.assertGreater(fresh, old)
+        self.assertGreater(models.hot_score(11, now, now), fresh)
+
+    def test_vote_updates_hot_score(self):
+        """Test that voting recomputes hot score of the voted thread"""
+        thread = models.Thread.objects.create(
+            title='test thread',
+            content='content',
+            user=self.user,
+            board=self.board
+        )
+        self.assertGreater(thread.hot_score, 0)
+
+        thread.vote(self.user, 1)
+        thread.vote(self.admin, 1)
+        thread.refresh_from_db()
+
+        self.assertAlmostEqual(
+            thread.hot_score,
+            models.hot_score(2, thread.date_created),
+            places=4
+        )
+
+
+@skipUnless(connection.vendor == 'postgresql', 'needs row locks')
+class ConcurrentVoteTests(TransactionTestCase):
+    """Tests for votes cast from concurrent transactions"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            username=SAMPLE_USERNAME,
+            email=SAMPLE_EMAIL,
+            password=SAMPLE_PASS
+        )
+        board = models.Board.objects.create(
+            title='test board', code='tb', user=self.user
+        )
+        self.threads = [
+            models.Thread.objects.create(
+                title=f'thread {i}', content='content',
+                user=self.user, board=board
+            )
+            for i in range(3)
+        ]
+
+    def run_concurrently(self, func, count=4):
+        """Call func from count threads released at the same time"""
+        barrier = threading.Barrier(count)
+        errors = []
+
+        def target():
+            try:
+                barrier.wait()
+                func()
+            except Exception as error:
+                errors.append(error)
+            finally:
+                connections.close_all()
+
+        workers = [threading.Thread(target=target) for _ in range(count)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        self.assertEqual(errors, [])
+
+    def test_concurrent_first_votes_counted_once(self):
+        """Test that concurrent first votes of a user count once"""
+        thread = self.threads[0]
+
+        for _ in range(5):
+            self.run_concurrently(lambda: thread.vote(self.user, 1))
+            thread.refresh_from_db()
+            self.assertEqual(thread.upvote_count, 1)
+            self.assertEqual(thread.score, 1)
+
+            thread.vote(self.user, 0)
+            models.Vote.objects.filter(thread=thread).delete()
+
+    def test_concurrent_batches_counted_once(self):
+        """Test that concurrent batches of first votes count once"""
+        votes = {thread: 1 for thread in self.threads}
+
+        self.run_concurrently(
+            lambda: models.Vote.objects.cast_many(self.user, votes)
+        )
+
+        for thread in self.threads:
+            thread.refresh_from_db()
+            self.assertEqual(thread.upvote_count, 1)
+            self.assertEqual(thread.score, 1)
+        self.assertEqual(models.Vote.objects.count(), len(self.threads))
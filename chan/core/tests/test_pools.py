@@ -0,0 +1,63 @@
+import os
+
+from concurrent.futures.process import BrokenProcessPool
+
+from django.test import SimpleTestCase, override_settings
+from django.utils import timezone
+
+from core import models
+from core.pools import ProcessPool
+
+
+@override_settings(TEST_POOL_WORKERS=1, TEST_POOL_QUEUE=1)
+class ProcessPoolTests(SimpleTestCase):
+    """Test process pools started from a forkserver"""
+
+    def setUp(self):
+        self.pool = ProcessPool('TEST_POOL_WORKERS')
+        self.addCleanup(self.pool.shutdown)
+
+    def test_pool_size_from_setting(self):
+        """Test that the pool is sized by its setting"""
+        self.assertEqual(self.pool.workers, 1)
+        self.assertEqual(ProcessPool('UNKNOWN_POOL_WORKERS').workers, 1)
+
+    def test_tasks_run_in_forkserver_process(self):
+        """Test that tasks run in a process started by the forkserver"""
+        executor = self.pool.get_executor()
+
+        self.assertEqual(executor._mp_context.get_start_method(), 'forkserver')
+        self.assertNotEqual(self.pool.submit(os.getpid).result(), os.getpid())
+
+    def test_tasks_of_model_modules(self):
+        """Test that functions of modules importing models can run"""
+        now = timezone.now()
+
+        result = self.pool.submit(models.hot_score, 3, now, now).result()
+
+        self.assertEqual(result, models.hot_score(3, now, now))
+
+    def test_calls_above_cap_refused(self):
+        """Test that submit returns None while the calls in flight are
+        at the cap of the queue setting"""
+        pool = ProcessPool(
+            'TEST_POOL_WORKERS', queue_setting='TEST_POOL_QUEUE'
+        )
+        self.addCleanup(pool.shutdown)
+        self.assertEqual(pool.submit(pow, 2, 3).result(), 8)
+
+        pool._slots.acquire()
+        try:
+            self.assertIsNone(pool.submit(pow, 2, 3))
+        finally:
+            pool._slots.release()
+
+    def test_broken_pool_replaced(self):
+        """Test that a pool broken by a dying process is replaced"""
+        executor = self.pool.get_executor()
+
+        with self.assertRaises(BrokenProcessPool):
+            self.pool.submit(os._exit, 1).result()
+
+        self.assertIsNot(self.pool.get_executor(), executor)
+        self.assertEqual(self.pool.submit(pow, 2, 3).result(), 8)
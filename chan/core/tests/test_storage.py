@@ -0,0 +1,51 @@
+import os
+import shutil
+import tempfile
+
+from django.core.files.base import ContentFile
+from django.test import TestCase
+
+from core.models import MediaFile
+from core.storage import ContentAddressedStorage
+
+
+class ContentAddressedStorageTests(TestCase):
+    """Test reference counting of the content addressed storage"""
+
+    def setUp(self):
+        self.location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.location, ignore_errors=True)
+        self.storage = ContentAddressedStorage(location=self.location)
+
+    def test_orphan_referenced_again_kept(self):
+        """Test that a file referenced again before its removal runs
+        is kept"""
+        name = self.storage.save('uploads/test/a.txt', ContentFile(b'a'))
+        MediaFile.objects.filter(name=name).delete()
+        self.storage.save('uploads/test/b.txt', ContentFile(b'a'))
+
+        self.storage._remove_orphan(name)
+
+        self.assertTrue(self.storage.exists(name))
+        self.assertEqual(MediaFile.objects.get(name=name).ref_count, 1)
+
+    def test_orphan_removed_with_its_row(self):
+        """Test that removing an orphan leaves no placeholder row"""
+        name = self.storage.save('uploads/test/a.txt', ContentFile(b'a'))
+        MediaFile.objects.filter(name=name).delete()
+
+        self.storage._remove_orphan(name)
+
+        self.assertFalse(self.storage.exists(name))
+        self.assertFalse(MediaFile.objects.filter(name=name).exists())
+
+    def test_save_restores_removed_file(self):
+        """Test that saving content whose file was removed meanwhile
+        puts the file back"""
+        name = self.storage.save('uploads/test/a.txt', ContentFile(b'a'))
+        os.remove(self.storage.path(name))
+
+        self.storage.save('uploads/test/b.txt', ContentFile(b'a'))
+
+        self.assertTrue(self.storage.exists(name))
+        self.assertEqual(MediaFile.objects.get(name=name).ref_count, 2)
@@ -0,0 +1,151 @@
+import datetime
+import os
+import shutil
+import tempfile
+
+from io import StringIO
+from unittest.mock import patch
+
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+from django.core.management import call_command
+
+from core import models, transfer
+
+
+class TransferCommandTests(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+
+        users = [
+            get_user_model().objects.create_user(
+                email=f'user{i}@gmail.com', username=f'user{i}',
+                password='testpass'
+            )
+            for i in range(3)
+        ]
+        get_user_model().objects.filter(pk=users[0].pk).update(
+            date_of_birth=datetime.date(1990, 5, 17)
+        )
+        board = models.Board.objects.create(
+            title='test board', code='tb', user=users[0], max_threads=20
+        )
+        week_ago = timezone.now() - datetime.timedelta(days=7)
+        for i in range(4):
+            thread = models.Thread.objects.create(
+                title=f'thread {i}', user=users[i % 3], board=board,
+                content='first line, "quoted"\nsecond line\twith tab',
+            )
+            models.Thread.objects.filter(pk=thread.pk).update(
+                date_created=week_ago, image_variants={'source': f'{i}.png'}
+            )
+            models.Post.objects.reply(
+                thread, user=users[(i + 1) % 3], content=f'reply {i}'
+            )
+            models.Vote.objects.create(
+                thread=thread, user=users[2], value=models.Vote.UP
+            )
+
+    def snapshot(self):
+        """Return every transferred row of the database"""
+        return {
+            table: list(
+                model.objects.order_by('pk').values_list(*(
+                    field.attname for field in transfer.table_fields(model)
+                ))
+            )
+            for table, model in transfer.TABLES
+        }
+
+    def test_export_import_round_trip(self):
+        """Test that exported tables are imported back unchanged"""
+        expected = self.snapshot()
+
+        for fmt in transfer.FORMATS:
+            with self.subTest(fmt=fmt):
+                directory = os.path.join(self.directory, fmt)
+                call_command(
+                    'export_chan', directory, format=fmt, chunk_size=2,
+                    stdout=StringIO(),
+                )
+                get_user_model().objects.all().delete()
+
+                call_command(
+                    'import_chan', directory, batch_size=3, stdout=StringIO()
+                )
+
+                self.assertEqual(self.snapshot(), expected)
+                self.assertFalse(
+                    models.Change.objects.filter(deleted=True).exists()
+                )
+                self.assertEqual(
+                    sorted(os.listdir(directory)),
+                    sorted(f'{table}.{fmt}' for table, _ in transfer.TABLES)
+                )
+        self.assertTrue(
+            models.SearchTerm.objects.filter(term='quoted').exists()
+        )
+
+    def test_import_resume(self):
+        """Test that an interrupted import resumes from its checkpoint
+        without duplicating rows"""
+        expected = self.snapshot()
+        call_command('export_chan', self.directory, stdout=StringIO())
+        get_user_model().objects.all().delete()
+
+        insert_rows = transfer.insert_rows
+        calls = []
+
+        def failing_insert(*args, **kwargs):
+            calls.append(args[0])
+            if len(calls) == 5:
+                raise OSError('connection lost')
+            insert_rows(*args, **kwargs)
+
+        with patch('core.transfer.insert_rows', failing_insert):
+            with self.assertRaises(OSError):
+                call_command(
+                    'import_chan', self.directory, batch_size=2,
+                    stdout=StringIO(),
+                )
+        self.assertEqual(models.Thread.objects.count(), 2)
+
+        call_command(
+            'import_chan', self.directory, batch_size=2, resume=True,
+            stdout=StringIO(),
+        )
+
+        self.assertEqual(self.snapshot(), expected)
+        self.assertFalse(os.path.exists(
+            os.path.join(self.directory, transfer.IMPORT_CHECKPOINT)
+        ))
+
+    def test_export_resume(self):
+        """Test that an interrupted export resumes from its checkpoint"""
+        expected = self.snapshot()
+        write = transfer.CSVWriter.write
+        calls = []
+
+        def failing_write(writer, row):
+            calls.append(row)
+            if len(calls) == 6:
+                raise OSError('disk full')
+            write(writer, row)
+
+        with patch.object(transfer.CSVWriter, 'write', failing_write):
+            with self.assertRaises(OSError):
+                call_command(
+                    'export_chan', self.directory, format='csv',
+                    chunk_size=2, stdout=StringIO(),
+                )
+        call_command(
+            'export_chan', self.directory, format='csv', chunk_size=2,
+            resume=True, stdout=StringIO(),
+        )
+        get_user_model().objects.all().delete()
+        call_command('import_chan', self.directory, stdout=StringIO())
+
+        self.assertEqual(self.snapshot(), expected)
@@ -0,0 +1,387 @@
+"""Streaming export and import of the chan data as JSON lines or CSV.
+
+Every table is written to its own file of a directory, one primary-key
+chunk at a time, and read back in batches, so memory use doesn't depend
+on the size of the tables. Progress is saved in a checkpoint file of
+the directory after every chunk: an interrupted export or import run
+again with resume continues where it stopped. Rows already imported are
+skipped, so replaying the last batch is harmless."""
+import csv
+import datetime
+import io
+import json
+import os
+
+from django.core.management.color import no_style
+from django.db import connection, models, transaction
+
+from core.models import User, Board, Thread, Post, Vote, Change
+
+
+TABLES = (
+    ('users', User),
+    ('boards', Board),
+    ('threads', Thread),
+    ('posts', Post),
+    ('votes', Vote),
+)
+FORMATS = ('jsonl', 'csv')
+EXCLUDED_FIELDS = {'search_vector'}
+EXPORT_CHECKPOINT = '.export-checkpoint.json'
+IMPORT_CHECKPOINT = '.import-checkpoint.json'
+
+
+class TransferError(Exception):
+    """Raised on unreadable transfer files"""
+
+
+def table_fields(model):
+    """Return the transferred fields of model"""
+    return [
+        field for field in model._meta.concrete_fields
+        if field.attname not in EXCLUDED_FIELDS
+    ]
+
+
+def encode_value(value):
+    """Return value as a JSON compatible value"""
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+
+    return value
+
+
+class Checkpoint:
+    """Progress of a transfer per table, saved in a JSON file"""
+
+    def __init__(self, path):
+        self.path = path
+        self.state = {}
+
+    def load(self):
+        if os.path.exists(self.path):
+            with open(self.path) as file:
+                self.state = json.load(file)
+
+    def get(self, table):
+        return self.state.get(table, {})
+
+    def save(self, table, **progress):
+        self.state[table] = progress
+        with open(self.path + '.tmp', 'w') as file:
+            json.dump(self.state, file)
+        os.replace(self.path + '.tmp', self.path)
+
+    def remove(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class JSONLinesWriter:
+    """Write rows as one JSON object per line"""
+
+    def __init__(self, file, fields, header=True):
+        self.file = file
+        self.names = [field.attname for field in fields]
+
+    def write(self, row):
+        self.file.write(json.dumps(
+            dict(zip(self.names, map(encode_value, row)))
+        ) + '\n')
+
+
+class CSVWriter:
+    """Write rows as CSV records after a header of column names,
+    with empty values for NULL and JSON for JSON fields"""
+
+    def __init__(self, file, fields, header=True):
+        self.writer = csv.writer(file)
+        self.json = [isinstance(field, models.JSONField) for field in fields]
+        if header:
+            self.writer.writerow(field.attname for field in fields)
+
+    def write(self, row):
+        self.writer.writerow(
+            json.dumps(value) if is_json else
+            '' if value is None else encode_value(value)
+            for value, is_json in zip(row, self.json)
+        )
+
+
+class JSONLinesReader:
+    """Read records written by JSONLinesWriter"""
+
+    def __init__(self, file, fields):
+        self.file = file
+
+    def __iter__(self):
+        for line in iter(self.file.readline, ''):
+            if line.strip():
+                yield json.loads(line)
+
+
+class CSVReader:
+    """Read records written by CSVWriter"""
+
+    def __init__(self, file, fields):
+        self.file = file
+        self.fields = {field.attname: field for field in fields}
+        self.header = next(csv.reader([file.readline()]), None)
+        if not self.header:
+            raise TransferError(f'{file.name}: missing header')
+
+    def __iter__(self):
+        # readline() rather than iteration keeps file.tell() usable
+        for row in csv.reader(iter(self.file.readline, '')):
+            record = dict(zip(self.header, row))
+            for name, value in record.items():
+                field = self.fields.get(name)
+                if isinstance(field, models.JSONField):
+                    record[name] = json.loads(value)
+                elif value == '' and field is not None and field.null:
+                    record[name] = None
+            yield record
+
+
+WRITERS = {'jsonl': JSONLinesWriter, 'csv': CSVWriter}
+READERS = {'jsonl': JSONLinesReader, 'csv': CSVReader}
+
+
+def export_table(directory, table, model, fmt, checkpoint, chunk_size):
+    """Write the rows of model to directory/table.fmt in primary-key
+    chunks, return the number of rows written"""
+    progress = checkpoint.get(table)
+    if progress.get('done'):
+        return 0
+
+    path = os.path.join(directory, f'{table}.{fmt}')
+    fields = table_fields(model)
+    pk_index = fields.index(model._meta.pk)
+    last_pk = progress.get('last_pk', 0)
+    exported = 0
+
+    with open(path + '.part', 'r+' if progress else 'w',
+              encoding='utf-8', newline='') as file:
+        if progress:
+            file.seek(progress['offset'])
+            file.truncate()
+        writer = WRITERS[fmt](file, fields, header=not progress)
+
+        while True:
+            rows = model._base_manager.filter(pk__gt=last_pk).order_by(
+                'pk'
+            ).values_list(*(field.attname for field in fields))
+            count = 0
+            for row in rows[:chunk_size].iterator(chunk_size=chunk_size):
+                writer.write(row)
+                last_pk = row[pk_index]
+                count += 1
+            if not count:
+                break
+
+            exported += count
+            file.flush()
+            os.fsync(file.fileno())
+            checkpoint.save(table, last_pk=last_pk, offset=file.tell())
+
+    os.replace(path + '.part', path)
+    checkpoint.save(table, done=True)
+
+    return exported
+
+
+def export_tables(directory, fmt, chunk_size, resume=False):
+    """Export every table to directory, yield (table, rows written)"""
+    checkpoint = Checkpoint(os.path.join(directory, EXPORT_CHECKPOINT))
+    if resume:
+        checkpoint.load()
+
+    # Snapshot settings only apply to a transaction of our own
+    outermost = not connection.in_atomic_block
+    with transaction.atomic():
+        if connection.vendor == 'postgresql' and outermost:
+            # One snapshot for every table, so references stay
+            # consistent. Read only, so it never takes a transaction
+            # id holding back ChangeManager.horizon for delta clients.
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, '
+                    'READ ONLY'
+                )
+        for table, model in TABLES:
+            yield table, export_table(
+                directory, table, model, fmt, checkpoint, chunk_size
+            )
+
+    checkpoint.remove()
+
+
+def table_file(directory, table):
+    """Return (path, format) of the file of table in directory"""
+    for fmt in FORMATS:
+        path = os.path.join(directory, f'{table}.{fmt}')
+        if os.path.exists(path):
+            return path, fmt
+
+    return None, None
+
+
+def decode_record(model, fields, record):
+    """Return a model instance of a record read from a file"""
+    values = {}
+    for name, value in record.items():
+        try:
+            field = fields[name]
+        except KeyError:
+            raise TransferError(f'{model.__name__} has no field {name}')
+        if not isinstance(field, models.JSONField):
+            value = field.to_python(value)
+        values[name] = value
+
+    return model(**values)
+
+
+def copy_value(field, obj):
+    """Return the value of field in obj in the text format of
+    PostgreSQL COPY"""
+    value = getattr(obj, field.attname)
+    if isinstance(field, models.JSONField):
+        value = json.dumps(value)
+    else:
+        value = field.get_db_prep_save(value, connection)
+    if value is None:
+        return r'\N'
+    if isinstance(value, bool):
+        value = 't' if value else 'f'
+    else:
+        value = str(encode_value(value))
+
+    return value.replace('\\', '\\\\').replace('\t', '\\t') \
+        .replace('\n', '\\n').replace('\r', '\\r')
+
+
+def copy_rows(model, fields, objs):
+    """Insert objs with COPY through a temporary table, skipping rows
+    whose keys already exist"""
+    quote = connection.ops.quote_name
+    table = quote(model._meta.db_table)
+    columns = ', '.join(quote(field.column) for field in fields)
+    data = io.StringIO()
+    for obj in objs:
+        data.write('\t'.join(
+            copy_value(field, obj) for field in fields
+        ) + '\n')
+    data.seek(0)
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'CREATE TEMPORARY TABLE transfer_import '
+            f'(LIKE {table} INCLUDING DEFAULTS) ON COMMIT DROP'
+        )
+        cursor.copy_expert(
+            f'COPY transfer_import ({columns}) FROM STDIN', data
+        )
+        cursor.execute(
+            f'INSERT INTO {table} ({columns}) '
+            f'SELECT {columns} FROM transfer_import ON CONFLICT DO NOTHING'
+        )
+
+
+def insert_rows(model, fields, objs, use_copy=False):
+    """Insert a batch of objs in one transaction, skipping rows whose
+    keys already exist"""
+    with transaction.atomic():
+        if use_copy:
+            copy_rows(model, fields, objs)
+            return
+
+        # Same path as bulk_create, but raw so auto_now_add dates are kept
+        batch_size = connection.ops.bulk_batch_size(fields, objs)
+        for start in range(0, len(objs), batch_size):
+            model._base_manager._insert(
+                objs[start:start + batch_size], fields=fields, raw=True,
+                ignore_conflicts=True,
+            )
+
+
+def import_table(path, fmt, table, model, checkpoint, batch_size,
+                 use_copy=False):
+    """Insert the rows of path in batches, return the number of rows
+    read"""
+    progress = checkpoint.get(table)
+    if progress.get('done'):
+        return 0
+
+    fields = table_fields(model)
+    by_name = {field.attname: field for field in fields}
+    imported = 0
+
+    with open(path, encoding='utf-8', newline='') as file:
+        reader = READERS[fmt](file, fields)
+        if progress:
+            file.seek(progress['offset'])
+
+        batch = []
+        for record in reader:
+            batch.append(decode_record(model, by_name, record))
+            if len(batch) == batch_size:
+                offset = file.tell()
+                insert_rows(model, fields, batch, use_copy)
+                imported += len(batch)
+                checkpoint.save(table, offset=offset)
+                batch = []
+        if batch:
+            insert_rows(model, fields, batch, use_copy)
+            imported += len(batch)
+
+    checkpoint.save(table, done=True)
+
+    return imported
+
+
+def log_changes(batch_size):
+    """Log every board and thread as changed, imported rows bypassed
+    the signals"""
+    for kind, model in ((Change.BOARD, Board), (Change.THREAD, Thread)):
+        last_pk = 0
+        while True:
+            rows = model.objects.filter(pk__gt=last_pk).order_by('pk')
+            if model is Thread:
+                changed = dict(rows.values_list('pk', 'board_id')[:batch_size])
+            else:
+                changed = dict.fromkeys(
+                    rows.values_list('pk', flat=True)[:batch_size]
+                )
+            if not changed:
+                break
+
+            with transaction.atomic():
+                Change.objects.record(kind, changed)
+            last_pk = max(changed)
+
+
+def import_tables(directory, batch_size, resume=False, use_copy=False):
+    """Import the table files of directory, yield (table, rows read),
+    rows read is None for tables without a file"""
+    checkpoint = Checkpoint(os.path.join(directory, IMPORT_CHECKPOINT))
+    if resume:
+        checkpoint.load()
+
+    for table, model in TABLES:
+        path, fmt = table_file(directory, table)
+        if path is None:
+            yield table, None
+            continue
+        yield table, import_table(
+            path, fmt, table, model, checkpoint, batch_size, use_copy
+        )
+
+    # Rows came with their primary keys, move sequences past them
+    sequences = connection.ops.sequence_reset_sql(
+        no_style(), [model for _, model in TABLES]
+    )
+    with connection.cursor() as cursor:
+        for sql in sequences:
+            cursor.execute(sql)
+
+    checkpoint.remove()
@@ -0,0 +1,47 @@
+import logging
+
+from django.db import DatabaseError
+
+from rest_framework import views, permissions, status
+from rest_framework.response import Response
+
+from core import db
+
+
+logger = logging.getLogger(__name__)
+
+
+class HealthView(views.APIView):
+    """Liveness probe, answers as long as the process serves requests"""
+    authentication_classes = []
+    permission_classes = [permissions.AllowAny, ]
+
+    def get(self, request):
+        """Return ok without touching any backing service"""
+        return Response({'status': 'ok'})
+
+
+class ReadinessView(views.APIView):
+    """Readiness probe, checks the database round trip"""
+    authentication_classes = []
+    permission_classes = [permissions.AllowAny, ]
+
+    def get(self, request):
+        """Return database latencies (503 naming the failed check if
+        it can't be reached, the error itself is only logged)"""
+        try:
+            connect, query = db.ping()
+        except DatabaseError:
+            logger.exception('Readiness check database failed')
+            return Response(
+                {'status': 'unavailable', 'failed': 'database'},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
+
+        return Response({
+            'status': 'ok',
+            'database': {
+                'connect_ms': round(connect * 1000, 3),
+                'query_ms': round(query * 1000, 3),
+            },
+        })
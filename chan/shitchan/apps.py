@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class ShitchanConfig(AppConfig):
     name = 'shitchan'
+
+    def ready(self):
+        from shitchan import signals  # noqa
@@ -0,0 +1,126 @@
+"""Pruning of boards over their thread limit into the archive.
+
+Only ``Board.max_threads`` threads (most recently bumped first) stay in
+the live tables, so board listings and their indexes keep a bounded
+size and stay cached in memory. The rest are moved, in chunks, to
+``ArchivedThread`` rows holding their text, counters and replies.
+Images are released, the archive keeps text only.
+
+Threads are picked outside the transaction, so each chunk re-checks
+under lock that its threads are still beyond the limit: one bumped
+meanwhile stays live. A reply racing the move finds its thread gone."""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from core.models import Board, Thread, Post, ArchivedThread
+
+
+CHUNK_SIZE = 100
+
+
+def archived_data(thread, replies):
+    """Return the packed data of an archived thread"""
+    return {
+        'content': thread.content,
+        'user': thread.user.username,
+        'upvote_count': thread.upvote_count,
+        'downvote_count': thread.downvote_count,
+        'score': thread.score,
+        'reply_count': thread.reply_count,
+        'replies': [
+            {
+                'id': post.id,
+                'user': post.user.username,
+                'content': post.content,
+                'date_created': post.date_created.isoformat(),
+            }
+            for post in replies
+        ],
+    }
+
+
+def beyond_limit(threads, limit):
+    """Return those of locked threads of a board ranked after the limit
+    most recently bumped threads of the board"""
+    if not threads or not limit:
+        return threads
+
+    last_kept = list(
+        Thread.objects.filter(board_id=threads[0].board_id)
+        .order_by('-last_bumped_at', '-id')
+        .values_list('last_bumped_at', 'id')[limit - 1:limit]
+    )
+    if not last_kept:
+        return []
+
+    return [
+        thread for thread in threads
+        if (thread.last_bumped_at, thread.id) < last_kept[0]
+    ]
+
+
+def archive_threads(thread_ids, limit=None):
+    """Move threads with their replies into the archive, return number
+    of archived threads. With a limit, threads of a board no longer
+    beyond it once locked are left alone."""
+    with transaction.atomic():
+        threads = list(
+            Thread.objects.select_for_update(of=('self', ))
+            .filter(pk__in=thread_ids)
+            .select_related('user')
+        )
+        if limit is not None:
+            threads = beyond_limit(threads, limit)
+        replies = {thread.id: [] for thread in threads}
+        posts = Post.objects.filter(thread__in=threads).select_related(
+            'user'
+        ).order_by('date_created', 'id')
+        for post in posts:
+            replies[post.thread_id].append(post)
+
+        ArchivedThread.objects.bulk_create([
+            ArchivedThread(
+                thread_id=thread.id,
+                board_id=thread.board_id,
+                title=thread.title,
+                data=archived_data(thread, replies[thread.id]),
+                date_created=thread.date_created,
+                last_bumped_at=thread.last_bumped_at,
+            )
+            for thread in threads
+        ], ignore_conflicts=True)
+        Thread.objects.filter(pk__in=[thread.id for thread in threads]) \
+            .delete()
+
+    return len(threads)
+
+
+def prune_board(board_id, chunk_size=CHUNK_SIZE):
+    """Archive the least recently bumped threads of a board beyond its
+    limit, chunk_size threads per transaction; return their number"""
+    limit = Board.objects.values_list('max_threads', flat=True).get(
+        pk=board_id
+    )
+    pruned = 0
+    while True:
+        thread_ids = list(
+            Thread.objects.filter(board_id=board_id)
+            .order_by('-last_bumped_at', '-id')
+            .values_list('id', flat=True)[limit:limit + chunk_size]
+        )
+        if not thread_ids:
+            return pruned
+
+        archived = archive_threads(thread_ids, limit)
+        if not archived:
+            return pruned
+        pruned += archived
+
+
+def prune_board_throttled(board_id):
+    """Prune a board unless it has been pruned in the last
+    ARCHIVE_PRUNE_INTERVAL seconds"""
+    key = f'archive:prune:{board_id}'
+    if cache.add(key, True, settings.ARCHIVE_PRUNE_INTERVAL):
+        prune_board(board_id)
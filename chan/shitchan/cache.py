@@ -0,0 +1,191 @@
+"""HTTP caching helpers for the shitchan API.
+
+Every cacheable resource belongs to one or more *scopes* (e.g. the board
+table or the threads of one board). Each scope has a version stored in
+the cache: the time of its last change in microseconds. Signal handlers
+bump versions on committed writes, so validators can be derived and cached
+responses invalidated without touching the database."""
+import hashlib
+import time
+import uuid
+
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.cache import get_conditional_response, quote_etag
+from django.utils.http import http_date
+
+from rest_framework.response import Response
+
+
+BOARDS_SCOPE = 'boards'
+
+
+def board_threads_scope(board_id):
+    """Return scope of the thread listings of a board"""
+    return f'board:{board_id}:threads'
+
+
+def _version_key(scope):
+    return f'version:{scope}'
+
+
+def get_version(scope):
+    """Return current version of scope (initialized on first use)"""
+    key = _version_key(scope)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns() // 1000, None)
+        version = cache.get(key)
+
+    return version
+
+
+def bump_version(scope):
+    """Mark scope as changed once the current transaction (if any)
+    commits, so no request caches or validates uncommitted data under
+    the new version"""
+    transaction.on_commit(lambda: _bump(scope))
+
+
+def _bump(scope):
+    key = _version_key(scope)
+    current = cache.get(key) or 0
+    cache.set(key, max(time.time_ns() // 1000, current + 1), None)
+
+
+class ScopedListMixin:
+    """Base for views whose listing depends on versioned scopes"""
+    condition_scopes = ()
+
+    def get_condition_scopes(self):
+        """Return scopes the listing depends on"""
+        return self.condition_scopes
+
+    def get_versions(self):
+        """Return current versions of the scopes of the listing"""
+        return [get_version(s) for s in self.get_condition_scopes()]
+
+
+class ConditionalListMixin(ScopedListMixin):
+    """Answer conditional list requests (If-None-Match and
+    If-Modified-Since) with 304 before the queryset is evaluated.
+    Last-Modified has one second granularity, so it is only sent (and
+    If-Modified-Since only honoured) once the second of the last change
+    is over; until then later changes could share its value."""
+
+    def get_validators(self):
+        """Return (etag, last modified timestamp) of the listing"""
+        versions = self.get_versions()
+        media_type = getattr(self.request, 'accepted_media_type', '')
+        etag = quote_etag('-'.join(
+            [str(version) for version in versions] + [media_type]
+        ))
+
+        return etag, max(versions) // 1000000
+
+    def list(self, request, *args, **kwargs):
+        etag, last_modified = self.get_validators()
+        if time.time() < last_modified + 1:
+            last_modified = None
+        response = get_conditional_response(
+            request._request, etag=etag, last_modified=last_modified
+        )
+        if response is None:
+            response = super().list(request, *args, **kwargs)
+
+        response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+
+        return response
+
+
+class CachedListMixin(ScopedListMixin):
+    """Cache list response data with stale-while-revalidate.
+
+    An entry is fresh for ``cache_fresh_for`` seconds while the versions
+    of its scopes are unchanged. Afterwards (or once a scope is bumped)
+    it is stale: a single request, holding a lock, rebuilds it while
+    concurrent requests keep getting the stale data for up to
+    ``cache_stale_for`` seconds. On a cold miss other requests wait for
+    the lock holder instead of all hitting the database, until it
+    releases the lock or ``cache_lock_timeout`` passes, and then build
+    the response themselves. Keys vary by scheme, host, path and query
+    string (cached bodies hold absolute pagination links) and by
+    authentication state (anonymous, user or staff), so listings must
+    not contain per-user data."""
+    cache_fresh_for = 30
+    cache_stale_for = 300
+    cache_lock_timeout = 10
+    cache_wait_interval = 0.05
+
+    def get_cache_key(self, request):
+        """Return response cache key of request"""
+        user = request.user
+        if user and user.is_staff:
+            auth_state = 'staff'
+        elif user and user.is_authenticated:
+            auth_state = 'user'
+        else:
+            auth_state = 'anon'
+        url = hashlib.md5(
+            request.build_absolute_uri().encode()
+        ).hexdigest()
+
+        return f'response:{auth_state}:{url}'
+
+    def list(self, request, *args, **kwargs):
+        key = self.get_cache_key(request)
+        lock = f'{key}:lock'
+        versions = self.get_versions()
+        entry = cache.get(key)
+
+        if entry is not None and entry['versions'] == versions and \
+                time.time() - entry['created'] < self.cache_fresh_for:
+            return self._cached_response(entry, 'HIT')
+
+        token = uuid.uuid4().hex
+        locked = cache.add(lock, token, self.cache_lock_timeout)
+        if not locked:
+            if entry is not None:
+                return self._cached_response(entry, 'STALE')
+            entry = self._wait_for_rebuild(key, lock)
+            if entry is not None:
+                return self._cached_response(entry, 'HIT')
+
+        try:
+            response = super().list(request, *args, **kwargs)
+            if response.status_code == 200:
+                cache.set(key, {
+                    'versions': versions,
+                    'created': time.time(),
+                    'data': response.data,
+                }, self.cache_fresh_for + self.cache_stale_for)
+        finally:
+            if locked and cache.get(lock) == token:
+                cache.delete(lock)
+
+        response['X-Cache'] = 'MISS'
+
+        return response
+
+    def _wait_for_rebuild(self, key, lock):
+        """Wait for the lock holder to store the entry (single flight).
+        Return None once the holder released the lock without storing
+        one (e.g. on an error response) or after the lock timeout."""
+        deadline = time.monotonic() + self.cache_lock_timeout
+        while time.monotonic() < deadline:
+            time.sleep(self.cache_wait_interval)
+            entry = cache.get(key)
+            if entry is not None:
+                return entry
+            if cache.get(lock) is None:
+                break
+
+        return None
+
+    def _cached_response(self, entry, state):
+        response = Response(entry['data'])
+        response['X-Cache'] = state
+
+        return response
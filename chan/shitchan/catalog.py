@@ -0,0 +1,197 @@
+"""Precomputed board catalog snapshots.
+
+A snapshot is the list of live threads of a board (newest first) kept in
+the cache. It is built once on a miss and then patched in place by the
+signal handlers in ``shitchan.signals``, so serving a catalog never
+touches the thread or vote tables.
+
+Writers hold a per board lock taken with a unique token and release it
+only while still theirs. Every patch also bumps a per board version; a
+build stores its snapshot only if the version hasn't moved since before
+its query, so a build outliving its lock can't store stale rows."""
+import uuid
+
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.db.models.functions import Substr
+
+from core.models import Thread
+
+
+EXCERPT_LENGTH = 140
+LOCK_TIMEOUT = 5
+
+
+def catalog_key(board_id):
+    """Return cache key of the board catalog snapshot"""
+    return f'catalog:{board_id}'
+
+
+def _thumbnail_url(image, variants):
+    """Return url of the JPEG thumbnail if it is up to date"""
+    if not image or variants.get('source') != image:
+        return None
+
+    name = variants.get('thumbnail', {}).get('jpeg')
+
+    return default_storage.url(name) if name else None
+
+
+def catalog_entry(thread):
+    """Return catalog entry of a thread instance"""
+    return {
+        'id': thread.id,
+        'title': thread.title,
+        'excerpt': thread.content[:EXCERPT_LENGTH],
+        'thumbnail': _thumbnail_url(
+            thread.image.name, thread.image_variants
+        ),
+        'score': thread.score,
+        'date_created': thread.date_created.isoformat(),
+    }
+
+
+def _dirty_key(board_id):
+    return f'{catalog_key(board_id)}:dirty'
+
+
+def _lock_key(board_id):
+    return f'{catalog_key(board_id)}:lock'
+
+
+def _version_key(board_id):
+    return f'{catalog_key(board_id)}:version'
+
+
+def _bump_version(board_id):
+    """Count a change of the catalog of a board"""
+    key = _version_key(board_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 1, None)
+
+
+def _release(lock, token):
+    """Delete lock if it is still held with token"""
+    if cache.get(lock) == token:
+        cache.delete(lock)
+
+
+def _store(board_id, snapshot):
+    """Store snapshot while holding the board lock. A writer that found
+    the lock taken marks the board dirty and then drops the snapshot,
+    so whichever of both comes last drops it and no patch is lost."""
+    key = catalog_key(board_id)
+    cache.set(key, snapshot, None)
+    if cache.get(_dirty_key(board_id)):
+        cache.delete_many([key, _dirty_key(board_id)])
+
+
+def build_catalog(board_id):
+    """Build catalog snapshot of a board from db and store it, unless
+    another worker is writing the snapshot of the board"""
+    lock = _lock_key(board_id)
+    token = uuid.uuid4().hex
+    locked = cache.add(lock, token, LOCK_TIMEOUT)
+    version = cache.get(_version_key(board_id))
+
+    try:
+        rows = Thread.objects.filter(board_id=board_id).order_by(
+            '-date_created', '-id'
+        ).annotate(
+            excerpt=Substr('content', 1, EXCERPT_LENGTH)
+        ).values(
+            'id', 'title', 'excerpt', 'image', 'image_variants',
+            'score', 'date_created'
+        )
+
+        snapshot = [
+            {
+                'id': row['id'],
+                'title': row['title'],
+                'excerpt': row['excerpt'],
+                'thumbnail': _thumbnail_url(
+                    row['image'], row['image_variants']
+                ),
+                'score': row['score'],
+                'date_created': row['date_created'].isoformat(),
+            }
+            for row in rows
+        ]
+        if locked and cache.get(lock) == token and \
+                cache.get(_version_key(board_id)) == version:
+            _store(board_id, snapshot)
+    finally:
+        if locked:
+            _release(lock, token)
+
+    return snapshot
+
+
+def get_catalog(board_id):
+    """Return catalog snapshot of a board, building it on a miss"""
+    snapshot = cache.get(catalog_key(board_id))
+    if snapshot is None:
+        snapshot = build_catalog(board_id)
+
+    return snapshot
+
+
+def patch_catalog(board_id, patch):
+    """Apply patch (a function mutating the snapshot list) to a stored
+    snapshot. If another worker is writing the snapshot of the same
+    board at the same time the snapshot is dropped instead, to be
+    rebuilt on next read. Call it once the change is committed."""
+    key = catalog_key(board_id)
+    lock = _lock_key(board_id)
+    token = uuid.uuid4().hex
+    _bump_version(board_id)
+
+    if not cache.add(lock, token, LOCK_TIMEOUT):
+        cache.set(_dirty_key(board_id), True, LOCK_TIMEOUT)
+        cache.delete(key)
+        return
+
+    try:
+        snapshot = cache.get(key)
+        if snapshot is not None:
+            patch(snapshot)
+            _store(board_id, snapshot)
+    finally:
+        _release(lock, token)
+
+
+def upsert_thread(thread):
+    """Insert or replace thread in the catalog of its board"""
+    entry = catalog_entry(thread)
+
+    def patch(snapshot):
+        for index, current in enumerate(snapshot):
+            if current['id'] == entry['id']:
+                snapshot[index] = entry
+                return
+        snapshot.insert(0, entry)
+
+    patch_catalog(thread.board_id, patch)
+
+
+def remove_thread(board_id, thread_id):
+    """Remove thread from the catalog of a board"""
+    def patch(snapshot):
+        snapshot[:] = [
+            entry for entry in snapshot if entry['id'] != thread_id
+        ]
+
+    patch_catalog(board_id, patch)
+
+
+def add_score(board_id, thread_id, delta):
+    """Add delta to the score of thread in the catalog of a board"""
+    def patch(snapshot):
+        for entry in snapshot:
+            if entry['id'] == thread_id:
+                entry['score'] += delta
+                return
+
+    patch_catalog(board_id, patch)
@@ -0,0 +1,59 @@
+"""Deltas of boards and threads for clients polling for changes.
+
+Every board and thread has a row in the change log (``core.models.Change``)
+moved to its head on each change and left as a tombstone on delete. A
+cursor is the (transaction id, position) of the last change a client
+has seen, starting from no cursor is a full sync.
+
+Positions are taken before commit, so a change may become visible after
+one with a greater position. On PostgreSQL only the changes of
+transactions below the oldest one still running are returned, and the
+cursor moves up to that horizon, so late commits can't be skipped. Other
+backends serialize writers and keep transaction ids at 0."""
+from core.models import Change
+
+
+PAGE_SIZE = 500
+
+
+def encode_cursor(cursor):
+    """Return cursor as sent to clients"""
+    return '%d.%d' % cursor
+
+
+def decode_cursor(value):
+    """Return cursor sent by a client, raise ValueError if invalid"""
+    transaction_id, position = value.split('.')
+    cursor = int(transaction_id), int(position)
+    if min(cursor) < 0:
+        raise ValueError(value)
+
+    return cursor
+
+
+def get_delta(scope, cursor=None, page_size=PAGE_SIZE):
+    """Return (next cursor, more, changed ids, deleted ids) of the
+    changes of scope (Change filters) after cursor"""
+    cursor = cursor or (0, 0)
+    horizon = Change.objects.horizon()
+    changes = list(
+        Change.objects.after(cursor, horizon).filter(**scope)
+        .values_list('transaction_id', 'position', 'object_id', 'deleted')
+        [:page_size + 1]
+    )
+    more = len(changes) > page_size
+    changes = changes[:page_size]
+
+    if more or (changes and horizon is None):
+        next_cursor = changes[-1][:2]
+    elif horizon is not None:
+        next_cursor = max(cursor, (horizon, 0))
+    else:
+        next_cursor = cursor
+
+    return (
+        next_cursor,
+        more,
+        [object_id for _, _, object_id, deleted in changes if not deleted],
+        [object_id for _, _, object_id, deleted in changes if deleted],
+    )
@@ -0,0 +1,122 @@
+"""Streaming dumps of boards as newline-delimited JSON.
+
+Threads are read in primary-key chunks, with the replies of a chunk in
+one more query, and serialized while the response is being sent. Memory
+use stays flat whatever the size of the board, also behind pgbouncer
+where server side cursors are disabled.
+
+Incremental dumps take a change-log cursor (see ``shitchan.delta``) and
+dump every thread changed after it, so replies, votes and edits count,
+and the next cursor stops at the horizon so late commits come in the
+next pull."""
+import json
+
+from django.core.files.storage import default_storage
+
+from rest_framework import renderers
+
+from core.models import Change, Thread, Post
+
+
+CHUNK_SIZE = 500
+THREAD_FIELDS = (
+    'id', 'title', 'content', 'image', 'user__username', 'upvote_count',
+    'downvote_count', 'score', 'reply_count', 'date_created',
+    'last_bumped_at',
+)
+
+
+class NDJSONRenderer(renderers.BaseRenderer):
+    """Render data as one line of JSON (errors of dump endpoints)"""
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+
+        return json.dumps(data).encode() + b'\n'
+
+
+def changed_since(board_id, cursor=None):
+    """Return (ids of the threads of a board changed after the cursor
+    as a subquery, cursor of the next pull)"""
+    cursor = cursor or (0, 0)
+    horizon = Change.objects.horizon()
+    changes = Change.objects.after(cursor, horizon).filter(
+        kind=Change.THREAD, board_id=board_id
+    )
+    if horizon is not None:
+        next_cursor = max(cursor, (horizon, 0))
+    else:
+        next_cursor = changes.order_by(
+            '-transaction_id', '-position'
+        ).values_list('transaction_id', 'position').first() or cursor
+
+    return changes.filter(deleted=False).values('object_id'), next_cursor
+
+
+def thread_chunks(board_id, changed=None, chunk_size=CHUNK_SIZE):
+    """Yield lists of thread rows of a board in primary key order,
+    only threads with ids in changed if given"""
+    queryset = Thread.objects.filter(board_id=board_id)
+    if changed is not None:
+        queryset = queryset.filter(pk__in=changed)
+
+    last_pk = 0
+    while True:
+        rows = list(
+            queryset.filter(pk__gt=last_pk)
+            .order_by('pk')
+            .values(*THREAD_FIELDS)[:chunk_size]
+        )
+        if not rows:
+            return
+
+        yield rows
+        last_pk = rows[-1]['id']
+
+
+def replies_by_thread(thread_ids):
+    """Return {thread id: [reply, ...]} of threads, oldest first"""
+    replies = {thread_id: [] for thread_id in thread_ids}
+    rows = Post.objects.filter(thread_id__in=thread_ids).order_by(
+        'thread_id', 'date_created', 'id'
+    ).values('id', 'thread_id', 'user__username', 'content', 'date_created')
+    for row in rows:
+        replies[row['thread_id']].append({
+            'id': row['id'],
+            'user': row['user__username'],
+            'content': row['content'],
+            'date_created': row['date_created'].isoformat(),
+        })
+
+    return replies
+
+
+def thread_record(row, replies):
+    """Return dump record of a thread row"""
+    return {
+        'id': row['id'],
+        'title': row['title'],
+        'content': row['content'],
+        'image': default_storage.url(row['image']) if row['image'] else None,
+        'user': row['user__username'],
+        'upvote_count': row['upvote_count'],
+        'downvote_count': row['downvote_count'],
+        'score': row['score'],
+        'reply_count': row['reply_count'],
+        'date_created': row['date_created'].isoformat(),
+        'last_bumped_at': row['last_bumped_at'].isoformat(),
+        'replies': replies,
+    }
+
+
+def dump_lines(board_id, changed=None, chunk_size=CHUNK_SIZE):
+    """Yield the dump of a board, one string of JSON lines per chunk"""
+    for rows in thread_chunks(board_id, changed, chunk_size):
+        replies = replies_by_thread([row['id'] for row in rows])
+        yield ''.join(
+            json.dumps(thread_record(row, replies[row['id']])) + '\n'
+            for row in rows
+        )
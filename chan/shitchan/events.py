@@ -0,0 +1,182 @@
+"""Fan-out of board events to the event streams of this process.
+
+Events are published from the synchronous Django code (signal handlers)
+to a backend, which delivers them to the broker of every process
+serving event streams. The broker runs in the event loop of the ASGI
+application and copies each event into a bounded queue per connected
+client. A client whose queue is full is too slow to keep up: its
+backlog is dropped and it is told to resync, so it can't make the
+process buffer events without limit."""
+import asyncio
+import json
+import logging
+
+from collections import defaultdict
+
+import psycopg2
+
+from django.conf import settings
+from django.db import connection, connections
+from django.utils.module_loading import import_string
+
+
+logger = logging.getLogger(__name__)
+
+# Queued in place of the backlog of a subscription that overflowed
+OVERFLOW = object()
+
+
+def board_channel(board_id):
+    """Return channel name of the events of a board"""
+    return f'board:{board_id}'
+
+
+class Subscription:
+    """Bounded queue of the events of a channel for one client"""
+
+    def __init__(self, channel, maxsize):
+        self.channel = channel
+        self.queue = asyncio.Queue(maxsize)
+        self.overflowed = False
+
+    def put(self, event):
+        """Queue event, or drop the backlog if the queue is full"""
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.overflowed = True
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(OVERFLOW)
+
+    async def get(self):
+        """Return next event, OVERFLOW once the client fell behind"""
+        return await self.queue.get()
+
+
+class Broker:
+    """Dispatch events delivered by the backend to the subscriptions
+    of this process"""
+
+    def __init__(self, backend, queue_size=100):
+        self.backend = backend
+        self.queue_size = queue_size
+        self.subscriptions = defaultdict(set)
+        self.loop = None
+
+    def subscribe(self, channel):
+        """Return a new subscription to channel (in the event loop)"""
+        loop = asyncio.get_event_loop()
+        if self.loop is not loop:
+            self.loop = loop
+            self.subscriptions.clear()
+            self.backend.start(self)
+
+        subscription = Subscription(channel, self.queue_size)
+        self.subscriptions[channel].add(subscription)
+
+        return subscription
+
+    def unsubscribe(self, subscription):
+        """Forget a subscription (in the event loop)"""
+        subscriptions = self.subscriptions.get(subscription.channel)
+        if subscriptions is not None:
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                del self.subscriptions[subscription.channel]
+
+    def publish(self, channel, event):
+        """Publish event to channel through the backend (any thread)"""
+        self.backend.publish(channel, event)
+
+    def deliver(self, channel, event):
+        """Hand event over to the event loop (any thread)"""
+        loop = self.loop
+        if loop is None or loop.is_closed():
+            return
+        try:
+            loop.call_soon_threadsafe(self.dispatch, channel, event)
+        except RuntimeError:
+            # The loop closed meanwhile
+            pass
+
+    def dispatch(self, channel, event):
+        """Copy event to the subscriptions of channel (in the loop)"""
+        for subscription in list(self.subscriptions.get(channel, ())):
+            subscription.put(event)
+
+
+class MemoryBackend:
+    """Deliver events to the broker of this process only"""
+
+    def __init__(self):
+        self.broker = None
+
+    def start(self, broker):
+        self.broker = broker
+
+    def publish(self, channel, event):
+        if self.broker is not None:
+            self.broker.deliver(channel, event)
+
+
+class PostgresBackend:
+    """Share events between processes with PostgreSQL LISTEN/NOTIFY.
+
+    Publishing is one pg_notify() on the connection of the thread, each
+    process serving event streams keeps one more connection listening
+    (it has to reach the server directly, not through pgbouncer)."""
+    pg_channel = 'chan_events'
+    retry_delay = 1
+
+    def __init__(self):
+        self.listener = None
+
+    def start(self, broker):
+        """Connect and LISTEN, reading notifications in the loop"""
+        wrapper = connections['default']
+        try:
+            self.listener = psycopg2.connect(
+                **wrapper.get_connection_params()
+            )
+            self.listener.autocommit = True
+            with self.listener.cursor() as cursor:
+                cursor.execute(f'LISTEN {self.pg_channel}')
+        except psycopg2.Error:
+            logger.exception('Could not listen to %s', self.pg_channel)
+            broker.loop.call_later(self.retry_delay, self.start, broker)
+            return
+
+        broker.loop.add_reader(
+            self.listener.fileno(), self.read, broker
+        )
+
+    def read(self, broker):
+        """Dispatch pending notifications, reconnect on errors"""
+        try:
+            self.listener.poll()
+        except psycopg2.Error:
+            logger.exception('Lost listener of %s', self.pg_channel)
+            broker.loop.remove_reader(self.listener.fileno())
+            self.listener.close()
+            broker.loop.call_later(self.retry_delay, self.start, broker)
+            return
+
+        while self.listener.notifies:
+            message = json.loads(self.listener.notifies.pop(0).payload)
+            broker.dispatch(message['channel'], message['event'])
+
+    def publish(self, channel, event):
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_notify(%s, %s)', [
+                self.pg_channel,
+                json.dumps({'channel': channel, 'event': event}),
+            ])
+
+
+broker = Broker(
+    import_string(settings.EVENTS_BACKEND)(),
+    queue_size=settings.EVENTS_QUEUE_SIZE,
+)
@@ -0,0 +1,141 @@
+import json
+
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import OrderedDict
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.utils.translation import gettext_lazy as _
+
+from rest_framework import pagination
+from rest_framework.exceptions import NotFound
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(pagination.BasePagination):
+    """Cursor pagination seeking on a unique composite key.
+
+    Unlike offset pagination every page is the same index range scan,
+    no matter how deep the client has scrolled. The last field of the
+    ordering must be unique (usually the primary key)."""
+    page_size = 25
+    max_page_size = 100
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    ordering = ('-date_created', '-id')
+    invalid_cursor_message = _('Invalid cursor')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """Return one page of results after the position in the cursor"""
+        self.request = request
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.page_size = self.get_page_size(request)
+
+        queryset = queryset.order_by(*self.ordering)
+        position = self.decode_cursor(request)
+        if position is not None:
+            try:
+                queryset = queryset.filter(self.seek_filter(position))
+            except (TypeError, ValueError, ValidationError):
+                raise NotFound(self.invalid_cursor_message)
+
+        results = list(queryset[:self.page_size + 1])
+        self.has_next = len(results) > self.page_size
+        results = results[:self.page_size]
+        self.next_position = (
+            self.get_position(results[-1]) if self.has_next else None
+        )
+
+        return results
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('results', data),
+        ]))
+
+    def get_ordering(self, request, queryset, view):
+        """Return the keyset ordering, overridable per view"""
+        return getattr(view, 'keyset_ordering', self.ordering)
+
+    def get_page_size(self, request):
+        """Return the page size requested by client (bounded)"""
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+
+        return max(1, min(size, self.max_page_size))
+
+    def get_position(self, instance):
+        """Return the keyset values of instance as strings"""
+        return [
+            str(getattr(instance, field.lstrip('-')))
+            for field in self.ordering
+        ]
+
+    def seek_filter(self, position):
+        """Build a filter selecting rows strictly after position, e.g.
+        ``a < x OR (a = x AND b < y)`` with an inclusive bound on the
+        leading field so the planner can use it as an index condition"""
+        query = Q()
+        equal = {}
+        for field, value in zip(self.ordering, position):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            query |= Q(**equal, **{f'{name}__{lookup}': value})
+            equal[name] = value
+
+        leading = self.ordering[0]
+        bound = 'lte' if leading.startswith('-') else 'gte'
+
+        return Q(**{f'{leading.lstrip("-")}__{bound}': position[0]}) & query
+
+    def encode_cursor(self, position):
+        """Encode position to an opaque cursor string"""
+        raw = json.dumps(position, separators=(',', ':')).encode()
+
+        return urlsafe_b64encode(raw).decode()
+
+    def decode_cursor(self, request):
+        """Decode position from the cursor query param (if any)"""
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+
+        try:
+            position = json.loads(urlsafe_b64decode(encoded.encode()))
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+        if not isinstance(position, list) or \
+                len(position) != len(self.ordering) or \
+                not all(self.is_position_value(v) for v in position):
+            raise NotFound(self.invalid_cursor_message)
+
+        return position
+
+    def is_position_value(self, value):
+        """Return whether value can be a keyset value of a cursor
+        (positions are encoded as strings, integer ids are accepted)"""
+        return isinstance(value, str) or (
+            isinstance(value, int) and not isinstance(value, bool)
+        )
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+
+        url = self.request.build_absolute_uri()
+
+        return replace_query_param(
+            url, self.cursor_query_param,
+            self.encode_cursor(self.next_position)
+        )
+
+
+class IndexPagination(KeysetPagination):
+    """Keyset pagination sized for board index pages"""
+    page_size = 10
+    max_page_size = 25
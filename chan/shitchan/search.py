@@ -0,0 +1,91 @@
+"""Full-text search over thread titles and content.
+
+On PostgreSQL ``Thread.search_vector`` is kept up to date by a trigger
+(title weighted A, content B) and indexed with GIN, so a search is an
+index lookup no matter how many threads there are. Other databases
+fall back to the ``SearchTerm`` inverted index, maintained by the
+signal handlers in ``shitchan.signals``; it has no stemming and ranks
+by summed term weights."""
+import re
+
+from collections import Counter
+
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connection
+from django.db.models import F, Count, Sum, FloatField
+from django.db.models.functions import Cast
+
+from core.models import Thread, SearchTerm
+
+
+SEARCH_CONFIG = 'english'
+TITLE_WEIGHT = 1.0
+CONTENT_WEIGHT = 0.4
+MAX_TERM_LENGTH = 64
+STOP_WORDS = frozenset((
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'for', 'from', 'in',
+    'is', 'it', 'of', 'on', 'or', 'that', 'the', 'to', 'was', 'with',
+))
+
+_word_re = re.compile(r'\w+')
+
+
+def uses_search_vector():
+    """Return True if the database maintains Thread.search_vector"""
+    return connection.vendor == 'postgresql'
+
+
+def tokenize(text):
+    """Split text into lowercase search terms"""
+    return [
+        word[:MAX_TERM_LENGTH]
+        for word in _word_re.findall(text.lower())
+        if word not in STOP_WORDS
+    ]
+
+
+def thread_terms(title, content):
+    """Return {term: weight} of a thread for the inverted index"""
+    weights = Counter()
+    for term in tokenize(title):
+        weights[term] += TITLE_WEIGHT
+    for term in tokenize(content):
+        weights[term] += CONTENT_WEIGHT
+
+    return weights
+
+
+def index_thread(thread):
+    """Replace inverted index entries of thread"""
+    SearchTerm.objects.filter(thread=thread).delete()
+    SearchTerm.objects.bulk_create([
+        SearchTerm(term=term, thread=thread, weight=weight)
+        for term, weight in thread_terms(thread.title, thread.content).items()
+    ])
+
+
+def search_threads(query, queryset=None):
+    """Return threads of queryset matching every term of query,
+    annotated with their rank"""
+    if queryset is None:
+        queryset = Thread.objects.all()
+
+    if uses_search_vector():
+        search_query = SearchQuery(
+            query, config=SEARCH_CONFIG, search_type='plain'
+        )
+        # ts_rank is a real, cast it so keyset cursors compare exactly
+        return queryset.filter(search_vector=search_query).annotate(
+            rank=Cast(
+                SearchRank(F('search_vector'), search_query), FloatField()
+            )
+        )
+
+    terms = set(tokenize(query))
+    if not terms:
+        return queryset.none()
+
+    return queryset.filter(search_terms__term__in=terms).annotate(
+        matched=Count('search_terms'),
+        rank=Cast(Sum('search_terms__weight'), FloatField()),
+    ).filter(matched=len(terms))
@@ -1,6 +1,10 @@
 from rest_framework import serializers
 
-from core.models import Board
+from django.utils.translation import gettext_lazy as _
+
+from core.models import Board, Thread, Post, Vote, ArchivedThread
+
+from shitchan import thumbnails
 
 
 class BoardSerializer(serializers.ModelSerializer):
@@ -8,5 +12,115 @@ class BoardSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Board
-        fields = ['id', 'title', 'code']
+        fields = ['id', 'title', 'code', 'max_threads']
         read_only_fields = ['id', ]
+
+
+class ThreadSerializer(serializers.ModelSerializer):
+    """Serializer for thread (scores are read from the
+    denormalized counters)"""
+    user = serializers.SlugRelatedField(slug_field='username', read_only=True)
+    thumbnail = serializers.SerializerMethodField()
+    preview = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Thread
+        fields = [
+            'id', 'title', 'content', 'image', 'thumbnail', 'preview',
+            'user', 'upvote_count', 'downvote_count', 'score', 'hot_score',
+            'reply_count', 'last_bumped_at', 'date_created',
+        ]
+        read_only_fields = [
+            'id', 'upvote_count', 'downvote_count', 'score', 'hot_score',
+            'reply_count', 'last_bumped_at', 'date_created',
+        ]
+
+    def get_thumbnail(self, obj):
+        """Return thumbnail urls by format (None until generated)"""
+        return thumbnails.variant_urls(obj, 'thumbnail')
+
+    def get_preview(self, obj):
+        """Return preview urls by format (None until generated)"""
+        return thumbnails.variant_urls(obj, 'preview')
+
+
+class ThreadSearchSerializer(ThreadSerializer):
+    """Serializer for thread search results"""
+    rank = serializers.FloatField(read_only=True)
+
+    class Meta(ThreadSerializer.Meta):
+        fields = ThreadSerializer.Meta.fields + ['rank']
+
+
+class PostSerializer(serializers.ModelSerializer):
+    """Serializer for reply"""
+    user = serializers.SlugRelatedField(slug_field='username', read_only=True)
+
+    class Meta:
+        model = Post
+        fields = ['id', 'thread', 'user', 'content', 'date_created']
+        read_only_fields = ['id', 'thread', 'date_created']
+
+
+class IndexThreadSerializer(ThreadSerializer):
+    """Serializer for thread of the board index with its last replies
+    (attached by the view)"""
+    last_replies = PostSerializer(many=True, read_only=True)
+
+    class Meta(ThreadSerializer.Meta):
+        fields = ThreadSerializer.Meta.fields + ['last_replies']
+
+
+class ArchivedThreadSerializer(serializers.ModelSerializer):
+    """Serializer for archived thread (without replies)"""
+    id = serializers.IntegerField(source='thread_id', read_only=True)
+    user = serializers.CharField(source='data.user', read_only=True)
+    content = serializers.CharField(source='data.content', read_only=True)
+    score = serializers.IntegerField(source='data.score', read_only=True)
+    reply_count = serializers.IntegerField(
+        source='data.reply_count', read_only=True
+    )
+
+    class Meta:
+        model = ArchivedThread
+        fields = [
+            'id', 'title', 'content', 'user', 'score', 'reply_count',
+            'date_created', 'last_bumped_at', 'date_archived',
+        ]
+        read_only_fields = fields
+
+
+class ArchivedThreadDetailSerializer(ArchivedThreadSerializer):
+    """Serializer for archived thread with its replies"""
+    replies = serializers.ListField(source='data.replies', read_only=True)
+
+    class Meta(ArchivedThreadSerializer.Meta):
+        fields = ArchivedThreadSerializer.Meta.fields + ['replies']
+        read_only_fields = fields
+
+
+class VoteSerializer(serializers.Serializer):
+    """Serializer for one vote of a batch"""
+    thread_id = serializers.IntegerField()
+    value = serializers.ChoiceField(choices=Vote.VALUES)
+
+
+class VoteBatchSerializer(serializers.ListSerializer):
+    """Serializer for a batch of votes (one per thread)"""
+    child = VoteSerializer()
+    max_length = 100
+
+    def validate(self, attrs):
+        """Validating batch size and unique threads"""
+        if len(attrs) > self.max_length:
+            msg = _('Ensure this batch has at most %(max)d votes') % {
+                'max': self.max_length
+            }
+            raise serializers.ValidationError(msg)
+
+        thread_ids = [vote['thread_id'] for vote in attrs]
+        if len(set(thread_ids)) != len(thread_ids):
+            msg = _('Each thread may be voted only once per batch')
+            raise serializers.ValidationError(msg)
+
+        return attrs
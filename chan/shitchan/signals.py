@@ -0,0 +1,141 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from core.models import Board, Thread, Post, Vote, Change
+from core.signals import vote_changed
+
+from shitchan import archive, catalog, events, search, thumbnails
+from shitchan.cache import (
+    BOARDS_SCOPE, board_threads_scope, bump_version
+)
+
+
+@receiver(post_save, sender=Board)
+@receiver(post_delete, sender=Board)
+def board_changed(sender, instance, **kwargs):
+    """Invalidate validators of the board list"""
+    bump_version(BOARDS_SCOPE)
+
+
+@receiver(post_save, sender=Thread)
+@receiver(post_delete, sender=Thread)
+def thread_changed(sender, instance, **kwargs):
+    """Invalidate validators of the thread listings of the board"""
+    bump_version(board_threads_scope(instance.board_id))
+
+
+@receiver(post_save, sender=Board)
+def board_change_logged(sender, instance, **kwargs):
+    """Log the board as changed for delta clients"""
+    Change.objects.record(Change.BOARD, {instance.id: None})
+
+
+@receiver(post_delete, sender=Board)
+def board_tombstone_logged(sender, instance, **kwargs):
+    """Leave a tombstone of the deleted board for delta clients"""
+    Change.objects.record(Change.BOARD, {instance.id: None}, deleted=True)
+
+
+@receiver(post_save, sender=Thread)
+def thread_change_logged(sender, instance, **kwargs):
+    """Log the thread as changed for delta clients"""
+    Change.objects.record(Change.THREAD, {instance.id: instance.board_id})
+
+
+@receiver(post_delete, sender=Thread)
+def thread_tombstone_logged(sender, instance, **kwargs):
+    """Leave a tombstone of the deleted thread for delta clients"""
+    Change.objects.record(
+        Change.THREAD, {instance.id: instance.board_id}, deleted=True
+    )
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, **kwargs):
+    """Invalidate thread listings of the board of a bumped thread"""
+    if created:
+        bump_version(board_threads_scope(instance.thread.board_id))
+
+
+@receiver(post_save, sender=Thread)
+def thread_saved(sender, instance, **kwargs):
+    """Patch created/updated thread into the board catalog once it is
+    committed"""
+    transaction.on_commit(lambda: catalog.upsert_thread(instance))
+
+
+@receiver(post_save, sender=Thread)
+def thread_search_saved(sender, instance, **kwargs):
+    """Index thread terms where the database has no search_vector"""
+    if not search.uses_search_vector():
+        search.index_thread(instance)
+
+
+@receiver(post_save, sender=Thread)
+def thread_created(sender, instance, created, **kwargs):
+    """Prune the board once the new thread is committed (throttled)"""
+    if created:
+        board_id = instance.board_id
+        transaction.on_commit(
+            lambda: archive.prune_board_throttled(board_id)
+        )
+
+
+@receiver(post_save, sender=Thread)
+def thread_created_event(sender, instance, created, **kwargs):
+    """Publish the new thread to the event stream of its board"""
+    if created:
+        channel = events.board_channel(instance.board_id)
+        event = {
+            'type': 'thread_created',
+            'data': catalog.catalog_entry(instance),
+        }
+        transaction.on_commit(lambda: events.broker.publish(channel, event))
+
+
+@receiver(post_save, sender=Thread)
+def thread_image_saved(sender, instance, **kwargs):
+    """Schedule variant generation once the new image is committed"""
+    if thumbnails.needs_variants(instance):
+        transaction.on_commit(
+            lambda: thumbnails.generate_variants(instance)
+        )
+
+
+@receiver(post_delete, sender=Thread)
+def thread_deleted(sender, instance, **kwargs):
+    """Remove deleted thread from the board catalog once the delete
+    is committed"""
+    board_id, thread_id = instance.board_id, instance.id
+    transaction.on_commit(
+        lambda: catalog.remove_thread(board_id, thread_id)
+    )
+
+
+@receiver(vote_changed, sender=Vote)
+def vote_changed_handler(sender, thread, value, previous, **kwargs):
+    """Patch the new score of voted thread into the board catalog once
+    the vote is committed"""
+    board_id, thread_id = thread.board_id, thread.id
+    transaction.on_commit(
+        lambda: catalog.add_score(board_id, thread_id, value - previous)
+    )
+    bump_version(board_threads_scope(thread.board_id))
+
+
+@receiver(vote_changed, sender=Vote)
+def vote_changed_event(sender, thread, value, previous, **kwargs):
+    """Publish the counter changes of voted thread to the event stream
+    of its board"""
+    channel = events.board_channel(thread.board_id)
+    event = {
+        'type': 'vote_changed',
+        'data': {
+            'id': thread.id,
+            'upvote_delta': (value == Vote.UP) - (previous == Vote.UP),
+            'downvote_delta': (value == Vote.DOWN) - (previous == Vote.DOWN),
+            'score_delta': value - previous,
+        },
+    }
+    transaction.on_commit(lambda: events.broker.publish(channel, event))
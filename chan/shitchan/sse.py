@@ -0,0 +1,118 @@
+"""Server-Sent Events stream of the events of a board.
+
+A plain ASGI application (routed in ``chan.asgi``), as Django views
+can't hold a connection open without tying up a thread. Every client
+gets its own bounded subscription on the broker of the process."""
+import asyncio
+import json
+import re
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from core import db
+from core.models import Board
+
+from shitchan import events
+
+
+EVENTS_PATH = re.compile(r'^/api/shitchan/boards/(?P<code>[^/]+)/events/$')
+RETRY = 3000
+HEADERS = [
+    (b'content-type', b'text/event-stream'),
+    (b'cache-control', b'no-cache'),
+    (b'x-accel-buffering', b'no'),
+]
+
+
+def format_event(event):
+    """Return event in the text/event-stream format"""
+    return (
+        f'event: {event["type"]}\n'
+        f'data: {json.dumps(event["data"])}\n\n'
+    ).encode()
+
+
+@sync_to_async(thread_sensitive=True)
+def get_board_id(code):
+    """Return id of the board with code or None"""
+    db.check_connections()
+
+    return Board.objects.filter(code=code).values_list(
+        'id', flat=True
+    ).first()
+
+
+async def send_response(send, status, detail):
+    """Send a complete JSON response"""
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', b'application/json')],
+    })
+    await send({
+        'type': 'http.response.body',
+        'body': json.dumps({'detail': detail}).encode(),
+    })
+
+
+async def wait_disconnect(receive):
+    """Return once the client has disconnected"""
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return
+
+
+async def board_events(scope, receive, send, code):
+    """Stream the events of the board with code until the client
+    disconnects or falls too far behind"""
+    if scope['method'] != 'GET':
+        await send_response(send, 405, 'Method not allowed.')
+        return
+
+    board_id = await get_board_id(code)
+    if board_id is None:
+        await send_response(send, 404, 'Not found.')
+        return
+
+    subscription = events.broker.subscribe(events.board_channel(board_id))
+    disconnected = asyncio.ensure_future(wait_disconnect(receive))
+    try:
+        await send({
+            'type': 'http.response.start', 'status': 200, 'headers': HEADERS,
+        })
+        await send({
+            'type': 'http.response.body',
+            'body': f'retry: {RETRY}\n\n'.encode(), 'more_body': True,
+        })
+
+        while True:
+            next_event = asyncio.ensure_future(subscription.get())
+            await asyncio.wait(
+                {next_event, disconnected},
+                timeout=settings.EVENTS_HEARTBEAT,
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+            if disconnected.done():
+                next_event.cancel()
+                return
+            if not next_event.done():
+                next_event.cancel()
+                body = b': heartbeat\n\n'
+            elif next_event.result() is events.OVERFLOW:
+                # Too slow, the client has to reconnect and resync
+                await send({
+                    'type': 'http.response.body',
+                    'body': b'event: overflow\ndata: {}\n\n',
+                })
+                return
+            else:
+                body = format_event(next_event.result())
+
+            await send({
+                'type': 'http.response.body', 'body': body, 'more_body': True,
+            })
+    finally:
+        disconnected.cancel()
+        events.broker.unsubscribe(subscription)
@@ -0,0 +1,165 @@
+import datetime
+
+from io import StringIO
+from unittest.mock import patch
+
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Board, Thread, Post, Vote, ArchivedThread
+
+from shitchan import archive
+
+
+def archive_url(code):
+    """Generate archive url for board"""
+    return reverse('shitchan:board-archive', args=[code])
+
+
+def archive_detail_url(code, thread_id):
+    """Generate archived thread url"""
+    return reverse('shitchan:board-archive-detail', args=[code, thread_id])
+
+
+class ArchiveTests(TestCase):
+    """Test pruning boards into the archive"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            username='testuser', email='test@gmail.com', password='testpass'
+        )
+        self.board = Board.objects.create(
+            title='test board', code='tb', user=self.user, max_threads=2
+        )
+        now = timezone.now()
+        self.threads = []
+        for i in range(5):
+            thread = Thread.objects.create(
+                user=self.user, board=self.board, title=f'thread {i}',
+                content='test content'
+            )
+            Thread.objects.filter(pk=thread.pk).update(
+                last_bumped_at=now - datetime.timedelta(minutes=5 - i)
+            )
+            self.threads.append(thread)
+
+    def test_prune_board_keeps_most_recently_bumped(self):
+        """Test that threads beyond the limit are archived in chunks"""
+        self.threads[0].reply(self.user, 'bump')
+        self.threads[1].vote(self.user, 1)
+
+        pruned = archive.prune_board(self.board.pk, chunk_size=1)
+
+        self.assertEqual(pruned, 3)
+        self.assertEqual(
+            set(Thread.objects.values_list('pk', flat=True)),
+            {self.threads[0].pk, self.threads[4].pk}
+        )
+        self.assertEqual(
+            set(ArchivedThread.objects.values_list('thread_id', flat=True)),
+            {self.threads[1].pk, self.threads[2].pk, self.threads[3].pk}
+        )
+        self.assertFalse(Vote.objects.exists())
+        self.assertEqual(Post.objects.count(), 1)
+
+    @patch('django.db.transaction.on_commit', side_effect=lambda f: f())
+    def test_new_thread_prunes_board(self, on_commit):
+        """Test that creating a thread prunes its board"""
+        Thread.objects.create(
+            user=self.user, board=self.board, title='new', content='new'
+        )
+
+        self.assertEqual(Thread.objects.count(), 2)
+        self.assertEqual(ArchivedThread.objects.count(), 4)
+
+    def test_archive_keeps_threads_bumped_since_picked(self):
+        """Test that a thread bumped after being picked for pruning
+        stays live"""
+        picked = [thread.pk for thread in self.threads[:3]]
+        self.threads[0].reply(self.user, 'bump')
+
+        archived = archive.archive_threads(picked, self.board.max_threads)
+
+        self.assertEqual(archived, 2)
+        self.assertTrue(Thread.objects.filter(pk=self.threads[0].pk).exists())
+        self.assertEqual(Thread.objects.count(), 3)
+
+    @patch('django.db.transaction.on_commit', side_effect=lambda f: f())
+    def test_new_thread_prune_throttled(self, on_commit):
+        """Test that boards are pruned at most once per interval"""
+        Thread.objects.create(
+            user=self.user, board=self.board, title='new', content='new'
+        )
+        Thread.objects.create(
+            user=self.user, board=self.board, title='newer', content='new'
+        )
+
+        self.assertEqual(Thread.objects.count(), 3)
+        self.assertEqual(ArchivedThread.objects.count(), 4)
+
+    def test_prune_under_limit(self):
+        """Test that boards within their limit are left alone"""
+        self.board.max_threads = 10
+        self.board.save()
+
+        self.assertEqual(archive.prune_board(self.board.pk), 0)
+        self.assertEqual(Thread.objects.count(), 5)
+
+    def test_prune_threads_command(self):
+        """Test pruning every board with the command"""
+        out = StringIO()
+
+        call_command('prune_threads', chunk_size=2, stdout=out)
+
+        self.assertEqual(Thread.objects.count(), 2)
+        self.assertIn('Archived 3 threads', out.getvalue())
+
+    def test_archive_list_paginated(self):
+        """Test paging through the archive of a board"""
+        archive.prune_board(self.board.pk)
+
+        res = self.client.get(archive_url(self.board.code), {'page_size': 2})
+        second = self.client.get(res.data['next'])
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [t['id'] for t in res.data['results'] + second.data['results']],
+            [self.threads[2].pk, self.threads[1].pk, self.threads[0].pk]
+        )
+        self.assertEqual(res.data['results'][0]['user'], 'testuser')
+        self.assertNotIn('replies', res.data['results'][0])
+
+    def test_archive_detail_has_replies(self):
+        """Test retrieving an archived thread with its replies"""
+        post = self.threads[0].reply(self.user, 'archived reply')
+        Thread.objects.filter(pk=self.threads[0].pk).update(
+            last_bumped_at=timezone.now() - datetime.timedelta(days=1)
+        )
+        archive.prune_board(self.board.pk)
+
+        res = self.client.get(
+            archive_detail_url(self.board.code, self.threads[0].pk)
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['reply_count'], 1)
+        self.assertEqual(res.data['replies'][0]['id'], post.id)
+        self.assertEqual(res.data['replies'][0]['content'], 'archived reply')
+
+    def test_archive_read_only(self):
+        """Test that the archive can't be written to"""
+        archive.prune_board(self.board.pk)
+        self.client.force_authenticate(user=self.user)
+
+        res = self.client.post(archive_url(self.board.code), {'title': 'x'})
+
+        self.assertEqual(res.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
@@ -1,17 +1,31 @@
+import hashlib
+import time
+
+from unittest.mock import patch
+
 from django.test import TestCase
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
 from django.urls import reverse
+from django.utils.http import http_date
 
 from rest_framework import status
 from rest_framework.test import APIClient
 
 from core.models import Board
+from core.testing import QueryCountMixin
 
+from shitchan.cache import BOARDS_SCOPE, _version_key, get_version
 from shitchan.serializers import BoardSerializer
+from shitchan.views import ManageBoardViewSet
 
 
 # BOARD_URL = reverse('shitchan:board-list')
 MANAGE_BOARD_URL = reverse('shitchan:board-list')
+BOARD_LIST_LOCK = 'response:anon:%s:lock' % hashlib.md5(
+    f'http://testserver{MANAGE_BOARD_URL}'.encode()
+).hexdigest()
 
 
 def detail_url(pk):
@@ -62,10 +76,11 @@ def create_board(user, **params):
     )
 
 
-class BoardPublicApiTests(TestCase):
+class BoardPublicApiTests(QueryCountMixin, TestCase):
     """Test publicly board API (with anonymous user)"""
 
     def setUp(self):
+        cache.clear()
         self.client = APIClient()
 
     def test_access_board_list_endpoint(self):
@@ -81,11 +96,201 @@ class BoardPublicApiTests(TestCase):
         self.assertEqual(res.status_code, status.HTTP_200_OK)
         self.assertEqual(res.data, serializer.data)
 
+    def test_board_list_constant_queries(self):
+        """Test that listing boards doesn't query per board"""
+        admin_user = create_user(is_admin=True)
+        codes = iter(['a', 'b', 'c', 'd'])
+
+        def add_board():
+            code = next(codes)
+            create_board(user=admin_user, title=code, code=code)
+
+        self.assertConstantQueries(
+            lambda: self.client.get(MANAGE_BOARD_URL), add_board
+        )
+
+    def test_board_list_conditional_get(self):
+        """Test that board list with matching validators returns 304
+        without querying the database"""
+        admin_user = create_user(is_admin=True)
+        create_board(user=admin_user)
+        cache.set(
+            _version_key(BOARDS_SCOPE), time.time_ns() // 1000 - 2000000,
+            None
+        )
+        res = self.client.get(MANAGE_BOARD_URL)
+        etag = res['ETag']
+
+        with self.assertNumQueries(0):
+            res = self.client.get(MANAGE_BOARD_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        with self.assertNumQueries(0):
+            res = self.client.get(
+                MANAGE_BOARD_URL,
+                HTTP_IF_MODIFIED_SINCE=res['Last-Modified']
+            )
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    @patch('django.db.transaction.on_commit', side_effect=lambda f: f())
+    def test_board_list_last_modified_of_running_second(self, on_commit):
+        """Test that Last-Modified is withheld while more changes may
+        share its second, so If-Modified-Since can't hide them"""
+        admin_user = create_user(is_admin=True)
+        board = create_board(user=admin_user)
+        since = http_date(time.time() - 1)
+
+        res = self.client.get(MANAGE_BOARD_URL)
+        self.assertNotIn('Last-Modified', res)
+
+        board.title = 'new title'
+        board.save()
+        res = self.client.get(
+            MANAGE_BOARD_URL, HTTP_IF_MODIFIED_SINCE=since
+        )
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    @patch('django.db.transaction.on_commit', side_effect=lambda f: f())
+    def test_board_list_etag_changes_with_boards(self, on_commit):
+        """Test that changing a board invalidates the board list etag"""
+        admin_user = create_user(is_admin=True)
+        board = create_board(user=admin_user)
+        etag = self.client.get(MANAGE_BOARD_URL)['ETag']
+
+        board.title = 'new title'
+        board.save()
+        res = self.client.get(MANAGE_BOARD_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(res['ETag'], etag)
+        self.assertEqual(res.data[0]['title'], 'new title')
+
+    def test_board_list_version_bumped_on_commit(self):
+        """Test that the board list version is kept until the change
+        of a board is committed"""
+        board = create_board(user=create_user(is_admin=True))
+        version = get_version(BOARDS_SCOPE)
+
+        with transaction.atomic():
+            board.title = 'new title'
+            board.save()
+
+            self.assertEqual(get_version(BOARDS_SCOPE), version)
+
+
+class BoardListCacheTests(TestCase):
+    """Test response cache of the board list"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.admin = create_user(is_admin=True)
+        create_board(user=self.admin)
+
+    def test_board_list_cache_hit(self):
+        """Test that a fresh cached board list is served without
+        querying the database"""
+        res = self.client.get(MANAGE_BOARD_URL)
+        self.assertEqual(res['X-Cache'], 'MISS')
+
+        with self.assertNumQueries(0):
+            res = self.client.get(MANAGE_BOARD_URL)
+
+        self.assertEqual(res['X-Cache'], 'HIT')
+        self.assertEqual(len(res.data), 1)
+
+    @patch('django.db.transaction.on_commit', side_effect=lambda f: f())
+    def test_board_list_stale_while_revalidate(self, on_commit):
+        """Test that invalidated list is served stale while another
+        request holds the rebuild lock, then rebuilt"""
+        self.client.get(MANAGE_BOARD_URL)
+        create_board(user=self.admin, title='political', code='pl')
+
+        with patch('django.core.cache.cache.add', return_value=False):
+            with self.assertNumQueries(0):
+                res = self.client.get(MANAGE_BOARD_URL)
+        self.assertEqual(res['X-Cache'], 'STALE')
+        self.assertEqual(len(res.data), 1)
+
+        res = self.client.get(MANAGE_BOARD_URL)
+        self.assertEqual(res['X-Cache'], 'MISS')
+        self.assertEqual(len(res.data), 2)
+
+    @patch('time.sleep')
+    def test_board_list_cold_miss_waits_for_lock(self, mock_sleep):
+        """Test that a cold miss waits for the lock holder instead of
+        querying the database"""
+        real_add = cache.add
+        lock_held = [True]
+
+        def add(key, *args, **kwargs):
+            if key.endswith(':lock') and lock_held[0]:
+                return False
+            return real_add(key, *args, **kwargs)
+
+        def rebuilt_by_other_worker(seconds):
+            lock_held[0] = False
+            self.client.get(MANAGE_BOARD_URL)
+
+        mock_sleep.side_effect = rebuilt_by_other_worker
+        with patch('django.core.cache.cache.add', side_effect=add):
+            res = self.client.get(MANAGE_BOARD_URL)
+
+        self.assertEqual(res['X-Cache'], 'HIT')
+        self.assertEqual(mock_sleep.call_count, 1)
+
+    @patch('time.sleep')
+    def test_board_list_waiter_builds_after_failed_rebuild(self, mock_sleep):
+        """Test that a cold miss stops waiting once the lock holder
+        released the lock without storing an entry"""
+        cache.set(BOARD_LIST_LOCK, 'other', 10)
+        mock_sleep.side_effect = lambda seconds: cache.delete(BOARD_LIST_LOCK)
+
+        res = self.client.get(MANAGE_BOARD_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res['X-Cache'], 'MISS')
+        self.assertEqual(mock_sleep.call_count, 1)
+
+    def test_board_list_waiter_keeps_foreign_lock(self):
+        """Test that a request giving up on waiting doesn't release
+        the lock of another request"""
+        cache.set(BOARD_LIST_LOCK, 'other', 10)
+
+        with patch.object(ManageBoardViewSet, 'cache_lock_timeout', 0):
+            res = self.client.get(MANAGE_BOARD_URL)
+
+        self.assertEqual(res['X-Cache'], 'MISS')
+        self.assertEqual(cache.get(BOARD_LIST_LOCK), 'other')
+
+    def test_board_list_cache_varies_by_host(self):
+        """Test that hosts and schemes get separate entries, as cached
+        bodies hold absolute pagination links"""
+        self.client.get(MANAGE_BOARD_URL, HTTP_HOST='a.example.com')
+
+        res = self.client.get(MANAGE_BOARD_URL, HTTP_HOST='b.example.com')
+        self.assertEqual(res['X-Cache'], 'MISS')
+
+        res = self.client.get(
+            MANAGE_BOARD_URL, HTTP_HOST='a.example.com', secure=True
+        )
+        self.assertEqual(res['X-Cache'], 'MISS')
+
+    def test_board_list_cache_varies_by_auth(self):
+        """Test that anonymous and admin users get separate entries"""
+        self.client.get(MANAGE_BOARD_URL)
+        self.client.force_authenticate(user=self.admin)
+
+        res = self.client.get(MANAGE_BOARD_URL)
+
+        self.assertEqual(res['X-Cache'], 'MISS')
+
 
 class BoardPrivateApiTests(TestCase):
     """Test privately board API with user"""
 
     def setUp(self):
+        cache.clear()
         self.client = APIClient()
         self.user = create_user()
         self.client.force_authenticate(user=self.user)
@@ -103,6 +308,7 @@ class BoardAdminApiTests(TestCase):
     """Test privately board API with admin user"""
 
     def setUp(self):
+        cache.clear()
         self.client = APIClient()
         self.admin = create_user(is_admin=True)
         self.client.force_authenticate(user=self.admin)
@@ -0,0 +1,154 @@
+from unittest.mock import patch
+
+from django.db import transaction
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Board, Thread
+
+from shitchan import catalog
+
+
+def catalog_url(code):
+    """Generate catalog url for board"""
+    return reverse('shitchan:board-catalog', args=[code])
+
+
+def create_thread(user, board, **params):
+    """Helper function to create a new thread"""
+    defaults = {
+        'title': 'test thread',
+        'content': 'test content'
+    }
+    defaults.update(**params)
+
+    return Thread.objects.create(user=user, board=board, **defaults)
+
+
+class CatalogApiTests(TestCase):
+    """Test board catalog API"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            username='testuser', email='test@gmail.com', password='testpass'
+        )
+        self.board = Board.objects.create(
+            title='test board', code='tb', user=self.user
+        )
+
+    def test_retrieve_catalog(self):
+        """Test retrieving catalog lists threads newest first"""
+        first = create_thread(self.user, self.board, content='x' * 500)
+        second = create_thread(self.user, self.board)
+
+        res = self.client.get(catalog_url(self.board.code))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [entry['id'] for entry in res.data], [second.id, first.id]
+        )
+        self.assertEqual(len(res.data[1]['excerpt']), catalog.EXCERPT_LENGTH)
+
+    def test_catalog_served_from_snapshot(self):
+        """Test that a cached catalog does not query threads"""
+        create_thread(self.user, self.board)
+        self.client.get(catalog_url(self.board.code))
+
+        with self.assertNumQueries(1):
+            res = self.client.get(catalog_url(self.board.code))
+
+        self.assertEqual(len(res.data), 1)
+
+    @patch('django.db.transaction.on_commit', side_effect=lambda f: f())
+    def test_catalog_patched_by_signals(self, on_commit):
+        """Test that created, voted and deleted threads are patched
+        into the stored snapshot"""
+        old = create_thread(self.user, self.board)
+        self.client.get(catalog_url(self.board.code))
+
+        new = create_thread(self.user, self.board, title='new thread')
+        new.vote(self.user, 1)
+        old.delete()
+
+        with self.assertNumQueries(1):
+            res = self.client.get(catalog_url(self.board.code))
+
+        self.assertEqual([entry['id'] for entry in res.data], [new.id])
+        self.assertEqual(res.data[0]['title'], 'new thread')
+        self.assertEqual(res.data[0]['score'], 1)
+
+    def test_catalog_not_patched_by_rolled_back_changes(self):
+        """Test that threads and votes of a rolled back transaction
+        are not patched into the snapshot"""
+        thread = create_thread(self.user, self.board)
+        self.client.get(catalog_url(self.board.code))
+
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                create_thread(self.user, self.board, title='phantom')
+                thread.vote(self.user, 1)
+                raise RuntimeError
+
+        res = self.client.get(catalog_url(self.board.code))
+
+        self.assertEqual([entry['id'] for entry in res.data], [thread.id])
+        self.assertEqual(res.data[0]['score'], 0)
+
+    def test_concurrent_patch_drops_snapshot(self):
+        """Test that a patch skipped while another worker writes the
+        snapshot makes that worker drop it instead of storing it"""
+        thread = create_thread(self.user, self.board)
+        self.client.get(catalog_url(self.board.code))
+
+        def concurrent_patch(snapshot):
+            catalog.add_score(self.board.id, thread.id, 1)
+            snapshot[0]['title'] = 'patched'
+
+        catalog.patch_catalog(self.board.id, concurrent_patch)
+
+        self.assertIsNone(cache.get(catalog.catalog_key(self.board.id)))
+
+    def test_lock_taken_over_not_released(self):
+        """Test that a writer whose lock expired and was taken by
+        another worker leaves that worker's lock alone"""
+        create_thread(self.user, self.board)
+        self.client.get(catalog_url(self.board.code))
+        lock = catalog._lock_key(self.board.id)
+
+        def slow_patch(snapshot):
+            cache.set(lock, 'other', catalog.LOCK_TIMEOUT)
+
+        catalog.patch_catalog(self.board.id, slow_patch)
+
+        self.assertEqual(cache.get(lock), 'other')
+
+    def test_build_not_stored_after_concurrent_patch(self):
+        """Test that a build outliving its lock doesn't store rows read
+        before a patch of the board"""
+        thread = create_thread(self.user, self.board, image='a.jpg')
+        lock = catalog._lock_key(self.board.id)
+
+        def patched_during_query(image, variants):
+            cache.delete(lock)
+            catalog.add_score(self.board.id, thread.id, 1)
+
+        with patch.object(
+            catalog, '_thumbnail_url', side_effect=patched_during_query
+        ):
+            snapshot = catalog.build_catalog(self.board.id)
+
+        self.assertEqual([entry['id'] for entry in snapshot], [thread.id])
+        self.assertIsNone(cache.get(catalog.catalog_key(self.board.id)))
+
+    def test_catalog_unknown_board(self):
+        """Test that catalog of unknown board returns 404"""
+        res = self.client.get(catalog_url('nope'))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
@@ -0,0 +1,175 @@
+from unittest.mock import patch
+
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Board, Thread, Post, Change
+
+from shitchan import archive, delta
+
+
+BOARD_CHANGES_URL = reverse('shitchan:board-changes')
+
+
+def changes_url(code):
+    """Generate thread changes url for board"""
+    return reverse('shitchan:board-thread-changes', args=[code])
+
+
+def create_thread(user, board, **params):
+    """Helper function to create a new thread"""
+    defaults = {
+        'title': 'test thread',
+        'content': 'test content'
+    }
+    defaults.update(**params)
+
+    return Thread.objects.create(user=user, board=board, **defaults)
+
+
+class ChangesApiTests(TestCase):
+    """Test board and thread delta API"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            username='testuser', email='test@gmail.com', password='testpass'
+        )
+        self.board = Board.objects.create(
+            title='test board', code='tb', user=self.user
+        )
+        self.threads = [
+            create_thread(self.user, self.board, title=f'thread {i}')
+            for i in range(3)
+        ]
+        other = Board.objects.create(
+            title='other board', code='ob', user=self.user
+        )
+        create_thread(self.user, other)
+
+    def test_full_sync(self):
+        """Test that a delta without cursor returns every thread"""
+        res = self.client.get(changes_url('tb'))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [thread['id'] for thread in res.data['changed']],
+            [thread.id for thread in self.threads]
+        )
+        self.assertEqual(res.data['deleted'], [])
+        self.assertFalse(res.data['more'])
+
+    def test_nothing_new(self):
+        """Test that a delta at the head is empty and costs one lookup
+        of the change log"""
+        cursor = self.client.get(changes_url('tb')).data['cursor']
+
+        with self.assertNumQueries(2):
+            res = self.client.get(changes_url('tb'), {'cursor': cursor})
+
+        self.assertEqual(res.data['changed'], [])
+        self.assertEqual(res.data['deleted'], [])
+        self.assertEqual(res.data['cursor'], cursor)
+
+    def test_changed_threads(self):
+        """Test that created, voted and replied threads are returned
+        with their current data"""
+        cursor = self.client.get(changes_url('tb')).data['cursor']
+        self.threads[0].vote(self.user, 1)
+        Post.objects.reply(self.threads[2], user=self.user, content='reply')
+        new = create_thread(self.user, self.board, title='new')
+
+        res = self.client.get(changes_url('tb'), {'cursor': cursor})
+
+        changed = {thread['id']: thread for thread in res.data['changed']}
+        self.assertEqual(
+            set(changed), {self.threads[0].id, self.threads[2].id, new.id}
+        )
+        self.assertEqual(changed[self.threads[0].id]['score'], 1)
+        self.assertEqual(changed[self.threads[2].id]['reply_count'], 1)
+
+        res = self.client.get(
+            changes_url('tb'), {'cursor': res.data['cursor']}
+        )
+        self.assertEqual(res.data['changed'], [])
+
+    def test_deleted_threads(self):
+        """Test that deleted and archived threads leave tombstones"""
+        cursor = self.client.get(changes_url('tb')).data['cursor']
+        deleted = [self.threads[0].id, self.threads[1].id]
+        self.threads[0].delete()
+        Board.objects.filter(pk=self.board.pk).update(max_threads=1)
+        archive.prune_board(self.board.id)
+
+        res = self.client.get(changes_url('tb'), {'cursor': cursor})
+
+        self.assertEqual(res.data['changed'], [])
+        self.assertEqual(sorted(res.data['deleted']), deleted)
+
+    def test_board_changes(self):
+        """Test the delta of the board list"""
+        res = self.client.get(BOARD_CHANGES_URL)
+        self.assertEqual(
+            [board['code'] for board in res.data['changed']], ['tb', 'ob']
+        )
+
+        Board.objects.get(code='ob').delete()
+        new = Board.objects.create(title='new', code='nb', user=self.user)
+        res = self.client.get(
+            BOARD_CHANGES_URL, {'cursor': res.data['cursor']}
+        )
+
+        self.assertEqual(
+            [board['id'] for board in res.data['changed']], [new.id]
+        )
+        self.assertEqual(len(res.data['deleted']), 1)
+
+    def test_invalid_cursor(self):
+        """Test that a malformed cursor is rejected"""
+        for cursor in ['abc', '1', '1.-2', '1.2.3']:
+            res = self.client.get(changes_url('tb'), {'cursor': cursor})
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_pages(self):
+        """Test that large deltas are returned in pages"""
+        scope = {'kind': Change.THREAD, 'board_id': self.board.id}
+
+        cursor, more, changed, _ = delta.get_delta(scope, page_size=2)
+        self.assertTrue(more)
+        self.assertEqual(changed, [self.threads[0].id, self.threads[1].id])
+
+        cursor, more, changed, _ = delta.get_delta(scope, cursor, 2)
+        self.assertFalse(more)
+        self.assertEqual(changed, [self.threads[2].id])
+
+    @patch('core.models.ChangeManager.horizon')
+    def test_late_commit_not_skipped(self, horizon):
+        """Test that changes of transactions still running are held
+        back, so one committed late isn't skipped by the cursor"""
+        Change.objects.all().delete()
+        Change.objects.bulk_create([
+            Change(kind=Change.THREAD, object_id=1, board_id=1,
+                   position=1, transaction_id=5),
+            Change(kind=Change.THREAD, object_id=2, board_id=1,
+                   position=2, transaction_id=7),
+            Change(kind=Change.THREAD, object_id=3, board_id=1,
+                   position=3, transaction_id=6),
+        ])
+        scope = {'kind': Change.THREAD, 'board_id': 1}
+
+        horizon.return_value = 7
+        cursor, _, changed, _ = delta.get_delta(scope)
+        self.assertEqual(changed, [1, 3])
+        self.assertEqual(cursor, (7, 0))
+
+        horizon.return_value = 8
+        cursor, _, changed, _ = delta.get_delta(scope, cursor)
+        self.assertEqual(changed, [2])
+        self.assertEqual(cursor, (8, 0))
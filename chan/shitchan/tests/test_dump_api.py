@@ -0,0 +1,145 @@
+import gzip
+import json
+
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Board, Thread, Post, Vote
+
+from shitchan import dump
+
+
+def dump_url(code):
+    """Generate dump url for board"""
+    return reverse('shitchan:board-dump', args=[code])
+
+
+def create_thread(user, board, **params):
+    """Helper function to create a new thread"""
+    defaults = {
+        'title': 'test thread',
+        'content': 'test content'
+    }
+    defaults.update(**params)
+
+    return Thread.objects.create(user=user, board=board, **defaults)
+
+
+def read_lines(res):
+    """Return the JSON lines of a streaming response"""
+    content = b''.join(res.streaming_content)
+    if res.get('Content-Encoding') == 'gzip':
+        content = gzip.decompress(content)
+
+    return [json.loads(line) for line in content.decode().splitlines()]
+
+
+class DumpApiTests(TestCase):
+    """Test board dump API"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            username='testuser', email='test@gmail.com', password='testpass'
+        )
+        self.board = Board.objects.create(
+            title='test board', code='tb', user=self.user
+        )
+
+    def test_dump_board(self):
+        """Test streaming every thread of a board with its replies"""
+        threads = [
+            create_thread(self.user, self.board, title=f'thread {i}')
+            for i in range(3)
+        ]
+        Post.objects.reply(threads[1], user=self.user, content='first')
+        Post.objects.reply(threads[1], user=self.user, content='second')
+        other = Board.objects.create(
+            title='other board', code='ob', user=self.user
+        )
+        create_thread(self.user, other)
+
+        res = self.client.get(dump_url('tb'))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(res.streaming)
+        self.assertEqual(res['Content-Type'], 'application/x-ndjson')
+        lines = read_lines(res)
+        self.assertEqual(
+            [line['id'] for line in lines], [thread.id for thread in threads]
+        )
+        self.assertEqual(lines[1]['user'], 'testuser')
+        self.assertEqual(lines[1]['reply_count'], 2)
+        self.assertEqual(
+            [reply['content'] for reply in lines[1]['replies']],
+            ['first', 'second']
+        )
+        self.assertEqual(lines[0]['replies'], [])
+
+    def test_dump_gzip(self):
+        """Test that the dump is gzipped for clients accepting it"""
+        create_thread(self.user, self.board)
+
+        res = self.client.get(dump_url('tb'), HTTP_ACCEPT_ENCODING='gzip')
+
+        self.assertEqual(res['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', res['Vary'])
+        self.assertEqual(len(read_lines(res)), 1)
+
+    def test_dump_since(self):
+        """Test that ?since= only dumps threads changed after the cursor
+        of the previous pull, replies and votes included"""
+        replied = create_thread(self.user, self.board, title='replied')
+        voted = create_thread(self.user, self.board, title='voted')
+        create_thread(self.user, self.board, title='untouched')
+        res = self.client.get(dump_url('tb'))
+        self.assertEqual(len(read_lines(res)), 3)
+
+        Post.objects.reply(replied, user=self.user, content='reply')
+        Vote.objects.cast(voted, self.user, Vote.UP)
+        create_thread(self.user, self.board, title='new')
+        res = self.client.get(dump_url('tb'), {'since': res['X-Next-Since']})
+
+        self.assertEqual(
+            [line['title'] for line in read_lines(res)],
+            ['replied', 'voted', 'new']
+        )
+
+        res = self.client.get(dump_url('tb'), {'since': res['X-Next-Since']})
+
+        self.assertEqual(read_lines(res), [])
+
+    def test_dump_invalid_since(self):
+        """Test that an unparsable ?since= is rejected"""
+        res = self.client.get(dump_url('tb'), {'since': 'yesterday'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('since', json.loads(res.content))
+
+    def test_dump_unknown_board(self):
+        """Test dumping a board that doesn't exist"""
+        res = self.client.get(
+            dump_url('xx'), HTTP_ACCEPT='application/x-ndjson'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_dump_queries_per_chunk(self):
+        """Test that the dump runs a fixed number of queries per chunk"""
+        for i in range(5):
+            thread = create_thread(self.user, self.board)
+            Post.objects.reply(thread, user=self.user, content='reply')
+
+        # 3 chunks of threads and their replies, then the empty chunk
+        with self.assertNumQueries(7):
+            chunks = list(dump.dump_lines(self.board.id, chunk_size=2))
+
+        self.assertEqual(
+            [chunk.count('\n') for chunk in chunks], [2, 2, 1]
+        )
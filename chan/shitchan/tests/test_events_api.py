@@ -0,0 +1,209 @@
+import asyncio
+import json
+
+from unittest.mock import patch
+
+from asgiref.sync import async_to_sync, sync_to_async
+from django.test import TestCase, override_settings
+from django.contrib.auth import get_user_model
+
+from core.models import Board, Thread, Vote
+
+from chan.asgi import application
+from shitchan import events
+
+
+def events_path(code):
+    """Generate event stream path for board"""
+    return f'/api/shitchan/boards/{code}/events/'
+
+
+async def wait_for(condition, timeout=2):
+    """Wait until condition() is true"""
+    for _ in range(int(timeout / 0.01)):
+        if condition():
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError('Timed out')
+
+
+class EventStream:
+    """Event stream request to the ASGI application"""
+
+    def __init__(self, path, method='GET'):
+        self.scope = {
+            'type': 'http', 'method': method, 'path': path,
+            'query_string': b'', 'headers': [],
+        }
+        self.messages = []
+
+    @property
+    def body(self):
+        return b''.join(
+            message.get('body', b'') for message in self.messages
+        ).decode()
+
+    async def send(self, message):
+        self.messages.append(message)
+
+    async def start(self):
+        self.requests = asyncio.Queue()
+        await self.requests.put({'type': 'http.request', 'body': b''})
+        self.task = asyncio.ensure_future(
+            application(self.scope, self.requests.get, self.send)
+        )
+        await wait_for(lambda: self.messages or self.task.done())
+
+    async def disconnect(self):
+        await self.requests.put({'type': 'http.disconnect'})
+        await asyncio.wait_for(self.task, 2)
+
+
+class BrokerTests(TestCase):
+    """Test fan-out of events to subscriptions"""
+
+    @async_to_sync
+    async def test_fan_out(self):
+        """Test that events reach every subscription of their channel"""
+        broker = events.Broker(events.MemoryBackend())
+        first = broker.subscribe('board:1')
+        second = broker.subscribe('board:1')
+        other = broker.subscribe('board:2')
+
+        broker.publish('board:1', {'type': 'test', 'data': 1})
+        await asyncio.sleep(0)
+
+        self.assertEqual((await first.get())['data'], 1)
+        self.assertEqual((await second.get())['data'], 1)
+        self.assertTrue(other.queue.empty())
+
+    @async_to_sync
+    async def test_slow_subscription_overflow(self):
+        """Test that a full subscription drops its backlog without
+        holding back the others"""
+        broker = events.Broker(events.MemoryBackend(), queue_size=2)
+        slow = broker.subscribe('board:1')
+        fast = broker.subscribe('board:1')
+
+        for i in range(3):
+            broker.publish('board:1', {'type': 'test', 'data': i})
+            await asyncio.sleep(0)
+            await fast.get()
+
+        self.assertIs(await slow.get(), events.OVERFLOW)
+        self.assertTrue(slow.queue.empty())
+        broker.unsubscribe(slow)
+        broker.unsubscribe(fast)
+        self.assertEqual(broker.subscriptions, {})
+
+
+class EventStreamTests(TestCase):
+    """Test board event stream"""
+
+    def setUp(self):
+        on_commit = patch(
+            'django.db.transaction.on_commit', side_effect=lambda f: f()
+        )
+        on_commit.start()
+        self.addCleanup(on_commit.stop)
+        self.user = get_user_model().objects.create_user(
+            username='testuser', email='test@gmail.com', password='testpass'
+        )
+        self.board = Board.objects.create(
+            title='test board', code='tb', user=self.user
+        )
+        self.other = Board.objects.create(
+            title='other board', code='ob', user=self.user
+        )
+
+    @async_to_sync
+    async def test_stream_thread_created(self):
+        """Test that new threads of the board are streamed"""
+        stream = EventStream(events_path('tb'))
+        await stream.start()
+
+        @sync_to_async(thread_sensitive=True)
+        def create_threads():
+            Thread.objects.create(
+                title='other', content='content', user=self.user,
+                board=self.other
+            )
+            Thread.objects.create(
+                title='new thread', content='content', user=self.user,
+                board=self.board
+            )
+
+        await create_threads()
+        await wait_for(lambda: 'thread_created' in stream.body)
+        await stream.disconnect()
+
+        start = stream.messages[0]
+        self.assertEqual(start['status'], 200)
+        self.assertIn(
+            (b'content-type', b'text/event-stream'), start['headers']
+        )
+        event, data = stream.body.split('\n\n')[1].split('\n')
+        self.assertEqual(event, 'event: thread_created')
+        self.assertEqual(
+            json.loads(data[len('data: '):])['title'], 'new thread'
+        )
+        self.assertNotIn('other', stream.body)
+
+    @async_to_sync
+    async def test_stream_vote_changed(self):
+        """Test that vote changes of the board are streamed"""
+        thread = await sync_to_async(
+            Thread.objects.create, thread_sensitive=True
+        )(title='thread', content='content', user=self.user, board=self.board)
+        stream = EventStream(events_path('tb'))
+        await stream.start()
+
+        await sync_to_async(Vote.objects.cast, thread_sensitive=True)(
+            thread, self.user, Vote.DOWN
+        )
+        await wait_for(lambda: 'vote_changed' in stream.body)
+        await stream.disconnect()
+
+        data = stream.body.split('data: ')[-1]
+        self.assertEqual(json.loads(data), {
+            'id': thread.id, 'upvote_delta': 0, 'downvote_delta': 1,
+            'score_delta': -1,
+        })
+
+    @async_to_sync
+    async def test_stream_overflow(self):
+        """Test that a client too far behind is told to resync and
+        disconnected"""
+        stream = EventStream(events_path('tb'))
+        with patch.object(events.broker, 'queue_size', 1):
+            await stream.start()
+        subscription, = events.broker.subscriptions[
+            events.board_channel(self.board.id)
+        ]
+        for i in range(3):
+            subscription.put({'type': 'test', 'data': i})
+
+        await asyncio.wait_for(stream.task, 2)
+
+        self.assertIn('event: overflow', stream.body)
+        self.assertFalse(stream.messages[-1].get('more_body'))
+        self.assertEqual(events.broker.subscriptions, {})
+
+    @override_settings(EVENTS_HEARTBEAT=0.01)
+    @async_to_sync
+    async def test_stream_heartbeat(self):
+        """Test that idle streams get heartbeat comments"""
+        stream = EventStream(events_path('tb'))
+        await stream.start()
+
+        await wait_for(lambda: ': heartbeat' in stream.body)
+        await stream.disconnect()
+
+    @async_to_sync
+    async def test_stream_unknown_board(self):
+        """Test streaming the events of a board that doesn't exist"""
+        stream = EventStream(events_path('xx'))
+        await stream.start()
+        await asyncio.wait_for(stream.task, 2)
+
+        self.assertEqual(stream.messages[0]['status'], 404)
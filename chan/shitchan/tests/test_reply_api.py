@@ -0,0 +1,183 @@
+import datetime
+
+from unittest.mock import patch
+
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Board, Thread, Post
+from core.testing import QueryCountMixin
+
+from shitchan import archive
+from shitchan.views import ThreadReplyListView
+
+
+def replies_url(thread_id):
+    """Generate replies url for thread"""
+    return reverse('shitchan:thread-replies', args=[thread_id])
+
+
+def index_url(code):
+    """Generate index url for board"""
+    return reverse('shitchan:board-index', args=[code])
+
+
+def create_thread(user, board, **params):
+    """Helper function to create a new thread"""
+    defaults = {
+        'title': 'test thread',
+        'content': 'test content'
+    }
+    defaults.update(**params)
+
+    return Thread.objects.create(user=user, board=board, **defaults)
+
+
+class ReplyApiTests(QueryCountMixin, TestCase):
+    """Test thread replies and board index API"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            username='testuser', email='test@gmail.com', password='testpass'
+        )
+        self.board = Board.objects.create(
+            title='test board', code='tb', user=self.user
+        )
+        self.thread = create_thread(self.user, self.board)
+
+    def test_reply_unauthorized(self):
+        """Test that anonymous users can't reply"""
+        res = self.client.post(
+            replies_url(self.thread.id), {'content': 'reply'}
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_reply_bumps_thread(self):
+        """Test that replying counts the reply and bumps the thread"""
+        self.client.force_authenticate(user=self.user)
+
+        res = self.client.post(
+            replies_url(self.thread.id), {'content': 'reply'}
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res.data['user'], 'testuser')
+        post = Post.objects.get(pk=res.data['id'])
+        self.thread.refresh_from_db()
+        self.assertEqual(self.thread.reply_count, 1)
+        self.assertEqual(self.thread.last_bumped_at, post.date_created)
+
+    def test_reply_committed_late_keeps_bump(self):
+        """Test that a reply older than the last bump (committed after
+        a newer one) doesn't move the bump backwards"""
+        bumped = timezone.now() + datetime.timedelta(minutes=1)
+        Thread.objects.filter(pk=self.thread.pk).update(
+            last_bumped_at=bumped
+        )
+        self.thread.refresh_from_db()
+
+        self.thread.reply(self.user, 'late')
+        self.assertEqual(self.thread.last_bumped_at, bumped)
+
+        self.thread.refresh_from_db()
+        self.assertEqual(self.thread.reply_count, 1)
+        self.assertEqual(self.thread.last_bumped_at, bumped)
+
+    def test_reply_to_thread_archived_meanwhile(self):
+        """Test that replying to a thread archived after it was read
+        is answered with 404"""
+        self.client.force_authenticate(user=self.user)
+        thread = self.thread
+        archive.archive_threads([thread.id])
+
+        with patch.object(
+            ThreadReplyListView, 'get_thread', return_value=thread
+        ):
+            res = self.client.post(replies_url(thread.id), {'content': 'r'})
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertFalse(Post.objects.exists())
+
+    def test_list_replies_oldest_first(self):
+        """Test listing replies of a thread in posting order"""
+        first = self.thread.reply(self.user, 'first')
+        second = self.thread.reply(self.user, 'second')
+
+        res = self.client.get(replies_url(self.thread.id))
+
+        self.assertEqual(
+            [post['id'] for post in res.data['results']],
+            [first.id, second.id]
+        )
+
+    def test_bumped_ordering(self):
+        """Test listing threads by their last bump"""
+        newer = create_thread(self.user, self.board)
+        self.thread.reply(self.user, 'bump')
+
+        res = self.client.get(
+            reverse('shitchan:board-threads', args=[self.board.code]),
+            {'ordering': 'bumped'}
+        )
+
+        self.assertEqual(
+            [thread['id'] for thread in res.data['results']],
+            [self.thread.id, newer.id]
+        )
+
+    def test_index_shows_last_replies(self):
+        """Test that the index lists bumped threads with their
+        last replies, oldest first"""
+        quiet = create_thread(self.user, self.board)
+        posts = [self.thread.reply(self.user, f'r{i}') for i in range(5)]
+
+        res = self.client.get(index_url(self.board.code), {'replies': 2})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        threads = res.data['results']
+        self.assertEqual(
+            [thread['id'] for thread in threads], [self.thread.id, quiet.id]
+        )
+        self.assertEqual(
+            [post['id'] for post in threads[0]['last_replies']],
+            [posts[3].id, posts[4].id]
+        )
+        self.assertEqual(threads[0]['reply_count'], 5)
+        self.assertEqual(threads[1]['last_replies'], [])
+
+    def test_index_constant_queries(self):
+        """Test that the index doesn't query per thread or reply"""
+        def grow():
+            thread = create_thread(self.user, self.board)
+            for i in range(4):
+                thread.reply(self.user, f'reply {i}')
+
+        self.assertConstantQueries(
+            lambda: self.client.get(index_url(self.board.code)), grow
+        )
+
+    @patch('django.db.transaction.on_commit', side_effect=lambda f: f())
+    def test_index_invalidated_by_reply(self, on_commit):
+        """Test that a reply bumps the cached index"""
+        self.client.get(index_url(self.board.code))
+        self.thread.reply(self.user, 'fresh')
+
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.get(index_url(self.board.code))
+
+        self.assertEqual(res['X-Cache'], 'MISS')
+        self.assertEqual(len(ctx), 3)
+        self.assertEqual(
+            res.data['results'][0]['last_replies'][0]['content'], 'fresh'
+        )
@@ -0,0 +1,149 @@
+from io import StringIO
+
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Board, Thread, SearchTerm
+from core.testing import QueryCountMixin
+
+from shitchan.pagination import KeysetPagination
+
+
+SEARCH_URL = reverse('shitchan:thread-search')
+
+
+def create_thread(user, board, **params):
+    """Helper function to create a new thread"""
+    defaults = {
+        'title': 'test thread',
+        'content': 'test content'
+    }
+    defaults.update(**params)
+
+    return Thread.objects.create(user=user, board=board, **defaults)
+
+
+class SearchApiTests(QueryCountMixin, TestCase):
+    """Test thread search API"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            username='testuser', email='test@gmail.com', password='testpass'
+        )
+        self.board = Board.objects.create(
+            title='test board', code='tb', user=self.user
+        )
+
+    def test_search_requires_query(self):
+        """Test that searching without a query fails"""
+        res = self.client.get(SEARCH_URL, {'q': ' '})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_search_matches_every_term(self):
+        """Test that only threads containing all terms are returned"""
+        both = create_thread(
+            self.user, self.board, title='Linux kernel', content='panic'
+        )
+        create_thread(self.user, self.board, title='Linux', content='distro')
+
+        res = self.client.get(SEARCH_URL, {'q': 'kernel linux'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([t['id'] for t in res.data['results']], [both.id])
+
+    def test_search_ranks_title_matches_first(self):
+        """Test that title matches outrank content matches"""
+        in_content = create_thread(
+            self.user, self.board, title='misc', content='about rust'
+        )
+        in_title = create_thread(
+            self.user, self.board, title='rust', content='misc'
+        )
+
+        res = self.client.get(SEARCH_URL, {'q': 'rust'})
+
+        self.assertEqual(
+            [t['id'] for t in res.data['results']],
+            [in_title.id, in_content.id]
+        )
+        self.assertGreater(
+            res.data['results'][0]['rank'], res.data['results'][1]['rank']
+        )
+
+    def test_search_filtered_by_board(self):
+        """Test searching within one board"""
+        other = Board.objects.create(
+            title='other board', code='ob', user=self.user
+        )
+        thread = create_thread(self.user, self.board, title='vim')
+        create_thread(self.user, other, title='vim')
+
+        res = self.client.get(SEARCH_URL, {'q': 'vim', 'board': 'tb'})
+
+        self.assertEqual([t['id'] for t in res.data['results']], [thread.id])
+
+    def test_search_paginates_by_rank(self):
+        """Test walking through search results with the cursor"""
+        threads = [
+            create_thread(self.user, self.board, title='emacs ' * (i + 1))
+            for i in range(3)
+        ]
+
+        res = self.client.get(SEARCH_URL, {'q': 'emacs', 'page_size': 2})
+        second = self.client.get(res.data['next'])
+
+        self.assertEqual(
+            [t['id'] for t in res.data['results']],
+            [threads[2].id, threads[1].id]
+        )
+        self.assertEqual(
+            [t['id'] for t in second.data['results']], [threads[0].id]
+        )
+        self.assertIsNone(second.data['next'])
+
+    def test_search_malformed_cursor(self):
+        """Test that a cursor with values of the wrong type returns 404"""
+        create_thread(self.user, self.board, title='emacs')
+        cursor = KeysetPagination().encode_cursor([[1], [1]])
+
+        res = self.client.get(SEARCH_URL, {'q': 'emacs', 'cursor': cursor})
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_search_constant_queries(self):
+        """Test that searching doesn't query per result"""
+        self.assertConstantQueries(
+            lambda: self.client.get(SEARCH_URL, {'q': 'lisp'}),
+            lambda: create_thread(self.user, self.board, title='lisp'),
+        )
+
+    def test_edited_thread_reindexed(self):
+        """Test that edits replace the indexed terms"""
+        thread = create_thread(self.user, self.board, title='python')
+        thread.title = 'haskell'
+        thread.save()
+
+        old = self.client.get(SEARCH_URL, {'q': 'python'})
+        new = self.client.get(SEARCH_URL, {'q': 'haskell'})
+
+        self.assertEqual(old.data['results'], [])
+        self.assertEqual([t['id'] for t in new.data['results']], [thread.id])
+
+    def test_rebuild_search_index(self):
+        """Test that the rebuild command indexes existing threads"""
+        thread = create_thread(self.user, self.board, title='golang')
+        SearchTerm.objects.all().delete()
+
+        call_command('rebuild_search_index', chunk_size=1, stdout=StringIO())
+        res = self.client.get(SEARCH_URL, {'q': 'golang'})
+
+        self.assertEqual([t['id'] for t in res.data['results']], [thread.id])
@@ -0,0 +1,370 @@
+import io
+import re
+import shutil
+import tempfile
+
+from concurrent.futures.process import BrokenProcessPool
+
+from unittest.mock import patch
+
+from PIL import Image
+
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.core.cache import cache
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Board, Change, Thread
+from core.testing import QueryCountMixin
+
+from shitchan import thumbnails
+from shitchan.pagination import KeysetPagination
+
+
+def threads_url(code):
+    """Generate thread list url for board"""
+    return reverse('shitchan:board-threads', args=[code])
+
+
+def create_user(**params):
+    """Helper function to create a new user"""
+    defaults = {
+        'username': 'testuser',
+        'email': 'test@gmail.com',
+        'password': 'testpass'
+    }
+    defaults.update(**params)
+
+    return get_user_model().objects.create_user(**defaults)
+
+
+def create_thread(user, board, **params):
+    """Helper function to create a new thread"""
+    defaults = {
+        'title': 'test thread',
+        'content': 'test content'
+    }
+    defaults.update(**params)
+
+    return Thread.objects.create(user=user, board=board, **defaults)
+
+
+def explain(sql):
+    """Return the query plan of a captured sql statement
+    (without row/cost estimates)"""
+    with connection.cursor() as cursor:
+        cursor.execute(f'{connection.ops.explain_query_prefix()} {sql}')
+        return [
+            re.sub(r'\s*\(cost=[^)]*\)', '', str(row[-1]))
+            for row in cursor.fetchall()
+        ]
+
+
+def access_paths(plan):
+    """Return plan without index and filter conditions, which differ
+    between the first page and pages seeking after a cursor"""
+    return [
+        re.sub(r'\s*\(.*\)$', '', line) for line in plan
+        if not re.match(r'\s*(Index Cond|Filter|Recheck Cond):', line)
+    ]
+
+
+class ThreadPublicApiTests(QueryCountMixin, TestCase):
+    """Test publicly thread API (with anonymous user)"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = create_user()
+        self.board = Board.objects.create(
+            title='test board', code='tb', user=self.user
+        )
+
+    def test_list_threads_newest_first(self):
+        """Test listing threads of a board ordered newest first"""
+        other = Board.objects.create(
+            title='other board', code='ob', user=self.user
+        )
+        first = create_thread(self.user, self.board, title='first')
+        second = create_thread(self.user, self.board, title='second')
+        create_thread(self.user, other)
+
+        res = self.client.get(threads_url(self.board.code))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [thread['id'] for thread in res.data['results']],
+            [second.id, first.id]
+        )
+        self.assertIsNone(res.data['next'])
+
+    def test_list_threads_reads_denormalized_score(self):
+        """Test that listing threads reads score without vote tables"""
+        thread = create_thread(self.user, self.board)
+        thread.vote(self.user, 1)
+
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.get(threads_url(self.board.code))
+
+        self.assertEqual(res.data['results'][0]['score'], 1)
+        self.assertEqual(res.data['results'][0]['upvote_count'], 1)
+        for query in ctx.captured_queries:
+            self.assertNotIn('core_vote', query['sql'])
+
+    def test_list_threads_constant_queries(self):
+        """Test that listing threads doesn't query per thread"""
+        self.assertConstantQueries(
+            lambda: self.client.get(threads_url(self.board.code)),
+            lambda: create_thread(self.user, self.board),
+        )
+
+    def test_list_threads_walks_all_pages(self):
+        """Test that following the cursor returns every thread once"""
+        threads = [
+            create_thread(self.user, self.board, title=f'thread {i}')
+            for i in range(7)
+        ]
+        url = threads_url(self.board.code) + '?page_size=3'
+        seen = []
+
+        while url:
+            res = self.client.get(url)
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            seen += [thread['id'] for thread in res.data['results']]
+            url = res.data['next']
+
+        self.assertEqual(seen, [thread.id for thread in reversed(threads)])
+
+    def test_deep_page_has_same_plan_as_first_pages(self):
+        """Test that a deep page query uses the same plan as an early
+        page (no offset scan, no sort)"""
+        for i in range(40):
+            create_thread(self.user, self.board, title=f'thread {i}')
+        url = threads_url(self.board.code) + '?page_size=2'
+        plans = []
+
+        while url:
+            with CaptureQueriesContext(connection) as ctx:
+                res = self.client.get(url)
+            plans.append(explain(ctx.captured_queries[-1]['sql']))
+            url = res.data['next']
+
+        self.assertEqual(len(plans), 20)
+        self.assertEqual(access_paths(plans[0]), access_paths(plans[-1]))
+        self.assertEqual(plans[1], plans[-1])
+        if connection.vendor != 'sqlite':
+            return
+        for plan in (plans[0], plans[-1]):
+            self.assertIn('thread_board_created_idx', ' '.join(plan))
+            self.assertNotIn('TEMP B-TREE', ' '.join(plan))
+
+    @patch('django.db.transaction.on_commit', side_effect=lambda f: f())
+    def test_list_threads_conditional_get(self, on_commit):
+        """Test that thread list answers 304 until a thread of the
+        board is created or voted"""
+        thread = create_thread(self.user, self.board)
+        etag = self.client.get(threads_url(self.board.code))['ETag']
+
+        with self.assertNumQueries(1):
+            res = self.client.get(
+                threads_url(self.board.code), HTTP_IF_NONE_MATCH=etag
+            )
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        thread.vote(self.user, 1)
+        res = self.client.get(
+            threads_url(self.board.code), HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['results'][0]['score'], 1)
+
+    def test_list_threads_invalid_cursor(self):
+        """Test that an invalid cursor returns 404"""
+        res = self.client.get(threads_url(self.board.code) + '?cursor=xx')
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_list_threads_malformed_cursor(self):
+        """Test that cursors with values of the wrong type return 404"""
+        create_thread(self.user, self.board)
+        positions = [[[1], [1]], ['2020-01-01', {'x': 1}], [1.5, 2]]
+
+        for position in positions:
+            cursor = KeysetPagination().encode_cursor(position)
+            res = self.client.get(
+                threads_url(self.board.code), {'cursor': cursor}
+            )
+
+            self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_list_threads_unknown_board(self):
+        """Test that listing threads of unknown board returns 404"""
+        res = self.client.get(threads_url('nope'))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_create_thread_unauthorized(self):
+        """Test that creating thread with anonymous user is rejected"""
+        res = self.client.post(
+            threads_url(self.board.code),
+            {'title': 'test', 'content': 'test'}
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class ThreadPrivateApiTests(TestCase):
+    """Test privately thread API with user"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = create_user()
+        self.client.force_authenticate(user=self.user)
+        self.board = Board.objects.create(
+            title='test board', code='tb', user=self.user
+        )
+
+    def test_create_thread_successful(self):
+        """Test creating a thread in a board"""
+        payload = {'title': 'test thread', 'content': 'test content'}
+
+        res = self.client.post(threads_url(self.board.code), payload)
+        thread = Thread.objects.get(id=res.data['id'])
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(thread.title, payload['title'])
+        self.assertEqual(thread.board, self.board)
+        self.assertEqual(thread.user, self.user)
+        self.assertEqual(res.data['score'], 0)
+
+
+class ThreadImageVariantTests(TestCase):
+    """Test generating thumbnail/preview variants of thread images"""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.override = override_settings(
+            MEDIA_ROOT=self.media_root, THUMBNAIL_WORKERS=0
+        )
+        self.override.enable()
+        self.client = APIClient()
+        self.user = create_user()
+        self.board = Board.objects.create(
+            title='test board', code='tb', user=self.user
+        )
+
+    def tearDown(self):
+        self.override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+    def test_render_variants_bounded_size(self):
+        """Test that rendered variants fit their bounding box"""
+        output = io.BytesIO()
+        Image.new('RGBA', (1600, 400)).save(output, format='PNG')
+
+        rendered = thumbnails.render_variants(output.getvalue())
+
+        for variant, (width, height) in thumbnails.VARIANTS.items():
+            data = rendered[variant]['jpeg']
+            with Image.open(io.BytesIO(data)) as image:
+                self.assertEqual(image.format, 'JPEG')
+                self.assertLessEqual(image.width, width)
+                self.assertLessEqual(image.height, height)
+
+    def test_generate_variants_exposed_in_api(self):
+        """Test that generated variants are recorded and exposed"""
+        with tempfile.NamedTemporaryFile(suffix='.png') as ntf:
+            Image.new('RGB', (1200, 900)).save(ntf, format='PNG')
+            ntf.seek(0)
+            self.client.force_authenticate(user=self.user)
+            res = self.client.post(
+                threads_url(self.board.code),
+                {'title': 'test', 'content': 'test', 'image': ntf},
+                format='multipart'
+            )
+        thread = Thread.objects.get(id=res.data['id'])
+        self.assertIsNone(res.data['thumbnail'])
+        Change.objects.all().delete()
+
+        thumbnails.generate_variants(thread)
+        res = self.client.get(threads_url(self.board.code))
+
+        thread.refresh_from_db()
+        self.assertEqual(thread.image_variants['source'], thread.image.name)
+        self.assertIn('jpeg', res.data['results'][0]['thumbnail'])
+        self.assertIn('jpeg', res.data['results'][0]['preview'])
+        self.assertFalse(thumbnails.needs_variants(thread))
+        self.assertTrue(Change.objects.filter(
+            kind=Change.THREAD, object_id=thread.id
+        ).exists())
+
+    @override_settings(THUMBNAIL_WORKERS=1)
+    def test_generate_variants_skipped_when_pool_unavailable(self):
+        """Test that a saturated or broken pool skips the variants
+        instead of raising in the commit hook"""
+        with tempfile.NamedTemporaryFile(suffix='.png') as ntf:
+            Image.new('RGB', (100, 100)).save(ntf, format='PNG')
+            ntf.seek(0)
+            self.client.force_authenticate(user=self.user)
+            res = self.client.post(
+                threads_url(self.board.code),
+                {'title': 'test', 'content': 'test', 'image': ntf},
+                format='multipart'
+            )
+        thread = Thread.objects.get(id=res.data['id'])
+
+        for result in ({'return_value': None},
+                       {'side_effect': BrokenProcessPool()}):
+            with patch.object(thumbnails.pool, 'submit', **result), \
+                    self.assertLogs('shitchan.thumbnails'):
+                self.assertIsNone(thumbnails.generate_variants(thread))
+
+        self.assertTrue(thumbnails.needs_variants(thread))
+
+
+class ThreadHotOrderingApiTests(TestCase):
+    """Test listing threads ordered by hot score"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = create_user()
+        self.board = Board.objects.create(
+            title='test board', code='tb', user=self.user
+        )
+
+    def test_list_threads_hot(self):
+        """Test that ?ordering=hot pages through threads by hot score"""
+        threads = [
+            create_thread(self.user, self.board, title=f'thread {i}')
+            for i in range(5)
+        ]
+        voters = [
+            create_user(username=f'voter{i}', email=f'voter{i}@gmail.com')
+            for i in range(3)
+        ]
+        for voter in voters:
+            threads[1].vote(voter, 1)
+        threads[3].vote(voters[0], 1)
+        threads[4].vote(voters[0], -1)
+        url = threads_url(self.board.code) + '?ordering=hot&page_size=2'
+        seen = []
+
+        while url:
+            res = self.client.get(url)
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            seen += [thread['id'] for thread in res.data['results']]
+            url = res.data['next']
+
+        expected = sorted(
+            Thread.objects.all(), key=lambda t: (-t.hot_score, -t.id)
+        )
+        self.assertEqual(seen, [thread.id for thread in expected])
+        self.assertEqual(seen[0], threads[1].id)
+        self.assertEqual(seen[-1], threads[4].id)
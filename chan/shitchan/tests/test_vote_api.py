@@ -0,0 +1,125 @@
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Board, Thread, Vote
+from core.testing import QueryCountMixin
+
+
+VOTES_URL = reverse('shitchan:votes')
+
+
+def create_thread(user, board, **params):
+    """Helper function to create a new thread"""
+    defaults = {
+        'title': 'test thread',
+        'content': 'test content'
+    }
+    defaults.update(**params)
+
+    return Thread.objects.create(user=user, board=board, **defaults)
+
+
+class VoteBatchApiTests(QueryCountMixin, TestCase):
+    """Test batch vote API"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            username='testuser', email='test@gmail.com', password='testpass'
+        )
+        self.board = Board.objects.create(
+            title='test board', code='tb', user=self.user
+        )
+        self.threads = [
+            create_thread(self.user, self.board, title=f'thread {i}')
+            for i in range(3)
+        ]
+
+    def test_batch_votes_unauthorized(self):
+        """Test that voting with anonymous user is rejected"""
+        res = self.client.post(
+            VOTES_URL, [{'thread_id': self.threads[0].id, 'value': 1}],
+            format='json'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_batch_votes_constant_queries(self):
+        """Test that batch size doesn't change the number of queries"""
+        self.client.force_authenticate(user=self.user)
+
+        def vote_all():
+            return self.client.post(VOTES_URL, [
+                {'thread_id': thread.id, 'value': 1}
+                for thread in self.threads
+            ], format='json')
+
+        self.assertConstantQueries(
+            vote_all,
+            lambda: self.threads.append(create_thread(self.user, self.board)),
+        )
+
+    def test_batch_votes_applied(self):
+        """Test that a batch casts, switches and retracts votes with
+        per-item results and constant number of queries"""
+        self.client.force_authenticate(user=self.user)
+        self.threads[1].vote(self.user, 1)
+        self.threads[2].vote(self.user, -1)
+        payload = [
+            {'thread_id': self.threads[0].id, 'value': 1},
+            {'thread_id': self.threads[1].id, 'value': -1},
+            {'thread_id': self.threads[2].id, 'value': -1},
+            {'thread_id': 9999, 'value': 1},
+        ]
+
+        # 8 for the thread locks, votes and counters,
+        # 3 to log the changed threads
+        with self.assertNumQueries(11):
+            res = self.client.post(VOTES_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [item['status'] for item in res.data['results']],
+            ['changed', 'changed', 'unchanged', 'not_found']
+        )
+        self.assertEqual(res.data['results'][1]['previous'], 1)
+        counters = [
+            Thread.objects.values_list(
+                'upvote_count', 'downvote_count', 'score'
+            ).get(pk=thread.pk)
+            for thread in self.threads
+        ]
+        self.assertEqual(counters, [(1, 0, 1), (0, 1, -1), (0, 1, -1)])
+        self.assertEqual(
+            Vote.objects.get(thread=self.threads[1], user=self.user).value,
+            -1
+        )
+
+    def test_batch_votes_invalid_value(self):
+        """Test that a batch with invalid vote value is rejected"""
+        self.client.force_authenticate(user=self.user)
+        payload = [
+            {'thread_id': self.threads[0].id, 'value': 1},
+            {'thread_id': self.threads[1].id, 'value': 5},
+        ]
+
+        res = self.client.post(VOTES_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Vote.objects.exists())
+
+    def test_batch_votes_duplicate_thread(self):
+        """Test that voting a thread twice in a batch is rejected"""
+        self.client.force_authenticate(user=self.user)
+        payload = [
+            {'thread_id': self.threads[0].id, 'value': 1},
+            {'thread_id': self.threads[0].id, 'value': -1},
+        ]
+
+        res = self.client.post(VOTES_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
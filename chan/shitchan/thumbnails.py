@@ -0,0 +1,142 @@
+"""Off-request thumbnail and preview generation for thread images.
+
+Resizing runs in a process pool so Pillow never blocks a request worker;
+the resulting variants are saved through the default storage and
+recorded in ``Thread.image_variants`` as
+``{'source': <image name>, 'thumbnail': {'jpeg': <name>, ...}, ...}``."""
+import io
+import logging
+import os
+
+from PIL import Image, features
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+
+from core.models import Change, Thread, sharded_path
+from core.pools import ProcessPool
+from core.signals import release_files, variant_names
+
+from shitchan import catalog
+from shitchan.cache import board_threads_scope, bump_version
+
+
+logger = logging.getLogger(__name__)
+
+VARIANTS = {
+    'thumbnail': (250, 250),
+    'preview': (800, 800),
+}
+FORMATS = {
+    'jpeg': ('JPEG', {'quality': 85, 'optimize': True}),
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+}
+
+pool = ProcessPool('THUMBNAIL_WORKERS', queue_setting='THUMBNAIL_QUEUE')
+
+
+def render_variants(data):
+    """Resize raw image data into every variant and format.
+    Runs in a worker process, so it must not touch Django."""
+    rendered = {}
+    with Image.open(io.BytesIO(data)) as image:
+        image = image.convert('RGB')
+        for variant, size in VARIANTS.items():
+            resized = image.copy()
+            resized.thumbnail(size, Image.LANCZOS)
+            rendered[variant] = {}
+            for ext, (fmt, options) in FORMATS.items():
+                if fmt == 'WEBP' and not features.check('webp'):
+                    continue
+                output = io.BytesIO()
+                resized.save(output, format=fmt, **options)
+                rendered[variant][ext] = output.getvalue()
+
+    return rendered
+
+
+def variant_name(source, variant, ext):
+    """Generate storage name of an image variant"""
+    stem = os.path.splitext(os.path.basename(source))[0]
+
+    filename = f'{stem}_{variant}.{ext}'
+
+    return sharded_path('uploads/thread/variants/', filename)
+
+
+def store_variants(thread_id, source, rendered):
+    """Save rendered variants and record them on the thread
+    (unless its image has been replaced meanwhile)"""
+    variants = {'source': source}
+    for variant, formats in rendered.items():
+        variants[variant] = {
+            ext: default_storage.save(
+                variant_name(source, variant, ext), ContentFile(data)
+            )
+            for ext, data in formats.items()
+        }
+
+    with transaction.atomic():
+        updated = Thread.objects.filter(pk=thread_id, image=source).update(
+            image_variants=variants
+        )
+        if updated:
+            thread = Thread.objects.get(pk=thread_id)
+            Change.objects.record(Change.THREAD, {thread.pk: thread.board_id})
+
+    if updated:
+        catalog.upsert_thread(thread)
+        bump_version(board_threads_scope(thread.board_id))
+    else:
+        release_files(*variant_names(variants))
+
+    return variants
+
+
+def generate_variants(thread):
+    """Schedule variant generation for the image of thread, skipped
+    (and logged) if the pool is saturated or broken.
+    With THUMBNAIL_WORKERS = 0 variants are generated inline."""
+    source = thread.image.name
+    with thread.image.open('rb') as image:
+        data = image.read()
+
+    if pool.workers == 0:
+        return store_variants(thread.pk, source, render_variants(data))
+
+    def done(future):
+        try:
+            store_variants(thread.pk, source, future.result())
+        except Exception:
+            logger.exception('Generating variants of %s failed', source)
+        finally:
+            connection.close()
+
+    try:
+        future = pool.submit(render_variants, data)
+    except Exception:
+        logger.exception('Scheduling variants of %s failed', source)
+        return
+    if future is None:
+        logger.warning('Thumbnail pool saturated, skipped %s', source)
+        return
+
+    future.add_done_callback(done)
+
+
+def needs_variants(thread):
+    """Return True if thread has an image without up to date variants"""
+    return bool(thread.image) and \
+        thread.image_variants.get('source') != thread.image.name
+
+
+def variant_urls(thread, variant):
+    """Return {format: url} of a variant of thread or None"""
+    if not thread.image or needs_variants(thread):
+        return None
+
+    return {
+        ext: default_storage.url(name)
+        for ext, name in thread.image_variants.get(variant, {}).items()
+    }
@@ -11,5 +11,47 @@ router.register('boards', views.ManageBoardViewSet)
 
 app_name = 'shitchan'
 urlpatterns = [
+    path(
+        'boards/changes/', views.BoardChangesView.as_view(),
+        name='board-changes'
+    ),
+    path(
+        'boards/<str:code>/changes/', views.BoardThreadChangesView.as_view(),
+        name='board-thread-changes'
+    ),
+    path(
+        'boards/<str:code>/threads/', views.BoardThreadListView.as_view(),
+        name='board-threads'
+    ),
+    path(
+        'boards/<str:code>/index/', views.BoardIndexView.as_view(),
+        name='board-index'
+    ),
+    path(
+        'boards/<str:code>/archive/', views.BoardArchiveListView.as_view(),
+        name='board-archive'
+    ),
+    path(
+        'boards/<str:code>/archive/<int:thread_id>/',
+        views.BoardArchiveDetailView.as_view(),
+        name='board-archive-detail'
+    ),
+    path(
+        'boards/<str:code>/dump/', views.BoardDumpView.as_view(),
+        name='board-dump'
+    ),
+    path(
+        'threads/<int:pk>/replies/', views.ThreadReplyListView.as_view(),
+        name='thread-replies'
+    ),
+    path(
+        'boards/<str:code>/catalog/', views.BoardCatalogView.as_view(),
+        name='board-catalog'
+    ),
+    path(
+        'threads/search/', views.ThreadSearchView.as_view(),
+        name='thread-search'
+    ),
+    path('votes/', views.VoteBatchView.as_view(), name='votes'),
     path('', include(router.urls)),
 ]
@@ -1,17 +1,38 @@
+import re
+
+from django.http import Http404, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_sequence
+
 from rest_framework import (
-    viewsets, authentication, permissions
+    viewsets, generics, views, permissions
 )
+from rest_framework.exceptions import ValidationError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
 
-from shitchan import serializers
+from django.utils.translation import gettext_lazy as _
+
+from shitchan import serializers, catalog, search, dump, delta
+from shitchan.cache import (
+    ConditionalListMixin, CachedListMixin,
+    BOARDS_SCOPE, board_threads_scope
+)
+from shitchan.pagination import KeysetPagination, IndexPagination
 
 from core import models
 
+from user.authentication import CachedTokenAuthentication
+
 
-class ManageBoardViewSet(viewsets.ModelViewSet):
+class ManageBoardViewSet(ConditionalListMixin, CachedListMixin,
+                         viewsets.ModelViewSet):
     """Manage create board in API"""
     serializer_class = serializers.BoardSerializer
-    authentication_classes = [authentication.TokenAuthentication, ]
+    authentication_classes = [CachedTokenAuthentication, ]
     queryset = models.Board.objects.all()
+    condition_scopes = (BOARDS_SCOPE, )
 
     def get_permissions(self):
         """Instantiates and returns the list of permissions
@@ -26,3 +47,324 @@ class ManageBoardViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         """Create and save board"""
         serializer.save(user=self.request.user)
+
+
+class BoardThreadsMixin:
+    """Base for listings of the threads of the board in url"""
+
+    def get_condition_scopes(self):
+        """Thread listings depend on the threads of the board"""
+        return (board_threads_scope(self.get_board().id), )
+
+    def get_board(self):
+        """Retrieve and return board from the code in url"""
+        if not hasattr(self, '_board'):
+            self._board = get_object_or_404(
+                models.Board, code=self.kwargs['code']
+            )
+
+        return self._board
+
+    def get_queryset(self):
+        """Retrieve threads of the board"""
+        return models.Thread.objects.filter(
+            board=self.get_board()
+        ).select_related('user')
+
+
+class BoardThreadListView(BoardThreadsMixin, ConditionalListMixin,
+                          CachedListMixin, generics.ListCreateAPIView):
+    """List threads of a board (newest first, ?ordering=hot or
+    ?ordering=bumped) and create new ones"""
+    serializer_class = serializers.ThreadSerializer
+    authentication_classes = [CachedTokenAuthentication, ]
+    permission_classes = [permissions.IsAuthenticatedOrReadOnly, ]
+    pagination_class = KeysetPagination
+    orderings = {
+        'new': ('-date_created', '-id'),
+        'hot': ('-hot_score', '-id'),
+        'bumped': ('-last_bumped_at', '-id'),
+    }
+
+    @property
+    def keyset_ordering(self):
+        """Return keyset ordering requested by client"""
+        ordering = self.request.query_params.get('ordering')
+
+        return self.orderings.get(ordering, self.orderings['new'])
+
+    def perform_create(self, serializer):
+        """Create and save thread in the board"""
+        serializer.save(user=self.request.user, board=self.get_board())
+
+
+class BoardIndexView(BoardThreadsMixin, ConditionalListMixin,
+                     CachedListMixin, generics.ListAPIView):
+    """List threads of a board in bump order, each with its last
+    replies (?replies=, default 3), in a constant number of queries"""
+    serializer_class = serializers.IndexThreadSerializer
+    authentication_classes = [CachedTokenAuthentication, ]
+    permission_classes = [permissions.AllowAny, ]
+    pagination_class = IndexPagination
+    keyset_ordering = ('-last_bumped_at', '-id')
+    reply_count = 3
+    max_reply_count = 10
+
+    def get_reply_count(self):
+        """Return number of replies per thread requested by client"""
+        try:
+            count = int(self.request.query_params['replies'])
+        except (KeyError, ValueError):
+            return self.reply_count
+
+        return max(0, min(count, self.max_reply_count))
+
+    def paginate_queryset(self, queryset):
+        """Attach the last replies to the threads of the page"""
+        threads = super().paginate_queryset(queryset)
+        count = self.get_reply_count()
+        replies = models.Post.objects.last_replies(
+            [thread.id for thread in threads], count
+        ) if count else {}
+        for thread in threads:
+            thread.last_replies = replies.get(thread.id, [])
+
+        return threads
+
+
+class ThreadReplyListView(generics.ListCreateAPIView):
+    """List replies of a thread (oldest first) and reply to it"""
+    serializer_class = serializers.PostSerializer
+    authentication_classes = [CachedTokenAuthentication, ]
+    permission_classes = [permissions.IsAuthenticatedOrReadOnly, ]
+    pagination_class = KeysetPagination
+    keyset_ordering = ('date_created', 'id')
+
+    def get_thread(self):
+        """Retrieve and return thread from the id in url"""
+        if not hasattr(self, '_thread'):
+            self._thread = get_object_or_404(
+                models.Thread, pk=self.kwargs['pk']
+            )
+
+        return self._thread
+
+    def get_queryset(self):
+        """Retrieve replies of the thread"""
+        return models.Post.objects.filter(
+            thread=self.get_thread()
+        ).select_related('user')
+
+    def perform_create(self, serializer):
+        """Reply to the thread, bumping it (404 if it was archived or
+        deleted since it was read)"""
+        try:
+            serializer.instance = self.get_thread().reply(
+                self.request.user, serializer.validated_data['content']
+            )
+        except models.Thread.DoesNotExist:
+            raise Http404
+
+
+class BoardArchiveListView(generics.ListAPIView):
+    """List archived threads of a board (last bumped first)"""
+    serializer_class = serializers.ArchivedThreadSerializer
+    authentication_classes = []
+    permission_classes = [permissions.AllowAny, ]
+    pagination_class = KeysetPagination
+    keyset_ordering = ('-last_bumped_at', '-id')
+
+    def get_queryset(self):
+        """Retrieve archived threads of the board"""
+        board = get_object_or_404(
+            models.Board.objects.only('id'), code=self.kwargs['code']
+        )
+
+        return models.ArchivedThread.objects.filter(board=board)
+
+
+class BoardArchiveDetailView(generics.RetrieveAPIView):
+    """Retrieve an archived thread with its replies"""
+    serializer_class = serializers.ArchivedThreadDetailSerializer
+    authentication_classes = []
+    permission_classes = [permissions.AllowAny, ]
+    lookup_field = 'thread_id'
+
+    def get_queryset(self):
+        """Retrieve archived threads of the board"""
+        return models.ArchivedThread.objects.filter(
+            board__code=self.kwargs['code']
+        )
+
+
+class ThreadSearchView(generics.ListAPIView):
+    """Search threads by title and content (best matches first),
+    optionally within one board (?board=<code>)"""
+    serializer_class = serializers.ThreadSearchSerializer
+    authentication_classes = [CachedTokenAuthentication, ]
+    permission_classes = [permissions.AllowAny, ]
+    pagination_class = KeysetPagination
+    keyset_ordering = ('-rank', '-id')
+
+    def get_queryset(self):
+        """Retrieve threads matching the ?q= query"""
+        query = self.request.query_params.get('q', '').strip()
+        if not query:
+            raise ValidationError({'q': [_('This parameter is required.')]})
+
+        queryset = models.Thread.objects.select_related('user')
+        board = self.request.query_params.get('board')
+        if board:
+            queryset = queryset.filter(board__code=board)
+
+        return search.search_threads(query, queryset)
+
+
+class BoardCatalogView(views.APIView):
+    """Retrieve the catalog (precomputed snapshot) of a board"""
+    authentication_classes = []
+    permission_classes = [permissions.AllowAny, ]
+
+    def get(self, request, code):
+        """Return every live thread of the board from the snapshot"""
+        board = get_object_or_404(models.Board.objects.only('id'), code=code)
+
+        return Response(catalog.get_catalog(board.id))
+
+
+class ChangesMixin:
+    """Base for deltas of the change log: rows changed and ids deleted
+    after ?cursor= (omitted for a full sync), with the cursor of the
+    next call; more is true while pages remain"""
+    authentication_classes = [CachedTokenAuthentication, ]
+    permission_classes = [permissions.AllowAny, ]
+
+    def get_cursor(self):
+        """Return cursor requested by client or None"""
+        value = self.request.query_params.get('cursor')
+        if not value:
+            return None
+
+        try:
+            return delta.decode_cursor(value)
+        except ValueError:
+            raise ValidationError({'cursor': [_('Invalid cursor.')]})
+
+    def get(self, request, *args, **kwargs):
+        """Return the changes after the cursor"""
+        cursor, more, changed, deleted = delta.get_delta(
+            self.get_change_scope(), self.get_cursor()
+        )
+        objects = self.get_queryset().filter(pk__in=changed).order_by(
+            'pk'
+        ) if changed else []
+
+        return Response({
+            'cursor': delta.encode_cursor(cursor),
+            'more': more,
+            'changed': self.get_serializer(objects, many=True).data,
+            'deleted': deleted,
+        })
+
+
+class BoardChangesView(ChangesMixin, generics.GenericAPIView):
+    """Delta of the board list"""
+    serializer_class = serializers.BoardSerializer
+    queryset = models.Board.objects.all()
+
+    def get_change_scope(self):
+        return {'kind': models.Change.BOARD, 'board_id': None}
+
+
+class BoardThreadChangesView(BoardThreadsMixin, ChangesMixin,
+                             generics.GenericAPIView):
+    """Delta of the threads of a board"""
+    serializer_class = serializers.ThreadSerializer
+
+    def get_change_scope(self):
+        return {
+            'kind': models.Change.THREAD, 'board_id': self.get_board().id
+        }
+
+
+class BoardDumpView(views.APIView):
+    """Stream every thread of a board with its replies as
+    newline-delimited JSON, gzipped if the client accepts it.
+    ?since= limits the dump to threads changed after a change-log
+    cursor, the X-Next-Since header holds the cursor of the next pull."""
+    authentication_classes = []
+    permission_classes = [permissions.AllowAny, ]
+    renderer_classes = [dump.NDJSONRenderer, JSONRenderer]
+    accepts_gzip = re.compile(r'\bgzip\b')
+
+    def get_since(self):
+        """Return cursor of the ?since= parameter or None"""
+        value = self.request.query_params.get('since')
+        if not value:
+            return None
+
+        try:
+            return delta.decode_cursor(value)
+        except ValueError:
+            raise ValidationError({'since': [_('Invalid cursor.')]})
+
+    def get(self, request, code):
+        """Return a streaming response of the board dump"""
+        board = get_object_or_404(models.Board.objects.only('id'), code=code)
+        since = self.get_since()
+        changed, next_since = dump.changed_since(board.id, since)
+
+        lines = (
+            chunk.encode() for chunk in dump.dump_lines(
+                board.id, changed if since is not None else None
+            )
+        )
+        gzipped = self.accepts_gzip.search(
+            request.META.get('HTTP_ACCEPT_ENCODING', '')
+        )
+        response = StreamingHttpResponse(
+            compress_sequence(lines) if gzipped else lines,
+            content_type=dump.NDJSONRenderer.media_type,
+        )
+        if gzipped:
+            response['Content-Encoding'] = 'gzip'
+        patch_vary_headers(response, ('Accept-Encoding', ))
+        response['X-Next-Since'] = delta.encode_cursor(next_since)
+
+        return response
+
+
+class VoteBatchView(views.APIView):
+    """Apply a batch of votes of the user in one transaction"""
+    authentication_classes = [CachedTokenAuthentication, ]
+    permission_classes = [permissions.IsAuthenticated, ]
+
+    def post(self, request):
+        """Cast [{thread_id, value}, ...] and return per-item results"""
+        serializer = serializers.VoteBatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        items = serializer.validated_data
+
+        threads = models.Thread.objects.only(
+            'id', 'board_id', 'date_created'
+        ).in_bulk([item['thread_id'] for item in items])
+        previous = models.Vote.objects.cast_many(request.user, {
+            threads[item['thread_id']]: item['value']
+            for item in items if item['thread_id'] in threads
+        })
+
+        results = []
+        for item in items:
+            thread = threads.get(item['thread_id'])
+            result = dict(item)
+            if thread is None:
+                result['status'] = 'not_found'
+            else:
+                result['previous'] = previous[thread]
+                result['status'] = (
+                    'unchanged' if previous[thread] == item['value']
+                    else 'changed'
+                )
+            results.append(result)
+
+        return Response({'results': results})
@@ -0,0 +1,114 @@
+import copy
+import threading
+import time
+
+from collections import OrderedDict
+
+from django.conf import settings
+
+from rest_framework import authentication
+
+
+class TokenCache:
+    """Bounded LRU cache of resolved tokens with a TTL.
+
+    The cache lives in process memory, so invalidations only reach the
+    current worker; the TTL bounds how long other workers may keep
+    serving a stale entry."""
+
+    def __init__(self, maxsize=10000, ttl=60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._user_keys = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return cached (user, token) for key or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    self._remove(key)
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            user, token = entry[1]
+
+        return copy.copy(user), token
+
+    def set(self, key, user, token):
+        """Store resolved (user, token) for key"""
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (
+                time.monotonic() + self.ttl, (copy.copy(user), token)
+            )
+            self._user_keys.setdefault(user.pk, set()).add(key)
+
+            while len(self._entries) > self.maxsize:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate(self, key):
+        """Drop cached entry of token key"""
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def invalidate_user(self, user_id):
+        """Drop every cached entry resolving to user"""
+        with self._lock:
+            for key in list(self._user_keys.get(user_id, ())):
+                self._remove(key)
+
+    def clear(self):
+        """Drop every entry and reset the counters"""
+        with self._lock:
+            self._entries.clear()
+            self._user_keys.clear()
+            self.hits = self.misses = 0
+
+    def info(self):
+        """Return hit/miss counters and size of the cache"""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+            }
+
+    def _remove(self, key):
+        _, (user, _) = self._entries.pop(key)
+        keys = self._user_keys.get(user.pk)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._user_keys[user.pk]
+
+
+token_cache = TokenCache(
+    maxsize=getattr(settings, 'TOKEN_CACHE_MAXSIZE', 10000),
+    ttl=getattr(settings, 'TOKEN_CACHE_TTL', 60),
+)
+
+
+class CachedTokenAuthentication(authentication.TokenAuthentication):
+    """Token authentication keeping resolved tokens in token_cache,
+    so most requests don't query the token and user tables"""
+
+    def authenticate_credentials(self, key):
+        cached = token_cache.get(key)
+        if cached is not None:
+            return cached
+
+        user, token = super().authenticate_credentials(key)
+        token_cache.set(key, user, token)
+
+        return user, token
@@ -0,0 +1,186 @@
+import hashlib
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection
+
+
+class BloomFilter:
+    """Fixed size Bloom filter of strings"""
+
+    def __init__(self, capacity, error_rate=0.01):
+        self.capacity = capacity
+        self.size = math.ceil(
+            -capacity * math.log(error_rate) / math.log(2) ** 2
+        )
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.count = 0
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, value):
+        """Return bit positions of value (double hashing)"""
+        digest = hashlib.blake2b(value.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'little')
+        second = int.from_bytes(digest[8:], 'little') | 1
+
+        return [(first + i * second) % self.size for i in range(self.hashes)]
+
+    def add(self, value):
+        """Add value to the filter"""
+        for position in self._positions(value):
+            self._bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, value):
+        return all(
+            self._bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(value)
+        )
+
+
+class AvailabilityIndex:
+    """Bloom filter of the usernames and emails taken, answering
+    "definitely free" without touching the database.
+
+    The filter lives in process memory. It is built from the user table
+    in a background thread on first use (until then every value is
+    checked in the database) and updated on save of users in this
+    process. Users saved by other processes are picked up by a scan of
+    new primary keys at most every refresh_interval seconds, and the
+    filter is rebuilt in the background every rebuild_interval seconds
+    (forgetting changed and deleted values) or when it outgrows its
+    capacity, readers keep using the old one meanwhile. Answers are
+    advisory, signup still enforces uniqueness."""
+    fields = ('username', 'email')
+
+    def __init__(self, error_rate=0.01, refresh_interval=5,
+                 rebuild_interval=600, background=True):
+        self.error_rate = error_rate
+        self.refresh_interval = refresh_interval
+        self.rebuild_interval = rebuild_interval
+        self.background = background
+        self._filter = None
+        self._last_pk = 0
+        self._built = 0
+        self._refreshed = 0
+        self._updating = False
+        self._pending = None
+        self._lock = threading.Lock()
+
+    def is_available(self, field, value):
+        """Return True if no user has value in field"""
+        if not self.might_be_taken(field, value):
+            return True
+
+        return not get_user_model().objects.filter(**{field: value}).exists()
+
+    def might_be_taken(self, field, value):
+        """Return False if value is definitely not taken"""
+        self._sync()
+        bloom = self._filter
+
+        return bloom is None or f'{field}:{value}' in bloom
+
+    def add(self, user):
+        """Add the values of a saved user to the filter"""
+        values = [getattr(user, field) for field in self.fields]
+        with self._lock:
+            if self._filter is not None:
+                self._add_values(self._filter, values)
+            if self._pending is not None:
+                self._pending.append(values)
+
+    def clear(self):
+        """Drop the filter, to be rebuilt on next use"""
+        with self._lock:
+            self._filter = None
+
+    def _sync(self):
+        """Start a build or rebuild, or refresh the filter, when it is
+        due (unless another thread is already updating it)"""
+        now = time.monotonic()
+        with self._lock:
+            if self._updating:
+                return
+            if self._filter is None or \
+                    now - self._built > self.rebuild_interval or \
+                    self._filter.count > self._filter.capacity:
+                self._updating = True
+                self._pending = []
+                rebuild = True
+            elif now - self._refreshed > self.refresh_interval:
+                self._updating = True
+                rebuild = False
+            else:
+                return
+
+        if not rebuild:
+            self._run(self._scan, now)
+        elif self.background:
+            threading.Thread(
+                target=self._run, args=(self._build, now, True), daemon=True
+            ).start()
+        else:
+            self._run(self._build, now)
+
+    def _run(self, update, now, own_connection=False):
+        try:
+            update(now)
+        finally:
+            with self._lock:
+                self._updating = False
+                self._pending = None
+            if own_connection:
+                connection.close()
+
+    def _build(self, now):
+        """Build a new filter sized for twice the current users and
+        swap it in with the values saved meanwhile"""
+        users = get_user_model().objects.count()
+        bloom = BloomFilter(
+            max(1024, 2 * users * len(self.fields)), self.error_rate
+        )
+        last_pk = self._add_rows(bloom, 0)
+
+        with self._lock:
+            for values in self._pending:
+                self._add_values(bloom, values)
+            self._filter = bloom
+            self._last_pk = last_pk
+            self._built = self._refreshed = now
+
+    def _scan(self, now):
+        """Add users created since the last scan"""
+        bloom = self._filter
+        if bloom is None:
+            return
+        last_pk = self._add_rows(bloom, self._last_pk)
+
+        with self._lock:
+            self._last_pk = last_pk
+            self._refreshed = now
+
+    def _add_rows(self, bloom, last_pk):
+        """Add users after last_pk to bloom, return the last pk added"""
+        rows = get_user_model().objects.filter(
+            pk__gt=last_pk
+        ).order_by('pk').values_list('pk', *self.fields)
+        for pk, *values in rows.iterator(chunk_size=2000):
+            with self._lock:
+                self._add_values(bloom, values)
+            last_pk = pk
+
+        return last_pk
+
+    def _add_values(self, bloom, values):
+        for field, value in zip(self.fields, values):
+            bloom.add(f'{field}:{value}')
+
+
+availability_index = AvailabilityIndex(
+    refresh_interval=getattr(settings, 'AVAILABILITY_REFRESH_INTERVAL', 5),
+    rebuild_interval=getattr(settings, 'AVAILABILITY_REBUILD_INTERVAL', 600),
+)
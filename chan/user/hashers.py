@@ -0,0 +1,80 @@
+"""Password hashing off the request threads.
+
+PBKDF2 is pure CPU for tens of milliseconds, so a burst of signins run
+on request threads starves every other endpoint. Hashing is sent to a
+small process pool instead, with a cap on the hashes in flight per
+process; requests above the cap are refused with 503 right away rather
+than queueing up behind each other."""
+import base64
+import hashlib
+
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+from django.utils.crypto import pbkdf2
+from django.utils.translation import gettext_lazy as _
+
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from core.pools import ProcessPool
+
+
+class PasswordHashingBusy(APIException):
+    """Raised when too many password hashes are in flight"""
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = _('Too many sign-ins at the moment, try again later.')
+    default_code = 'password_hashing_busy'
+    wait = 1
+
+
+def _pbkdf2(password, salt, iterations, digest_name):
+    """Run PBKDF2 (in a worker process)"""
+    return pbkdf2(
+        password, salt, iterations, digest=getattr(hashlib, digest_name)
+    )
+
+
+class HashingPool(ProcessPool):
+    """Process pool of this process with a cap on calls in flight
+    (PASSWORD_HASH_WORKERS = 0 runs calls inline)"""
+
+    def __init__(self):
+        super().__init__(
+            'PASSWORD_HASH_WORKERS', queue_setting='PASSWORD_HASH_QUEUE'
+        )
+
+    def run(self, fn, *args):
+        """Return fn(*args) computed in the pool, raise
+        PasswordHashingBusy if the pool is saturated"""
+        if self.workers == 0:
+            return fn(*args)
+
+        future = self.submit(fn, *args)
+        if future is None:
+            raise PasswordHashingBusy()
+
+        return future.result()
+
+
+pool = HashingPool()
+
+
+class PooledPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """PBKDF2 hasher computing hashes in the hashing pool, with the
+    iterations of PASSWORD_HASH_ITERATIONS. Passwords hashed with other
+    iterations are rehashed on the next successful check."""
+
+    @property
+    def iterations(self):
+        return settings.PASSWORD_HASH_ITERATIONS
+
+    def encode(self, password, salt, iterations=None):
+        assert password is not None
+        assert salt and '$' not in salt
+        iterations = iterations or self.iterations
+        hash = pool.run(
+            _pbkdf2, password, salt, iterations, self.digest().name
+        )
+        hash = base64.b64encode(hash).decode('ascii').strip()
+
+        return '%s$%d$%s$%s' % (self.algorithm, iterations, salt, hash)
@@ -4,6 +4,8 @@ from django.contrib.auth import get_user_model
 from django.contrib.auth import authenticate
 from django.utils.translation import ugettext_lazy as _
 
+from user.authentication import token_cache
+
 
 class UserSerializer(serializers.ModelSerializer):
     """Serializer for Custom user model"""
@@ -55,9 +57,7 @@ class ChangePasswordSerializer(serializers.ModelSerializer):
 
     def validate_old_password(self, value):
         """Validating user old password"""
-        user = self.context.get('request').user
-
-        if not user.check_password(value):
+        if not self.instance.check_password(value):
             msg = _('Old password is not correct')
             raise serializers.ValidationError({'old_password': msg})
 
@@ -67,10 +67,29 @@ class ChangePasswordSerializer(serializers.ModelSerializer):
         """Update a new password for user"""
         instance.set_password(validated_data['new_password'])
         instance.save()
+        token_cache.invalidate_user(instance.pk)
 
         return instance
 
 
+class AvailabilitySerializer(serializers.Serializer):
+    """Serializer for username/email availability checks"""
+    username = serializers.CharField(required=False, max_length=255)
+    email = serializers.CharField(required=False, max_length=255)
+
+    def validate_email(self, value):
+        """Normalize email the way users are stored"""
+        return get_user_model().objects.normalize_email(value)
+
+    def validate(self, attrs):
+        """Validating that something is checked"""
+        if not attrs:
+            msg = _('Provide username or email')
+            raise serializers.ValidationError(msg)
+
+        return attrs
+
+
 class AuthTokenSerializer(serializers.Serializer):
     """Serializer for user signin (to get a token)"""
     username = serializers.CharField()
@@ -0,0 +1,32 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from rest_framework.authtoken.models import Token
+
+from user.authentication import token_cache
+from user.availability import availability_index
+
+
+@receiver(post_delete, sender=Token)
+def token_deleted(sender, instance, **kwargs):
+    """Drop deleted token from the token cache"""
+    token_cache.invalidate(instance.key)
+
+
+@receiver(post_save, sender=get_user_model())
+def user_saved(sender, instance, **kwargs):
+    """Drop cached tokens of a changed (e.g. deactivated) user"""
+    token_cache.invalidate_user(instance.pk)
+
+
+@receiver(post_save, sender=get_user_model())
+def user_availability_saved(sender, instance, **kwargs):
+    """Mark username and email of saved user as taken"""
+    availability_index.add(instance)
+
+
+@receiver(post_delete, sender=get_user_model())
+def user_deleted(sender, instance, **kwargs):
+    """Drop cached tokens of a deleted user"""
+    token_cache.invalidate_user(instance.pk)
@@ -0,0 +1,163 @@
+from unittest.mock import patch
+
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from user.availability import BloomFilter, AvailabilityIndex
+
+
+AVAILABILITY_URL = reverse('user:availability')
+
+
+def create_user(**params):
+    defaults = {
+        'email': 'test@gmail.com',
+        'username': 'testuser',
+        'password': 'testpass'
+    }
+    defaults.update(**params)
+
+    return get_user_model().objects.create_user(**defaults)
+
+
+class BloomFilterTests(TestCase):
+    """Test the Bloom filter"""
+
+    def test_added_values_contained(self):
+        """Test that there are no false negatives"""
+        bloom = BloomFilter(1000)
+        values = [f'user{i}' for i in range(1000)]
+        for value in values:
+            bloom.add(value)
+
+        self.assertTrue(all(value in bloom for value in values))
+
+    def test_false_positive_rate(self):
+        """Test that false positives stay near the error rate"""
+        bloom = BloomFilter(1000, error_rate=0.01)
+        for i in range(1000):
+            bloom.add(f'user{i}')
+
+        false_positives = sum(f'other{i}' in bloom for i in range(10000))
+
+        self.assertLess(false_positives, 300)
+
+
+class AvailabilityApiTests(TestCase):
+    """Test username/email availability API"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.index = AvailabilityIndex(background=False)
+        patcher = patch('user.views.availability_index', self.index)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        create_user()
+
+    def test_availability_requires_value(self):
+        """Test that checking nothing fails"""
+        res = self.client.get(AVAILABILITY_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_free_values_answered_from_filter(self):
+        """Test that free values don't query the database"""
+        self.client.get(AVAILABILITY_URL, {'username': 'warmup'})
+
+        with self.assertNumQueries(0):
+            res = self.client.get(
+                AVAILABILITY_URL,
+                {'username': 'newuser', 'email': 'new@gmail.com'}
+            )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, {'username': True, 'email': True})
+
+    def test_taken_values_checked_in_database(self):
+        """Test that possible matches are confirmed by the database"""
+        res = self.client.get(
+            AVAILABILITY_URL,
+            {'username': 'testuser', 'email': 'test@gmail.com'}
+        )
+
+        self.assertEqual(res.data, {'username': False, 'email': False})
+
+    def test_email_normalized(self):
+        """Test that email domain case doesn't matter"""
+        res = self.client.get(AVAILABILITY_URL, {'email': 'test@GMAIL.com'})
+
+        self.assertEqual(res.data, {'email': False})
+
+    def test_saved_user_added(self):
+        """Test that users saved after the build are taken"""
+        self.client.get(AVAILABILITY_URL, {'username': 'warmup'})
+        with patch('user.signals.availability_index', self.index):
+            create_user(username='other', email='other@gmail.com')
+
+        with patch.object(self.index, 'refresh_interval', 3600):
+            res = self.client.get(AVAILABILITY_URL, {'username': 'other'})
+
+        self.assertEqual(res.data, {'username': False})
+
+    def test_users_of_other_processes_scanned(self):
+        """Test that users missed by signals are found by the scan"""
+        self.index.refresh_interval = 0
+        self.client.get(AVAILABILITY_URL, {'username': 'warmup'})
+        create_user(username='other', email='other@gmail.com')
+
+        res = self.client.get(AVAILABILITY_URL, {'username': 'other'})
+
+        self.assertEqual(res.data, {'username': False})
+
+
+class AvailabilityRebuildTests(TestCase):
+    """Test building the availability filter in the background"""
+
+    def setUp(self):
+        self.index = AvailabilityIndex()
+        create_user()
+
+    @patch('threading.Thread')
+    def test_cold_filter_checked_in_database(self, mock_thread):
+        """Test that values are checked in the database while the
+        first build runs"""
+        with self.assertNumQueries(1):
+            available = self.index.is_available('username', 'newuser')
+
+        self.assertTrue(available)
+        mock_thread.return_value.start.assert_called_once()
+
+    @patch('threading.Thread')
+    def test_rebuild_keeps_serving_old_filter(self, mock_thread):
+        """Test that readers use the old filter while it is rebuilt
+        and only one rebuild is started"""
+        self.index.background = False
+        self.index.is_available('username', 'warmup')
+        self.index.background = True
+        self.index.rebuild_interval = 0
+
+        with self.assertNumQueries(0):
+            self.assertFalse(self.index.might_be_taken('username', 'new'))
+            self.assertTrue(self.index.might_be_taken('username', 'testuser'))
+
+        self.assertEqual(mock_thread.return_value.start.call_count, 1)
+
+    def test_users_saved_during_rebuild_kept(self):
+        """Test that users saved while the filter is built are in the
+        new filter"""
+        self.index.background = False
+        other = get_user_model()(username='other', email='other@gmail.com')
+        rows = AvailabilityIndex._add_rows
+
+        def add_rows(index, bloom, last_pk):
+            index.add(other)
+            return rows(index, bloom, last_pk)
+
+        with patch.object(AvailabilityIndex, '_add_rows', add_rows):
+            self.index.might_be_taken('username', 'warmup')
+
+        self.assertTrue(self.index.might_be_taken('username', 'other'))
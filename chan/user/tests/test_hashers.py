@@ -0,0 +1,92 @@
+from unittest.mock import patch
+
+from django.test import TestCase, override_settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import (
+    PBKDF2PasswordHasher, check_password, make_password
+)
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from user.hashers import HashingPool, PasswordHashingBusy, pool
+
+
+SIGNIN_URL = reverse('user:signin')
+
+
+def create_user(**params):
+    defaults = {
+        'email': 'test@gmail.com',
+        'username': 'testuser',
+        'password': 'testpass'
+    }
+    defaults.update(**params)
+
+    return get_user_model().objects.create_user(**defaults)
+
+
+@override_settings(PASSWORD_HASH_ITERATIONS=1000)
+class PooledHasherTests(TestCase):
+    """Test password hashing in the bounded process pool"""
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_existing_hashes_verified(self):
+        """Test that hashes of the stock PBKDF2 hasher stay valid"""
+        encoded = PBKDF2PasswordHasher().encode('testpass', 'salt', 1000)
+
+        self.assertTrue(check_password('testpass', encoded))
+        self.assertFalse(check_password('wrongpass', encoded))
+
+    def test_hashing_inline(self):
+        """Test that no pool is used with zero workers"""
+        with override_settings(PASSWORD_HASH_WORKERS=0):
+            with patch('core.pools.ProcessPoolExecutor') as executor:
+                encoded = make_password('testpass')
+
+        executor.assert_not_called()
+        self.assertTrue(check_password('testpass', encoded))
+
+    @override_settings(PASSWORD_HASH_WORKERS=1, PASSWORD_HASH_QUEUE=1)
+    def test_pool_saturated(self):
+        """Test that calls above the in-flight cap are refused"""
+        hashing = HashingPool()
+        self.assertEqual(hashing.run(pow, 2, 3), 8)
+
+        hashing._slots.acquire()
+        try:
+            with self.assertRaises(PasswordHashingBusy):
+                hashing.run(pow, 2, 3)
+        finally:
+            hashing._slots.release()
+            hashing.shutdown()
+
+    def test_signin_busy_returns_503(self):
+        """Test that signing in while saturated is answered with 503"""
+        create_user()
+
+        with patch.object(pool, 'run', side_effect=PasswordHashingBusy):
+            res = self.client.post(
+                SIGNIN_URL, {'username': 'testuser', 'password': 'testpass'}
+            )
+
+        self.assertEqual(res.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(res['Retry-After'], '1')
+
+    def test_rehashed_when_iterations_change(self):
+        """Test that a successful signin rehashes with new iterations"""
+        user = create_user()
+        self.assertTrue(user.password.startswith('pbkdf2_sha256$1000$'))
+
+        with override_settings(PASSWORD_HASH_ITERATIONS=1200):
+            res = self.client.post(
+                SIGNIN_URL, {'username': 'testuser', 'password': 'testpass'}
+            )
+
+        user.refresh_from_db()
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(user.password.startswith('pbkdf2_sha256$1200$'))
+        self.assertTrue(user.check_password('testpass'))
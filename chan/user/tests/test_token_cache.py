@@ -0,0 +1,206 @@
+from unittest.mock import patch
+
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from user.authentication import TokenCache, token_cache
+
+
+PROFILE_URL = reverse('user:profile')
+CHANGE_PASSWORD_URL = reverse('user:change-password')
+TOKEN_CACHE_URL = reverse('user:token-cache')
+
+
+def create_user(**params):
+    defaults = {
+        'email': 'test@gmail.com',
+        'username': 'testuser',
+        'password': 'testpass'
+    }
+    defaults.update(**params)
+
+    return get_user_model().objects.create_user(**defaults)
+
+
+class TokenCacheTests(TestCase):
+    """Test the LRU+TTL token cache"""
+
+    def setUp(self):
+        self.user = create_user()
+
+    def test_cache_evicts_least_recently_used(self):
+        """Test that cache drops least recently used entries"""
+        cache = TokenCache(maxsize=2, ttl=60)
+        cache.set('a', self.user, None)
+        cache.set('b', self.user, None)
+        cache.get('a')
+        cache.set('c', self.user, None)
+
+        self.assertIsNotNone(cache.get('a'))
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.info()['size'], 2)
+
+    @patch('time.monotonic')
+    def test_cache_expires_entries(self, mock_monotonic):
+        """Test that entries older than ttl are misses"""
+        cache = TokenCache(maxsize=2, ttl=60)
+        mock_monotonic.return_value = 100
+        cache.set('a', self.user, None)
+
+        mock_monotonic.return_value = 159
+        self.assertIsNotNone(cache.get('a'))
+        mock_monotonic.return_value = 161
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.info()['hits'], 1)
+        self.assertEqual(cache.info()['misses'], 1)
+
+
+class CachedTokenAuthenticationTests(TestCase):
+    """Test token authentication with cached lookups"""
+
+    def setUp(self):
+        token_cache.clear()
+        self.client = APIClient()
+        self.user = create_user()
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_second_request_hits_cache(self):
+        """Test that a cached token is not looked up again"""
+        self.client.get(PROFILE_URL)
+
+        with self.assertNumQueries(0):
+            res = self.client.get(PROFILE_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['username'], self.user.username)
+        self.assertEqual(token_cache.info()['hits'], 1)
+        self.assertEqual(token_cache.info()['misses'], 1)
+
+    def test_deleted_token_invalidated(self):
+        """Test that deleting a token invalidates its cache entry"""
+        self.client.get(PROFILE_URL)
+        self.token.delete()
+
+        res = self.client.get(PROFILE_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deactivated_user_invalidated(self):
+        """Test that deactivating a user invalidates its cache entries"""
+        self.client.get(PROFILE_URL)
+        self.user.is_active = False
+        self.user.save()
+
+        res = self.client.get(PROFILE_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_change_password_invalidated(self):
+        """Test that changing password invalidates cached user"""
+        self.client.get(PROFILE_URL)
+        payload = {
+            'old_password': 'testpass',
+            'new_password': 'newpass',
+            'confirm_password': 'newpass'
+        }
+
+        with patch.object(token_cache, 'invalidate_user') as invalidate:
+            res = self.client.patch(CHANGE_PASSWORD_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        invalidate.assert_called_with(self.user.pk)
+
+    def test_token_cache_stats_admin_only(self):
+        """Test that token cache stats are only exposed to admin"""
+        res = self.client.get(TOKEN_CACHE_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+        self.user.is_staff = True
+        self.user.save()
+        res = self.client.get(TOKEN_CACHE_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIn('hits', res.data)
+        self.assertIn('misses', res.data)
+
+    def test_patch_reads_user_changed_behind_cache(self):
+        """Test that a write through a cached token doesn't save back
+        the cached copy of a user changed by another worker"""
+        self.client.get(PROFILE_URL)
+        get_user_model().objects.filter(pk=self.user.pk).update(
+            username='renamed'
+        )
+
+        res = self.client.patch(PROFILE_URL, {'date_of_birth': '1992-12-25'})
+        self.user.refresh_from_db()
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.user.username, 'renamed')
+        self.assertEqual(str(self.user.date_of_birth), '1992-12-25')
+
+    def test_patch_rejected_for_user_deactivated_behind_cache(self):
+        """Test that a write through a cached token of a user
+        deactivated by another worker doesn't reactivate it"""
+        self.client.get(PROFILE_URL)
+        self.user.set_password('newpass')
+        get_user_model().objects.filter(pk=self.user.pk).update(
+            password=self.user.password, is_active=False
+        )
+
+        res = self.client.patch(PROFILE_URL, {'username': 'renamed'})
+        self.user.refresh_from_db()
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertFalse(self.user.is_active)
+        self.assertEqual(self.user.username, 'testuser')
+        self.assertTrue(self.user.check_password('newpass'))
+        self.assertFalse(self.user.check_password('testpass'))
+
+    def test_change_password_reads_user_changed_behind_cache(self):
+        """Test that changing password through a cached token checks
+        the old password against the stored user"""
+        self.client.get(PROFILE_URL)
+        self.user.set_password('otherpass')
+        get_user_model().objects.filter(pk=self.user.pk).update(
+            password=self.user.password
+        )
+        payload = {
+            'old_password': 'testpass',
+            'new_password': 'newpass',
+            'confirm_password': 'newpass'
+        }
+
+        res = self.client.put(CHANGE_PASSWORD_URL, payload)
+        self.user.refresh_from_db()
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertTrue(self.user.check_password('otherpass'))
+
+    def test_change_password_rejected_for_user_deactivated_behind_cache(self):
+        """Test that changing password through a cached token of a user
+        deactivated by another worker doesn't reactivate it"""
+        self.client.get(PROFILE_URL)
+        self.user.set_password('otherpass')
+        get_user_model().objects.filter(pk=self.user.pk).update(
+            username='renamed', password=self.user.password, is_active=False
+        )
+        payload = {
+            'old_password': 'testpass',
+            'new_password': 'newpass',
+            'confirm_password': 'newpass'
+        }
+
+        res = self.client.put(CHANGE_PASSWORD_URL, payload)
+        self.user.refresh_from_db()
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertFalse(self.user.is_active)
+        self.assertEqual(self.user.username, 'renamed')
+        self.assertTrue(self.user.check_password('otherpass'))
@@ -1,9 +1,9 @@
 import datetime
+import hashlib
 import tempfile
 import os
 import shutil
 
-from unittest.mock import patch
 from PIL import Image
 
 from django.test import TestCase
@@ -14,6 +14,8 @@ from django.conf import settings
 from rest_framework import status
 from rest_framework.test import APIClient
 
+from core.models import MediaFile
+
 
 SIGNUP_USER_URL = reverse('user:signup')
 TOKEN_URL = reverse('user:signin')
@@ -81,16 +83,15 @@ class PublicUserApiTests(TestCase):
         self.assertEqual(res.status_code, status.HTTP_201_CREATED)
         self.assertEqual(user.date_of_birth, payload['date_of_birth'])
 
-    @patch('uuid.uuid4')
-    def test_create_user_with_avatar(self, mock_uuid):
-        """Test creating a new user in API with avatar"""
+    def test_create_user_with_avatar(self):
+        """Test creating a new user in API with avatar
+        (stored under the digest of its content)"""
         with tempfile.NamedTemporaryFile(suffix='.jpg') as ntf:
-            uuid = 'test-uuid'
-            mock_uuid.return_value = uuid
-
             image = Image.new('RGB', (100, 100))
             image.save(ntf, format='JPEG')
             ntf.seek(0)
+            digest = hashlib.blake2b(ntf.read(), digest_size=16).hexdigest()
+            ntf.seek(0)
 
             payload = create_payload(avatar=ntf)
             res = self.client.post(
@@ -102,7 +103,7 @@ class PublicUserApiTests(TestCase):
             )
             filepath = os.path.join(
                 '/chan/' + settings.MEDIA_ROOT,
-                f'uploads/avatar/{uuid}.jpg'
+                f'uploads/avatar/{digest[:2]}/{digest[2:4]}/{digest}.jpg'
             )
 
             self.assertEqual(res.status_code, status.HTTP_201_CREATED)
@@ -262,26 +263,69 @@ class PrivateUserApiTests(TestCase):
         self.assertEqual(self.user.username, payload['username'])
         self.assertEqual(self.user.email, payload['email'])
 
-    @patch('uuid.uuid4')
-    def test_update_avatar_user(self, mock_uuid):
+    def test_update_avatar_user(self):
         """Test updating avatar profile user is successful"""
         with tempfile.NamedTemporaryFile(suffix='.jpg') as ntf:
-            uuid = 'test-uuid'
-            mock_uuid.return_value = uuid
-
             image = Image.new('RGB', (100, 100))
             image.save(ntf, format='JPEG')
             ntf.seek(0)
+            digest = hashlib.blake2b(ntf.read(), digest_size=16).hexdigest()
+            ntf.seek(0)
 
             res = self.client.patch(
                 PROFILE_URL, {'avatar': ntf}, format='multipart'
             )
-            filename = f'uploads/avatar/{uuid}.jpg'
+            filename = (
+                f'uploads/avatar/{digest[:2]}/{digest[2:4]}/{digest}.jpg'
+            )
             self.user.refresh_from_db()
 
             self.assertEqual(res.status_code, status.HTTP_200_OK)
             self.assertEqual(self.user.avatar.name, filename)
 
+    def test_update_avatar_deduplicated(self):
+        """Test that uploading the same avatar twice stores it once
+        and releases the replaced one"""
+        other = create_user(**create_payload(
+            username='other', email='other@gmail.com'
+        ))
+        with tempfile.NamedTemporaryFile(suffix='.jpg') as ntf:
+            Image.new('RGB', (100, 100)).save(ntf, format='JPEG')
+            for user in (self.user, other):
+                ntf.seek(0)
+                self.client.force_authenticate(user=user)
+                self.client.patch(
+                    PROFILE_URL, {'avatar': ntf}, format='multipart'
+                )
+        self.user.refresh_from_db()
+        other.refresh_from_db()
+
+        self.assertEqual(self.user.avatar.name, other.avatar.name)
+        media = MediaFile.objects.get(name=self.user.avatar.name)
+        self.assertEqual(media.ref_count, 2)
+
+        other.delete()
+        media.refresh_from_db()
+        self.assertEqual(media.ref_count, 1)
+
+    def test_update_same_avatar_keeps_one_reference(self):
+        """Test that uploading the current avatar again doesn't take
+        another reference"""
+        with tempfile.NamedTemporaryFile(suffix='.jpg') as ntf:
+            Image.new('RGB', (100, 100)).save(ntf, format='JPEG')
+            for _ in range(2):
+                ntf.seek(0)
+                self.client.patch(
+                    PROFILE_URL, {'avatar': ntf}, format='multipart'
+                )
+        self.user.refresh_from_db()
+
+        media = MediaFile.objects.get(name=self.user.avatar.name)
+        self.assertEqual(media.ref_count, 1)
+
+        self.user.delete()
+        self.assertFalse(MediaFile.objects.filter(pk=media.pk).exists())
+
     def test_update_password_not_allowed(self):
         """Test that updating password in profile endpoint is not allowed"""
         new_pass = 'newpass'
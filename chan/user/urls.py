@@ -7,10 +7,18 @@ app_name = 'user'
 
 urlpatterns = [
     path('signup/', views.CreateUserView.as_view(), name='signup'),
+    path(
+        'availability/', views.AvailabilityView.as_view(),
+        name='availability'
+    ),
     path('signin/', views.CreateTokenView.as_view(), name='signin'),
     path('profile/', views.ManageUserView.as_view(), name='profile'),
     path(
         'change-password/', views.ChangePasswordView.as_view(),
         name='change-password'
     ),
+    path(
+        'token-cache/', views.TokenCacheStatsView.as_view(),
+        name='token-cache'
+    ),
 ]
@@ -1,14 +1,49 @@
 from rest_framework import (
+    exceptions,
     generics,
-    authentication,
+    views,
     permissions
 )
+from rest_framework.response import Response
 from rest_framework.authtoken.views import ObtainAuthToken
 from rest_framework.settings import api_settings
 
 from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.utils.translation import ugettext_lazy as _
 
 from user import serializers
+from user.authentication import CachedTokenAuthentication, token_cache
+from user.availability import availability_index
+
+
+class FreshUserMixin:
+    """Write to the authenticated user as currently stored rather than
+    the copy held by the token cache, which another worker may have
+    changed behind this process"""
+
+    def update(self, request, *args, **kwargs):
+        """Update the user row locked until the write commits"""
+        with transaction.atomic():
+            return super().update(request, *args, **kwargs)
+
+    def get_object(self):
+        """Retrieve and return authentication user, reading it again
+        (locked) from the database on writes"""
+        if self.request.method in permissions.SAFE_METHODS:
+            return self.request.user
+
+        user = get_user_model().objects.select_for_update().filter(
+            pk=self.request.user.pk, is_active=True
+        ).first()
+
+        if user is None:
+            token_cache.invalidate_user(self.request.user.pk)
+            raise exceptions.AuthenticationFailed(
+                _('User inactive or deleted.')
+            )
+
+        return user
 
 
 class CreateUserView(generics.CreateAPIView):
@@ -16,30 +51,51 @@ class CreateUserView(generics.CreateAPIView):
     serializer_class = serializers.UserSerializer
 
 
+class AvailabilityView(views.APIView):
+    """Check whether a username and/or email are still free"""
+    authentication_classes = []
+    permission_classes = [permissions.AllowAny, ]
+
+    def get(self, request):
+        """Return {field: available} for ?username= and/or ?email=,
+        querying the database only on a possible match"""
+        serializer = serializers.AvailabilitySerializer(
+            data=request.query_params
+        )
+        serializer.is_valid(raise_exception=True)
+
+        return Response({
+            field: availability_index.is_available(field, value)
+            for field, value in serializer.validated_data.items()
+        })
+
+
 class CreateTokenView(ObtainAuthToken):
     """Create a token for user"""
     serializer_class = serializers.AuthTokenSerializer
     renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES
 
 
-class ManageUserView(generics.RetrieveUpdateAPIView):
+class ManageUserView(FreshUserMixin, generics.RetrieveUpdateAPIView):
     """Manage updating profile user in the system"""
     serializer_class = serializers.ManageUserSerializer
-    authentication_classes = [authentication.TokenAuthentication, ]
+    authentication_classes = [CachedTokenAuthentication, ]
     permission_classes = [permissions.IsAuthenticated, ]
 
-    def get_object(self):
-        """Retrieve and return authentication user"""
-        return self.request.user
-
 
-class ChangePasswordView(generics.UpdateAPIView):
+class ChangePasswordView(FreshUserMixin, generics.UpdateAPIView):
     """Manage change password profile user in the system"""
     serializer_class = serializers.ChangePasswordSerializer
-    authentication_classes = [authentication.TokenAuthentication, ]
+    authentication_classes = [CachedTokenAuthentication, ]
     permission_classes = [permissions.IsAuthenticated, ]
     queryset = get_user_model().objects.all()
 
-    def get_object(self):
-        """Retrieve and return authentication user"""
-        return self.request.user
+
+class TokenCacheStatsView(views.APIView):
+    """Retrieve hit/miss counters of the token cache (of this worker)"""
+    authentication_classes = [CachedTokenAuthentication, ]
+    permission_classes = [permissions.IsAdminUser, ]
+
+    def get(self, request):
+        """Return token cache counters"""
+        return Response(token_cache.info())